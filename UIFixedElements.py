@@ -95,6 +95,14 @@ class AdvancedUIInputText(UIInputText):
         self.caret.PERIOD = 0.2
         self._blink_state = self._get_caret_blink_state()
 
+        # set on every edit of the text and reset by the owner of the field when it has checked the text,
+        # so the text is checked at most once per frame however many keys were pressed
+        self.changed = True
+        self.doc.push_handlers(on_insert_text=self._on_text_changed, on_delete_text=self._on_text_changed)
+
+    def _on_text_changed(self, *args):
+        self.changed = True
+
     def on_event(self, event: UIEvent) -> Optional[bool]:
         if isinstance(event, UIKeyEvent):
             if self.last_event:
@@ -0,0 +1,393 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Big textures (backgrounds and menu buttons) are made for 4K screen. They are scaled down once
+to the resolution bucket of the screen and kept in the user cache directory (see paths.py) as raw RGBA arrays,
+so next starts only read (memory map) them instead of decoding 4K images, and smaller screens use less memory.
+Cache file name has the hash of source file, so changed textures are scaled again and their old versions
+are removed. If the cache can't be written, textures are scaled in memory on every start.
+
+Small UI textures (buttons, checkboxes, icons and player sprites) are packed into one sheet (see sheet.py),
+which is shipped in textures directory with its layout, or packed at start and kept in the cache
+if their sources were changed. The sheet is added to the texture atlas once, as one image, and UI textures
+are regions of it (see UITextureAtlas), so they take neither own uploads nor own borders in the atlas.
+
+AssetLoader decodes textures in worker threads while the window is already running and adds them
+to the texture atlas on the main thread, a few every frame.
+
+Cache and UI sheet can be prebuilt: python assets.py"""
+
+import hashlib
+import heapq
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import arcade
+import numpy as np
+from arcade.texture import ImageData
+from arcade.texture_atlas.base import AtlasRegion
+from PIL import Image
+
+from paths import user_cache_directory
+from sheet import pack_regions
+
+resolution_buckets = (720, 900, 1080, 1440, 2160)
+source_screen_height = 2160  # screen height which the big textures are made for
+pipeline_version = 1  # changing it makes all cached textures scaled again
+# textures which are drawn in the rectangle of given size, so their own size doesn't matter for the layout
+scaled_textures = (
+    'textures/GameBackground_4k.jpg',
+    'textures/bottom_panel_4k.jpg',
+    'textures/Lobby_BG_4k.jpg',
+    'textures/MainMenuBackgroundLogo.png',
+    'textures/Settings_button_2048.png',
+    'textures/Settings_button_2048_hover.png',
+    'textures/SoloGame_button_2048.png',
+    'textures/SoloGame_button_2048_hover.png',
+    'textures/Multiplayer_button_2048.png',
+    'textures/Multiplayer_button_2048_hover.png',
+    'textures/Exit_button_2048.png',
+    'textures/Exit_button_2048_hover.png',
+)
+
+# textures packed into UI sheet
+ui_textures = (
+    'textures/fire_button.png',
+    'textures/fire_button_hovered.png',
+    'textures/fire_button_disabled.png',
+    'textures/fire_button_pressed.png',
+    'textures/square_checkBox_empty.png',
+    'textures/square_checkBox_pressed.png',
+    'textures/CheckBoxBlue_empty.png',
+    'textures/CheckBoxBlue_pressed.png',
+    'textures/skip_vote_button.png',
+    'textures/skip_vote_button_hovered.png',
+    'textures/LobbyPlayButton.png',
+    'textures/LobbyPlayButton_hovered.png',
+    'textures/LobbyExitButton.png',
+    'textures/LobbyExitButton_hovered.png',
+    'textures/LobbyAddBotButton.png',
+    'textures/LobbyAddBotButton_hovered.png',
+    'textures/avatar_close_32px.png',
+    'textures/avatar_close_32px_hovered.png',
+    'textures/team_swap_32px.png',
+    'textures/player_sprite.png',
+    'textures/player_sprite_dead.png',
+)
+ui_sheet_name = 'ui_sheet'  # ui_sheet.png is the sheet and ui_sheet.json is its layout
+
+# priorities of loading, textures of the first shown views are loaded first
+PRIORITY_MENU = 0
+PRIORITY_LOBBY = 1
+PRIORITY_GAME = 2
+
+_textures = {}  # (path, bucket or None): texture loaded in this run
+_texture_pairs = {}  # path: (texture, mirrored texture)
+_ui_sheet = None  # UISheet, it's read on the first use
+_ui_sheet_lock = threading.Lock()
+
+
+def cache_directory() -> str:
+    return os.path.join(user_cache_directory(), 'textures')
+
+
+def resolution_bucket(screen_height: int) -> int:
+    """the smallest bucket which is not lower than the screen"""
+    for bucket in resolution_buckets:
+        if screen_height <= bucket:
+            return bucket
+    return resolution_buckets[-1]
+
+
+def _cache_path(path: str, bucket: int) -> str:
+    """path_hash_bucket_content_hash.npy, so the old versions of the texture can be found"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        digest.update(file.read())
+    digest.update(f'{pipeline_version}'.encode())
+    path_digest = hashlib.sha1(os.path.normpath(path).encode()).hexdigest()[:12]
+    return os.path.join(cache_directory(), f'{path_digest}_{bucket}_{digest.hexdigest()[:20]}.npy')
+
+
+def _remove_old_versions(cache_path: str):
+    """removing cached versions of the same texture and bucket made from other sources"""
+    directory, name = os.path.split(cache_path)
+    prefix = name.rsplit('_', 1)[0] + '_'
+    for other in os.listdir(directory):
+        if other.startswith(prefix) and other.endswith('.npy') and other != name:
+            try:
+                os.remove(os.path.join(directory, other))
+            except OSError:  # it's used by other running game
+                pass
+
+
+def _write_cache(cache_path: str, image: Image.Image):
+    temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temporary_path, 'wb') as file:
+            np.save(file, np.asarray(image))
+        os.replace(temporary_path, cache_path)  # other running game never reads half written file
+        _remove_old_versions(cache_path)
+    except OSError:  # cache is only an optimization, the scaled image is used from memory
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+
+def scaled_image(path: str, bucket: int) -> Image.Image:
+    """source image scaled to the bucket, taken from the cache or made and saved there"""
+    cache_path = _cache_path(path, bucket)
+    try:
+        pixels = np.load(cache_path, mmap_mode='r')
+        return Image.frombuffer('RGBA', (pixels.shape[1], pixels.shape[0]), pixels, 'raw', 'RGBA', 0, 1)
+    except (OSError, ValueError):  # not cached yet or file is damaged
+        pass
+
+    image = Image.open(path).convert('RGBA')
+    factor = bucket / source_screen_height
+    if factor < 1:
+        image = image.resize((max(round(image.width * factor), 1), max(round(image.height * factor), 1)),
+                             Image.Resampling.LANCZOS)
+    _write_cache(cache_path, image)
+    return image
+
+
+def _ui_sources_digest() -> str:
+    digest = hashlib.sha1()
+    for path in ui_textures:
+        digest.update(path.encode())
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _read_ui_sheet(directory: str, sources: str):
+    """(sheet, regions) saved in the directory or None if it's missing or made from other sources"""
+    try:
+        with open(os.path.join(directory, ui_sheet_name + '.json'), 'r') as file:
+            layout = json.load(file)
+        if layout['sources'] != sources:
+            return None
+        sheet = Image.open(os.path.join(directory, ui_sheet_name + '.png'))
+        sheet.load()
+        return sheet, {path: tuple(region) for path, region in layout['regions'].items()}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def pack_ui_sheet() -> tuple:
+    """(sheet, {path: (left, top, width, height)}) with UI textures pasted by the layout of pack_regions"""
+    images = {path: Image.open(path).convert('RGBA') for path in ui_textures}
+    size, regions = pack_regions({path: image.size for path, image in images.items()})
+    sheet = Image.new('RGBA', size, (0, 0, 0, 0))
+    for path, (left, top, _, _) in regions.items():
+        sheet.paste(images[path], (left, top))
+    return sheet, regions
+
+
+def build_ui_sheet(directory: str = 'textures') -> tuple:
+    """packing UI textures and saving the sheet with its layout, returns (sheet, regions)"""
+    sheet, regions = pack_ui_sheet()
+    os.makedirs(directory, exist_ok=True)
+    sheet.save(os.path.join(directory, ui_sheet_name + '.png'), optimize=True)
+    with open(os.path.join(directory, ui_sheet_name + '.json'), 'w') as file:
+        json.dump({'sources': _ui_sources_digest(), 'regions': regions}, file, separators=(',', ':'))
+    return sheet, regions
+
+
+class UISheet:
+    """UI textures packed into one image. The sheet is one texture of the atlas and images of UI textures
+    are its crops, which UITextureAtlas places at their regions of the sheet"""
+
+    def __init__(self, image: Image.Image, regions: dict, sources: str):
+        self.texture = arcade.Texture(image, hash=f'{ui_sheet_name}:{sources}')
+        self.images = {}  # path: ImageData of the texture
+        self.regions = {}  # hash of the image: (left, top, width, height) in the sheet
+        for path, (left, top, width, height) in regions.items():
+            image_data = ImageData(image.crop((left, top, left + width, top + height)),
+                                   hash=f'{ui_sheet_name}:{sources}:{path}')
+            self.images[path] = image_data
+            self.regions[image_data.hash] = left, top, width, height
+
+
+def ui_sheet() -> UISheet:
+    """the shipped sheet, the cached one or packed now"""
+    global _ui_sheet
+    with _ui_sheet_lock:  # it's needed by every worker of AssetLoader, but must be read once
+        if _ui_sheet is None:
+            sources = _ui_sources_digest()
+            layout = _read_ui_sheet('textures', sources) or _read_ui_sheet(cache_directory(), sources)
+            if layout is None:
+                try:
+                    layout = build_ui_sheet(cache_directory())
+                except OSError:  # cache isn't writable
+                    layout = pack_ui_sheet()
+            _ui_sheet = UISheet(*layout, sources)
+        return _ui_sheet
+
+
+class UITextureAtlas(arcade.TextureAtlas):
+    """Atlas in which images of UI textures are regions of the UI sheet. The sheet is added as one image
+    with the first UI texture, so it's uploaded once, has one border and is moved as a whole
+    when the atlas is resized or rebuilt"""
+
+    def has_image(self, image_data: ImageData) -> bool:
+        if _ui_sheet is None or image_data.hash not in _ui_sheet.regions:
+            return super().has_image(image_data)
+        if not self.has_texture(_ui_sheet.texture):
+            self.add(_ui_sheet.texture)
+        return True
+
+    def get_image_region_info(self, hash: str) -> AtlasRegion:
+        if _ui_sheet is None or hash not in _ui_sheet.regions:
+            return super().get_image_region_info(hash)
+        sheet = super().get_image_region_info(_ui_sheet.texture.image_data.hash)
+        left, top, width, height = _ui_sheet.regions[hash]
+        return AtlasRegion(self, sheet.x + left, sheet.y + top, width, height)
+
+    def remove(self, texture: arcade.Texture):
+        if _ui_sheet is not None and texture.image_data.hash in _ui_sheet.regions:
+            # the region stays in the sheet, TextureAtlas.remove must free only the slot of the texture
+            self._image_ref_count.inc_ref(texture.image_data)
+        super().remove(texture)
+
+
+def use_ui_atlas(ctx):
+    """making UITextureAtlas the default atlas of the window, it must be called before anything is drawn"""
+    if ctx._atlas is None:  # arcade creates the default atlas on the first use and has no option for its class
+        ctx._atlas = UITextureAtlas(ctx.atlas_size, border=2, auto_resize=True, ctx=ctx)
+
+
+def _texture_key(path: str, screen_height: int = None) -> tuple:
+    if screen_height is None or path not in scaled_textures:
+        return path, None
+    return path, resolution_bucket(screen_height)
+
+
+def _decode(path: str, bucket: int = None) -> arcade.Texture:
+    """texture which is not added to the atlas yet, so it can be made in any thread"""
+    if bucket is None and path in ui_textures:
+        return arcade.Texture(ui_sheet().images[path])
+    if bucket is None:
+        image = Image.open(path)
+        image.load()
+        return arcade.Texture(image, hash=path)
+    return arcade.Texture(scaled_image(path, bucket), hash=f'{path}@{bucket}')
+
+
+def load_texture(path: str) -> arcade.Texture:
+    """texture loaded by AssetLoader or, if it isn't loaded yet, loaded now"""
+    return load_scaled_texture(path)
+
+
+def load_texture_pair(path: str) -> tuple:
+    """texture and its mirrored copy, for sprites which can look to the left and to the right"""
+    if path not in _texture_pairs:
+        texture = load_texture(path)
+        _texture_pairs[path] = texture, texture.flip_left_right()
+    return _texture_pairs[path]
+
+
+def load_scaled_texture(path: str, screen_height: int = None) -> arcade.Texture:
+    """texture for the screen of given height, big textures are scaled to the screen bucket,
+    others are loaded as they are"""
+    key = _texture_key(path, screen_height)
+    if key not in _textures:
+        _textures[key] = _decode(*key)
+    return _textures[key]
+
+
+class AssetLoader:
+    """Textures are decoded by worker threads in the order of priority (lower number first)
+    and added to the atlas by update() on the main thread until the time budget of the frame is spent.
+    Views get loaded textures by load_texture and load_scaled_texture, which load them immediately
+    if they are not loaded yet"""
+
+    def __init__(self, ctx, workers: int = 4, upload_budget: float = 0.004):
+        self.ctx = ctx
+        self.upload_budget = upload_budget  # seconds per frame
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='assets')
+        self.requested = Counter()  # priority: amount of requested textures
+        self.loaded = Counter()  # priority: amount of textures added to the atlas (or failed)
+        self._keys = set()
+        self._pending = []  # heap of (priority, number, key)
+        self._lock = threading.Lock()
+        self._decoded = queue.SimpleQueue()  # (priority, key, texture or exception)
+
+    def request(self, path: str, priority: int = PRIORITY_GAME, screen_height: int = None):
+        key = _texture_key(path, screen_height)
+        if key in self._keys or key in _textures:
+            return
+        self._keys.add(key)
+        self.requested[priority] += 1
+        with self._lock:
+            heapq.heappush(self._pending, (priority, len(self._keys), key))
+        self.executor.submit(self._decode_next)  # every task decodes the most important pending texture
+
+    def _decode_next(self):
+        with self._lock:
+            priority, _, key = heapq.heappop(self._pending)
+        try:
+            texture = _decode(*key)
+        except Exception as error:  # it will be raised again by load_texture where the texture is used
+            texture = error
+        self._decoded.put((priority, key, texture))
+
+    def update(self, delta_time: float = 0):
+        """adding decoded textures to the atlas, must be called on the main thread every frame"""
+        deadline = time.perf_counter() + self.upload_budget
+        while time.perf_counter() < deadline:
+            try:
+                priority, key, texture = self._decoded.get_nowait()
+            except queue.Empty:
+                return
+            if not isinstance(texture, Exception):
+                texture = _textures.setdefault(key, texture)
+                self.ctx.default_atlas.add(texture)
+            self.loaded[priority] += 1
+
+    def progress(self, max_priority: int = None) -> float:
+        """part of loaded textures with priority up to max_priority (all if it's not given)"""
+        requested = sum(count for priority, count in self.requested.items()
+                        if max_priority is None or priority <= max_priority)
+        loaded = sum(count for priority, count in self.loaded.items()
+                     if max_priority is None or priority <= max_priority)
+        return loaded / requested if requested else 1
+
+    def done(self, max_priority: int = None) -> bool:
+        return self.progress(max_priority) >= 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_cache(buckets=resolution_buckets):
+    """scaling all big textures for every bucket, so the first start of the game after installation is faster"""
+    for bucket in buckets:
+        for path in scaled_textures:
+            scaled_image(path, bucket)
+
+
+if __name__ == '__main__':
+    build_ui_sheet()
+    build_cache()
@@ -0,0 +1,330 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Computer players. The bot makes a lot of random formulas from templates aimed at enemies,
+shoots every one of them in the headless simulation and takes the best one.
+Formulas are scored in worker processes, so bot doesn't need window and can play on server too"""
+
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+
+import numpy as np
+
+from formula import Formula, TranslateError
+from obstacles import ObstacleStore
+from simulation import x_step_px
+from trajectory import Trajectory, find_hits, HIT_PLAYER, HIT_OBSTACLE
+
+
+class Difficulty(NamedTuple):
+    candidates: int  # max amount of formulas to try
+    time_budget: float  # max time of thinking in seconds
+    aim_noise: float  # random error of aiming as part of the distance to the target
+
+
+difficulties = {
+    'easy': Difficulty(candidates=150, time_budget=0.5, aim_noise=0.3),
+    'normal': Difficulty(candidates=800, time_budget=1, aim_noise=0.1),
+    'hard': Difficulty(candidates=3000, time_budget=2, aim_noise=0),
+}
+
+chunk_size = 50  # formulas scored by worker in one task
+enemy_kill_score = 100
+ally_kill_score = -150
+
+
+class Target(NamedTuple):
+    x: float
+    y: float
+    hitbox: tuple  # (left, bottom, right, top)
+    enemy: bool
+
+
+class BotSituation:
+    """Everything bot needs to know about the game to choose a formula. It's plain data,
+    so it can be sent to worker processes"""
+
+    def __init__(self, shooter_x: float, shooter_y: float, left_player: bool, x_edge: float, y_edge: float,
+                 px: float, collision_mode: str, obstacles: list, targets: list):
+        self.shooter_x = shooter_x
+        self.shooter_y = shooter_y
+        self.left_player = left_player
+        self.x_edge = x_edge
+        self.y_edge = y_edge
+        self.px = px
+        self.collision_mode = collision_mode
+        self.obstacles = obstacles  # list of polygons
+        self.targets = targets  # list of Target which can be killed
+
+    @classmethod
+    def from_game(cls, game):
+        """situation of the active player in the game (GameSimulation or Game)"""
+        shooter = game.active_player
+        targets = []
+        for player, hitbox in game.players_hitboxes():
+            enemy = player.left_player != shooter.left_player
+            targets.append(Target(player.x, player.y, hitbox, enemy))
+        return cls(shooter.x, shooter.y, shooter.left_player, game.x_edge, game.y_edge, game.px,
+                   game.collision_mode, list(game.obstacles.values()), targets)
+
+
+def _number(value: float) -> str:
+    return f'{value:.3f}'.rstrip('0').rstrip('.')
+
+
+def _shifted_x(shift: float) -> str:
+    """text of x - shift"""
+    if shift < 0:
+        return f'x+{_number(-shift)}'
+    return f'x-{_number(shift)}'
+
+
+def _sum(terms: list) -> str:
+    """joining (coefficient, expression) terms into formula without double operators"""
+    text = ''
+    for coefficient, expression in terms:
+        sign = '-' if coefficient < 0 else ('+' if text else '')
+        text += f'{sign}{_number(abs(coefficient))}*{expression}'
+    return text or '0'
+
+
+def _step(a: float, b: float) -> str:
+    """function which is constant out of [a; b] and grows by 2 * (b - a) on it"""
+    return f'(abs({_shifted_x(a)})-abs({_shifted_x(b)}))'
+
+
+def steps_formula(situation: BotSituation, target: Target, rng: random.Random, aim_noise: float) -> str:
+    """1-3 steps between shooter and target, which together rise the graph to the target height"""
+    start, end = sorted((situation.shooter_x, target.x))
+    margin = situation.px * 30
+    distance = end - start
+    rise = target.y - situation.shooter_y
+    rise += rng.gauss(0, aim_noise * (abs(rise) + distance) / 2)
+
+    steps = rng.randint(1, 3)
+    edges = sorted(rng.uniform(start + margin, end - margin) if distance > 2 * margin else (start + end) / 2
+                   for _ in range(2 * steps))
+    parts = np.random.default_rng(rng.getrandbits(32)).dirichlet(np.ones(steps)) * rise
+    direction = 1 if situation.left_player else -1  # steps rise from the left to the right
+    terms = []
+    for i in range(steps):
+        a, b = edges[2 * i], edges[2 * i + 1]
+        if b - a < 1e-3:
+            continue
+        terms.append((direction * parts[i] / (2 * (b - a)), _step(a, b)))
+    return _sum(terms)
+
+
+def sine_formula(situation: BotSituation, target: Target, rng: random.Random, aim_noise: float) -> str:
+    """sine wave with random amplitude, which can go around obstacles"""
+    amplitude = rng.uniform(0.5, 0.5 * situation.y_edge)
+    frequency = rng.uniform(0.05, 1.5)
+    slope = (target.y - situation.shooter_y) / ((target.x - situation.shooter_x) or 1)
+    slope *= 1 + rng.gauss(0, aim_noise)
+    return _sum([(amplitude, f'sin({_number(frequency)}*({_shifted_x(situation.shooter_x)}))'), (slope, 'x')])
+
+
+def modulo_formula(situation: BotSituation, target: Target, rng: random.Random, aim_noise: float) -> str:
+    """saw made by modulo, the graph jumps down on every tooth and can jump over obstacles"""
+    period = rng.uniform(1, max(situation.x_edge / 2, 1.5))
+    height = rng.uniform(-situation.y_edge / 2, situation.y_edge / 2)
+    base = steps_formula(situation, target, rng, aim_noise)
+    return _sum([(1, f'({base})'), (height / period, f'(({_shifted_x(situation.shooter_x)})%{_number(period)})')])
+
+
+templates = [steps_formula, steps_formula, sine_formula, modulo_formula]
+
+
+def random_formulas(situation: BotSituation, count: int, aim_noise: float, rng: random.Random = random) -> list:
+    enemies = [target for target in situation.targets if target.enemy]
+    if not enemies:
+        return []
+    return [rng.choice(templates)(situation, rng.choice(enemies), rng, aim_noise) for _ in range(count)]
+
+
+def score_formulas(situation: BotSituation, formulas: list) -> list:
+    """shooting every formula in the situation, returns list of (score, formula).
+    Killed enemies are the most important, then how close the graph comes to the nearest enemy"""
+    obstacles = ObstacleStore(cell_size=100 * situation.px)
+    for polygon in situation.obstacles:
+        obstacles.add(polygon)
+    hitboxes = [(index, target.hitbox) for index, target in enumerate(situation.targets)]
+    enemies = np.array([(target.x, target.y) for target in situation.targets if target.enemy]).reshape(-1, 2)
+    x_step = x_step_px * situation.px * (1 if situation.left_player else -1)
+    field_size = 2 * math.hypot(situation.x_edge, situation.y_edge)
+
+    results = []
+    for text in formulas:
+        try:
+            formula = Formula(text)
+        except TranslateError:
+            continue
+        trajectory = Trajectory(formula, situation.shooter_x, situation.shooter_y, x_step, situation.x_edge,
+                                situation.y_edge)
+        if not len(trajectory):
+            continue
+        points = np.column_stack((trajectory.x, trajectory.y))
+        events = find_hits(points, obstacles, hitboxes, situation.collision_mode)
+        if events and events[-1].kind == HIT_OBSTACLE:
+            points = points[:events[-1].index + 1]
+
+        score = 0
+        for event in events:
+            if event.kind == HIT_PLAYER:
+                score += enemy_kill_score if situation.targets[event.target].enemy else ally_kill_score
+        if len(enemies):
+            distances = np.linalg.norm(points[:, None, :] - enemies[None, :, :], axis=2)
+            score += float(1 - distances.min() / field_size)
+        results.append((score, text))
+    return results
+
+
+class BotEngine:
+    """Chooses formulas for computer players. Candidates are scored in the process pool
+    until there are no more of them or the time budget ends"""
+
+    def __init__(self, difficulty: str = 'normal', workers: int = None):
+        self.difficulty = difficulties[difficulty]
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.executor = None
+        self.rng = random.Random()
+
+    def start(self):
+        """Creating the process pool and starting its workers in the calling thread.
+        Workers are started only by the first task, so the empty task is submitted here"""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.executor.submit(int)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        self.start()
+        return self.executor
+
+    def choose_formula(self, situation: BotSituation, cancelled=lambda: False) -> str:
+        """the best found formula, it's blocking call, so it must not be used in the render thread.
+        cancelled is a function returning True when the result is no longer needed"""
+        difficulty = self.difficulty
+        deadline = time.monotonic() + difficulty.time_budget
+        formulas = random_formulas(situation, difficulty.candidates, difficulty.aim_noise, self.rng)
+        if not formulas:
+            return 'x'
+
+        try:
+            return self._best_formula(situation, formulas, deadline, cancelled)
+        except BrokenProcessPool:  # worker was killed, new pool is made for the next turn
+            self.shutdown()
+            raise
+
+    def _best_formula(self, situation: BotSituation, formulas: list, deadline: float, cancelled) -> str:
+        executor = self._get_executor()
+        chunks = [formulas[i:i + chunk_size] for i in range(0, len(formulas), chunk_size)]
+        pending = {executor.submit(score_formulas, situation, chunk) for chunk in chunks}
+        best = (-math.inf, formulas[0])
+        while pending and not cancelled():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            done, pending = wait(pending, timeout=min(timeout, 0.1), return_when=FIRST_COMPLETED)
+            for future in done:
+                for result in future.result():
+                    if result[0] > best[0]:
+                        best = result
+        for future in pending:
+            future.cancel()
+        return best[1]
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+class CancellationToken:
+    """set when the bot turn is no longer needed (map skipped, game quit or turn time is over).
+    Calling the token returns True if it was cancelled"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def __call__(self) -> bool:
+        return self._event.is_set()
+
+
+class BotTurn:
+    """the formula of computer player which is being chosen in background"""
+
+    def __init__(self, player, future: Future, token: CancellationToken):
+        self.player = player
+        self.future = future
+        self.token = token
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self) -> str:
+        """formula chosen by bot, must be called only when the turn is done"""
+        return self.future.result()
+
+    def cancel(self):
+        self.token.cancel()
+        self.future.cancel()
+
+
+class BotTurnExecutor:
+    """Runs bot decisions off the render thread. The background thread only waits for the engine process pool,
+    so render loop just polls BotTurn.done() every frame and is never blocked"""
+
+    def __init__(self, engine: BotEngine = None):
+        self.engine = engine if engine is not None else BotEngine()
+        self.threads = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bot')
+        self.turns = set()  # not finished turns
+
+    def submit(self, game) -> BotTurn:
+        """starting to choose formula for active player of the game"""
+        situation = BotSituation.from_game(game)  # taken now, so later changes of game don't affect the bot
+        self.engine.start()  # workers are started in the calling (render) thread, not in the background one
+        token = CancellationToken()
+        turn = BotTurn(game.active_player, self.threads.submit(self.engine.choose_formula, situation, token), token)
+        self.turns.add(turn)
+        turn.future.add_done_callback(lambda future: self.turns.discard(turn))
+        return turn
+
+    def cancel_all(self):
+        for turn in list(self.turns):
+            turn.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        self.engine.shutdown()
+
+
+def play_turn(game, engine: BotEngine):
+    """making the shot of active computer player in headless game, returns ShotResult"""
+    return game.fire(engine.choose_formula(BotSituation.from_game(game)))
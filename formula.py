@@ -18,11 +18,20 @@ If not, see <https://www.gnu.org/licenses/>.
 import math
 import random
 import re
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
 
 operators_precedence = {'-': 1, '+': 1, '*': 4, '/': 4, '%': 4, '^': 5, '(': 10, ')': 10}
 constants = {'pi': 3.141592_653589_793238, 'e': 2.718281828459045}
 functions = {'abs': abs, 'sqrt': math.sqrt, 'rt': math.sqrt, 'exp': math.exp, 'tan': math.tan, 'tg': math.tan,
              'sin': math.sin, 'cos': math.cos, 'log': math.log10, 'lg': math.log10, 'ln': lambda x: math.log(math.e, x)}
+numpy_functions = {'abs': np.abs, 'sqrt': np.sqrt, 'rt': np.sqrt, 'exp': np.exp, 'tan': np.tan, 'tg': np.tan,
+                   'sin': np.sin, 'cos': np.cos, 'log': np.log10, 'lg': np.log10, 'ln': lambda x: 1 / np.log(x)}
+# arguments, for which math functions raise an error, but numpy ones return finite number
+numpy_functions_domain = {'ln': lambda x: (x <= 0) | (x == 1)}
 functions_precedence = 2
 maximum_value = 50000
 
@@ -43,7 +52,16 @@ class TokenError(TranslateError):
     pass
 
 
-class EvaluatingError:
+class ArityError(TokenError):
+    """operator or function without operands, or operands without operator"""
+
+    def __init__(self, token: int, position: int):
+        super().__init__(f'wrong amount of operands at position {position}')
+        self.token = token  # index of the wrong token in the postfix formula
+        self.position = position  # position of the token in the given text
+
+
+class EvaluatingError(Exception):
     pass
 
 
@@ -55,34 +73,221 @@ class ArgumentOutOfRange(EvaluatingError):
     pass
 
 
+def _clamp(value, random_value=random.random):
+    """defending from too big numbers, the same way as evaluate_legacy does after every operator"""
+    if value > maximum_value:
+        return maximum_value + 10 * random_value()
+    if value < -maximum_value:
+        return -maximum_value + 10 * random_value()
+    return value
+
+
+def _divide(a, b):
+    if b:
+        return a / b
+    raise DividingZero
+
+
+def _power(a, b):
+    try:
+        if a < 0:
+            if not (b - int(b)) < 10 / maximum_value:
+                raise ArgumentOutOfRange
+            b = int(b)
+        return a ** b
+    except ValueError:
+        return maximum_value
+
+
+def _modulo(a, b):
+    try:
+        return a % b
+    except Exception:
+        raise ArgumentOutOfRange
+
+
+def _exp(value, random_value=random.random):
+    if value > 100:
+        value = 100 + 2 * random_value()
+    return functions['exp'](value)
+
+
+def _rewrite(pattern: str, parts: tuple, text: str, origins: list) -> tuple:
+    """re.sub, which keeps positions of symbols in the source text. Replacement parts are
+    group numbers and inserted strings, inserted symbols get the position of the next group.
+    Returns (new text, new origins)"""
+    new_text = []
+    new_origins = []
+    last = 0
+    for match in re.finditer(pattern, text):
+        new_text.append(text[last:match.start()])
+        new_origins.extend(origins[last:match.start()])
+        for index, part in enumerate(parts):
+            if isinstance(part, int):
+                new_text.append(match.group(part))
+                new_origins.extend(origins[match.start(part):match.end(part)])
+            else:
+                group = next(group for group in parts[index:] if isinstance(group, int))
+                new_text.append(part)
+                new_origins.extend([origins[match.start(group)]] * len(part))
+        last = match.end()
+    new_text.append(text[last:])
+    new_origins.extend(origins[last:])
+    return ''.join(new_text), new_origins
+
+
+binary_operators = {'+': lambda a, b: a + b, '-': lambda a, b: a - b, '*': lambda a, b: a * b, '/': _divide,
+                    '^': _power, '%': _modulo}
+max_compiled_depth = 300  # deeper formulas are evaluated by interpreter to not reach recursion limit
+compile_cache_size = 1024
+compile_cache_max_length = 1024  # longer formulas are not cached, so the cache can't take much memory
+_whitespaces = re.compile(r'[ \t\a\r\v]+')  # whitespaces which are skipped by translate_to_postfix
+_word_symbol = re.compile(r'[\w.]')  # symbols of numbers and words
+
+
+def _replace_whitespaces(match) -> str:
+    """' ' if whitespaces separate two numbers or words, stand at the start (where '0' is added
+    only before '-' without whitespaces) or between ')' and '(' (where '*' is added only without them),
+    otherwise '' as they change nothing"""
+    text, start, end = match.string, match.start(), match.end()
+    if start == 0:
+        return ' '
+    before, after = text[start - 1], text[end:end + 1]
+    if (before == ')' and after == '(') or (_word_symbol.match(before) and _word_symbol.match(after)):
+        return ' '
+    return ''
+
+
+def normalize(infix_formula: str) -> str:
+    """Text with the same meaning for translate_to_postfix: lower case and without needless whitespaces.
+    Formulas with the same normal form are translated the same way (or are wrong both), so it's the key
+    of the compile cache"""
+    return _whitespaces.sub(_replace_whitespaces, infix_formula.replace('\n', '').lower())
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
+
+class CompileCache:
+    """LRU cache of translated and compiled formulas keyed by normalized text,
+    so formulas shot again (or made by bots from the same templates) are not parsed again.
+    Only valid formulas not longer than max_length are cached, errors are raised by translation every time"""
+
+    def __init__(self, max_size: int = compile_cache_size, max_length: int = compile_cache_max_length):
+        self.max_size = max_size
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # normalized text: (postfix formula, evaluator)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """(postfix formula, evaluator) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, postfix_formula: list, evaluator):
+        if len(key) > self.max_length:
+            return
+        with self._lock:
+            self._entries[key] = (postfix_formula, evaluator)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, infix_formula: str = None):
+        """removing one formula or, if it's not given, all of them (for example after changing functions)"""
+        with self._lock:
+            if infix_formula is None:
+                self._entries.clear()
+                self.hits = self.misses = 0
+            else:
+                self._entries.pop(normalize(infix_formula), None)
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, len(self._entries), self.max_size)
+
+
+compile_cache = CompileCache()
+
+
 class Formula:
     formula = []
 
     def __init__(self, infix_formula: str):
-        self.formula = self.translate_to_postfix(infix_formula)
+        self.source = infix_formula  # text of the formula as it was written
+        key = normalize(infix_formula)
+        entry = compile_cache.get(key)
+        if entry is None:
+            # the postfix list is shared by formulas from the cache, so it must never be changed
+            postfix_formula = self.translate_to_postfix(infix_formula)
+            entry = postfix_formula, self.compile(postfix_formula)
+            compile_cache.put(key, *entry)
+        self.formula, self._evaluator = entry
+
+    @staticmethod
+    def compile(postfix_formula: list):
+        """Building the tree of closures from postfix formula only once, so evaluation of the formula
+        is just a call of the root closure: linear in amount of tokens and without copying the token list.
+        Returns None if formula is too deep to be evaluated recursively"""
+
+        nodes = []  # stack of (closure, depth)
+        for token in postfix_formula:
+            if token == 'x':
+                nodes.append((lambda x: x, 1))
+            elif type(token) != str:  # number
+                nodes.append(((lambda value: lambda x: value)(token), 1))
+            elif token in binary_operators:
+                (b, b_depth), (a, a_depth) = nodes.pop(), nodes.pop()
+                nodes.append(((lambda operator, a, b: lambda x: _clamp(operator(a(x), b(x))))(
+                    binary_operators[token], a, b), max(a_depth, b_depth) + 1))
+            else:  # function
+                a, a_depth = nodes.pop()
+                function = _exp if token == 'exp' else functions[token]
+                nodes.append(((lambda function, a: lambda x: function(a(x)))(function, a), a_depth + 1))
+
+        root, depth = nodes[-1]
+        if depth > max_compiled_depth:
+            return None
+        return root
 
     def translate_to_postfix(self, infix_formula: str):
         if not infix_formula:
             raise TranslateError  # if infix_formula is empty
 
-        # preparing string to translate
+        # preparing string to translate, origins keep position in the given text of every symbol
+        source_length = len(infix_formula)
+        origins = [i for i, symbol in enumerate(infix_formula) if symbol != '\n']
         infix_formula = infix_formula.replace('\n', '')
         infix_formula = infix_formula.lower()
-        if infix_formula[0] == '-':
-            infix_formula = '0' + infix_formula
-        infix_formula = re.sub(r'\(\s*-', '(0-', infix_formula)  # adding 0 before unary '-'
-        infix_formula = re.sub(r'(\d)\s*([a-zA-Z(])', r'\1*\2', infix_formula)  # adding '*' signs
-        infix_formula = re.sub(r'\)\(', ')*(', infix_formula)
-        infix_formula = re.sub(r':', '/', infix_formula)  # changing ':' to '/'
-        infix_formula = re.sub(r'\)\s*([a-zA-Z]+)', r')*\1', infix_formula)  # adding '*' between ')' and word
+        infix_formula, origins = _rewrite(r'^(-)', ('0', 1), infix_formula, origins)
+        infix_formula, origins = _rewrite(r'(\()\s*(-)', (1, '0', 2), infix_formula, origins)  # 0 before unary '-'
+        infix_formula, origins = _rewrite(r'(\d)\s*([a-zA-Z(])', (1, '*', 2), infix_formula, origins)  # adding '*'
+        infix_formula, origins = _rewrite(r'(\))(\()', (1, '*', 2), infix_formula, origins)
+        infix_formula = infix_formula.replace(':', '/')  # changing ':' to '/'
+        # adding '*' between ')' and word
+        infix_formula, origins = _rewrite(r'(\))\s*([a-zA-Z]+)', (1, '*', 2), infix_formula, origins)
 
         postfix_formula = []
+        positions = []  # positions of postfix tokens in the text, for error messages
         operators_stack = []
+        operators_positions = []
         i = -1
         while i + 1 < len(infix_formula):  # while infix_formula has more than 1 element
             i += 1
 
             symbol_to_parse = infix_formula[i]
+            position = i
 
             if symbol_to_parse in (' ', '\t', '\a', '\r', '\v'):  # skipping whitespaces
                 continue
@@ -95,6 +300,7 @@ class Formula:
                 # adding number to the output
                 try:
                     postfix_formula.append(float(num) if '.' in num else int(num))
+                    positions.append(position)
                 except Exception:
                     raise NumberError  # if number is wrong (more than 1 point for example)
 
@@ -102,6 +308,7 @@ class Formula:
 
                 if symbol_to_parse == '(':
                     operators_stack.append('(')
+                    operators_positions.append(position)
 
                 elif symbol_to_parse == ')':
                     try:
@@ -109,11 +316,14 @@ class Formula:
                         top_el = operators_stack.pop()
                         while not top_el == '(':
                             postfix_formula.append(top_el)
+                            positions.append(operators_positions.pop())
                             top_el = operators_stack.pop()
+                        operators_positions.pop()
 
                         # if before '(' was a function, pop it from stack to the output
                         if len(operators_stack) and (operators_stack[-1] in functions):
                             postfix_formula.append(operators_stack.pop())
+                            positions.append(operators_positions.pop())
                     except Exception:
                         raise ParenthesesError
 
@@ -127,14 +337,17 @@ class Formula:
                         if token in functions.keys():  # if function on the top of stack
                             if current_operator_precedence < functions_precedence:
                                 postfix_formula.append(operators_stack.pop())
+                                positions.append(operators_positions.pop())
                                 continue
                             break
                         elif operators_precedence[
                             token] >= current_operator_precedence:  # if operator on the top of stack
                             postfix_formula.append(operators_stack.pop())
+                            positions.append(operators_positions.pop())
                         else:
                             break
                     operators_stack.append(symbol_to_parse)
+                    operators_positions.append(position)
 
             elif symbol_to_parse.isalpha():  # constants and functions
                 token_end_index = i
@@ -147,10 +360,13 @@ class Formula:
 
                 if token == 'x':
                     postfix_formula.append('x')
+                    positions.append(position)
                 elif token in constants.keys():
                     postfix_formula.append(constants[token])
+                    positions.append(position)
                 elif token in functions.keys():
                     operators_stack.append(token)
+                    operators_positions.append(position)
                 else:
                     raise TokenError
 
@@ -162,33 +378,139 @@ class Formula:
             if operators_stack:
                 while operators_stack:
                     postfix_formula.append(operators_stack.pop())
+                    positions.append(operators_positions.pop())
         else:
             raise ParenthesesError
 
-        # checking if amount of operands and operators_precedence is appropriate
-        try:
-            postfix_formula_copy = postfix_formula.copy()
-            while len(infix_formula) > 1:
-                for i in range(len(postfix_formula_copy)):
-                    if type(postfix_formula_copy[i]) == str and (not postfix_formula_copy[i] == 'x'):
-                        if postfix_formula_copy[i] in operators_precedence.keys():
-                            for _ in range(2):
-                                postfix_formula_copy.pop(i - 1)
-                        else:
-                            postfix_formula_copy.pop(i)
-                        break
-                else:  # if no operators_precedence found
-                    if len(postfix_formula_copy) > 1:
-                        raise TokenError
-                    if type(postfix_formula_copy[0]) == str and not postfix_formula_copy[0] == 'x':
-                        raise TokenError
-                    break
-        except Exception:
-            raise TokenError
-
+        error = self.validate(postfix_formula)
+        if error is not None:
+            raise ArityError(error, origins[positions[error]] if error < len(positions) else source_length)
         return postfix_formula
 
+    @staticmethod
+    def validate(postfix_formula: list):
+        """Checking if every operator and function has enough operands and formula gives exactly one value.
+        Returns None if formula is right or index of the first wrong token: operator without operands
+        or value which is left without operator (len(postfix_formula) if formula is empty)"""
+        starts = []  # index of the first token of every value on the evaluation stack
+        for index, token in enumerate(postfix_formula):
+            if token == 'x' or type(token) != str:  # operand
+                starts.append(index)
+            elif token in binary_operators:
+                if len(starts) < 2:
+                    return index
+                starts.pop()
+            elif not starts:  # function
+                return index
+        if len(starts) != 1:
+            return starts[1] if starts else len(postfix_formula)
+        return None
+
     def evaluate(self, argument: float = 0) -> float:
+        if not self._evaluator:
+            return self.evaluate_legacy(argument)
+        if len(self.formula) == 1 and self.formula[0] == 'x':
+            return argument
+        try:
+            value = self._evaluator(argument)
+            if value > maximum_value:
+                return maximum_value
+            if value < -maximum_value:
+                return -maximum_value
+            return float(value)
+        except EvaluatingError:
+            raise
+        except Exception:
+            raise EvaluatingError
+
+    def evaluate_many(self, arguments: np.ndarray, rng: np.random.Generator = None) -> np.ndarray:
+        """Evaluating formula for the whole array of arguments at once.
+        Returns masked array, where masked are the arguments for which evaluate() would raise EvaluatingError,
+        so one bad point doesn't stop the evaluation of others.
+        All random noise is taken from rng if it's given, so the result is the same for the same rng seed"""
+
+        if rng is None:
+            rng = np.random.default_rng(random.getrandbits(64))
+        arguments = np.asarray(arguments, dtype=np.float64)
+        invalid = np.zeros(arguments.shape, dtype=bool)
+        if len(self.formula) == 1 and self.formula[0] == 'x':
+            return np.ma.MaskedArray(arguments.copy(), mask=invalid)
+
+        # values which don't depend on x are kept as python numbers and calculated as in evaluate()
+        stack = []
+        with np.errstate(all='ignore'):
+            for token in self.formula:
+                if token == 'x':
+                    stack.append(arguments)
+                elif type(token) != str:  # number
+                    stack.append(token)
+                elif token in binary_operators:
+                    b, a = stack.pop(), stack.pop()
+                    if np.isscalar(a) and np.isscalar(b):
+                        try:
+                            stack.append(_clamp(binary_operators[token](a, b), rng.random))
+                        except Exception:
+                            invalid[:] = True
+                            stack.append(math.nan)
+                        continue
+
+                    match token:
+                        case '+':
+                            value = a + b
+                        case '-':
+                            value = a - b
+                        case '*':
+                            value = a * b
+                        case '/':
+                            zero = b == 0
+                            invalid |= zero
+                            value = a / np.where(zero, 1, b)
+                        case '^':
+                            a, b = np.broadcast_arrays(a, b)
+                            negative = a < 0
+                            invalid |= negative & ~((b - np.trunc(b)) < 10 / maximum_value)
+                            b = np.where(negative, np.trunc(b), b)
+                            invalid |= (a == 0) & (b < 0)
+                            value = np.power(a, b)
+                            invalid |= np.isinf(value) & np.isfinite(a) & np.isfinite(b)  # overflow
+                        case '%':
+                            zero = b == 0
+                            invalid |= zero
+                            value = np.mod(a, np.where(zero, 1, b))
+                    stack.append(self._clamp_many(value, rng))
+                else:  # function
+                    a = stack.pop()
+                    if np.isscalar(a):
+                        try:
+                            stack.append(_exp(a, rng.random) if token == 'exp' else functions[token](a))
+                        except Exception:
+                            invalid[:] = True
+                            stack.append(math.nan)
+                        continue
+
+                    if token == 'exp':
+                        a = np.where(a > 100, 100 + 2 * rng.random(a.shape), a)
+                    if token in numpy_functions_domain:
+                        invalid |= numpy_functions_domain[token](a)
+                    value = numpy_functions[token](a)
+                    invalid |= ~np.isfinite(value)
+                    stack.append(value)
+
+            values = np.broadcast_to(np.asarray(stack[-1], dtype=np.float64), arguments.shape)
+            invalid |= np.isnan(values)
+            values = np.clip(values, -maximum_value, maximum_value)
+        return np.ma.MaskedArray(values, mask=invalid)
+
+    @staticmethod
+    def _clamp_many(values: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """the same as _clamp, but for arrays"""
+        noise = 10 * rng.random(values.shape)
+        values = np.where(values > maximum_value, maximum_value + noise, values)
+        return np.where(values < -maximum_value, -maximum_value + noise, values)
+
+    def evaluate_legacy(self, argument: float = 0) -> float:
+        """Interpreting postfix token list directly, without compiled closures.
+        It's much slower, but kept to check compiled evaluation against it"""
         tokens = self.formula.copy()
         try:
             while len(tokens) > 1:
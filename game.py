@@ -15,120 +15,91 @@ You should have received a copy of the GNU General Public License along with Mat
 If not, see <https://www.gnu.org/licenses/>.
 """
 
-import os
-import random
 import math
+import os
 import sys
 import time
-from threading import Timer
-from typing import Tuple
-
-import pyglet.graphics
 
 from UIFixedElements import *
 from arcade import shape_list
-from arcade import gui, geometry, color, load_texture, Text, SpriteList, View, Window, earclip
+from arcade import gui, color, Text, SpriteList, View, Window
+from assets import load_texture, load_scaled_texture
 import arcade.types
-from formula import Formula, TranslateError, ArgumentOutOfRange
+from formula import Formula, TranslateError
 from player import Player
+from preview import FormulaPreview
+from bot import BotEngine, BotTurnExecutor
+from replay import ReplayRecorder
+from render import ObstacleRenderStore, TrailRenderer, graph_transform, transform_points
+from simulation import GameSimulation
+from trajectory import HIT_PLAYER, HIT_OBSTACLE
 import numpy as np
-import pyclipper  # for clipping obstacles
 
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     os.chdir(sys._MEIPASS)
 
 
-class Game:
-    _proportion_x2y_max = 2.383
+class Game(GameSimulation):
+    """Game rules from GameSimulation together with everything needed to draw the game"""
 
     def __init__(self, left_team: list = [], right_team: list = [], multiplayer: bool = False, axes_marked: bool = True,
                  marks_frequency: int = 5, proportion_x2y: float = 2.383,
                  y_edge: int = 16, friendly_fire_enable: bool = True, max_time_s: int = 150):
+        super().__init__(left_team, right_team, proportion_x2y, y_edge, friendly_fire_enable, max_time_s=max_time_s)
 
         self.multiplayer = multiplayer
-        self.friendly_fire = friendly_fire_enable
-        self.prev_active_player = None
-        self.max_time_s = max_time_s
-        self.timer_time = max_time_s  # in-game timer time
-        self.obstacles = []  # list of obstacle polygons
-        self.obstacle_frequency = 20  # average obstacle frequency in %
 
         # marks on axes
         self.axes_marked = axes_marked
         self.marks_frequency = marks_frequency
 
-        # graph (game field) settings:
-        self.proportion_x2y = proportion_x2y  # height of graph is constant, but width = height*proportion_x2y
-        self.y_edge = y_edge  # y value on the edge of graph
-        self.x_edge = y_edge * proportion_x2y
-
-        # players initializing
         self.players_sprites_list = SpriteList(use_spatial_hash=True)
-        self.left_team = left_team
-        self.right_team = right_team
-        self.all_players = left_team + right_team
-        self.active_player = None
 
         self.shooting = False
-        self.formula_current_x = None  # when shooting, shows the relative x of the end of last segment
         self.formula = None  # Formula class object
-        self.obstacles_color = ()
-        self.obstacles_border_color = ()
+        self.shot = None  # ShotResult of the current shot
+        self.shot_points = None  # when shooting, screen coordinates of the whole precalculated path
+        self.shot_events = []  # hit events along the shot path which are not happened yet
+        self.shot_revealed = 0  # index of the last drawn point of the shot path
 
-        # list of formula segments
-        self.formula_segments = shape_list.ShapeElementList()
+    @property
+    def timer_time(self) -> int:
+        """in-game timer time in whole seconds"""
+        return math.ceil(self.turn_timer.time_left)
 
-    def prepare(self):
-        self.timer_time = self.max_time_s
-        self.prev_active_player = None
+    def prepare(self, game_map=None):
         self.players_sprites_list = SpriteList(use_spatial_hash=True)
         self.shooting = False
-        self.formula_current_x = None
-        self.formula_segments = shape_list.ShapeElementList()
-        self.all_players = self.left_team + self.right_team
+        self.shot = None
+        self.shot_points = None
+        self.shot_events = []
+        self.shot_revealed = 0
 
-        # choosing obstacles color
-        self.obstacles_color = random.choice(
-            [(207, 14, 136), (37, 252, 13), (183, 16, 230), (255, 251, 10), (0, 255, 183)])
-        self.obstacles_color += (60,)
-        self.obstacles_border_color = self.obstacles_color + (150,)
-
-        # randomly choosing active player
-        self.active_player = random.choice(self.all_players)
-
-        random.shuffle(self.left_team)
-        random.shuffle(self.right_team)
-        for player in self.right_team:
-            player.left_player = False
-            player.alive = True
-        for player in self.left_team:
-            player.alive = True
+        super().prepare(game_map)
 
 
 class GameView(View):
-    background = load_texture('textures/GameBackground_4k.jpg')
-    panel_texture = load_texture('textures/bottom_panel_4k.jpg')
-
     def __init__(self, window: Window):
         super().__init__(window)
 
-        self.obstacle_border_batch_shapes = None
-        self.obstacles_batch: pyglet.graphics.Batch() = None
-        self.obstacle_body_batch_shapes = None
+        self.background = load_scaled_texture('textures/GameBackground_4k.jpg', window.SCREEN_HEIGHT)
+        self.panel_texture = load_scaled_texture('textures/bottom_panel_4k.jpg', window.SCREEN_HEIGHT)
+
+        self.obstacles_render: ObstacleRenderStore = None
         self.formula_field: AdvancedUIInputText = None
+        self.formula_status: Text = None  # error of the formula which is being typed
         self.time_text: Text = None
         self.game_field_objects = shape_list.ShapeElementList()  # shape_list to contain all static elements
         # of game field
         self.nick_names = []  # list to keep nick Text objects
+        self.dead_players = set()  # players which are already drawn dead
+        self.bot_turn = None  # formula of computer player which is being chosen in background
 
         if not window.lobby.game:
             raise Exception
 
         self.game = window.lobby.game
-
-        # creating sprites of players
-        for player in window.lobby.game.all_players:
-            player.create_sprite(self.window)
+        self.recorder = ReplayRecorder(self.game) if window.RECORD_REPLAYS else None
 
         # graph edges coordinates
         self.graph_top_edge = window.GRAPH_TOP_EDGE
@@ -144,6 +115,14 @@ class GameView(View):
         self.graph_x_center = (self.graph_right_edge + self.graph_left_edge) / 2
         self.graph_y_center = (self.graph_top_edge + self.graph_bottom_edge) / 2
 
+        # everything in the game is in graph coordinates and it's converted to the screen only by this matrix
+        self.graph_transform = graph_transform(self.graph_left_edge, self.graph_bottom_edge, self.graph_right_edge,
+                                               self.graph_top_edge, self.game.x_edge, self.game.y_edge)
+
+        # creating sprites of players
+        for player in window.lobby.game.all_players:
+            player.create_sprite(self.window, self.graph_transform)
+
         # panel edges
         self.panel_top_edge = self.graph_bottom_edge - 5
         self.formula_input_height = int(self.panel_top_edge - 95 * self.window.scale)
@@ -156,92 +135,41 @@ class GameView(View):
         self.manager = gui.UIManager()  # for all gui elements
         self.add_ui()
 
-        # generating obstacles
-        self.create_obstacles()
-        self.create_obstacles_batch()
+        # drawing obstacles generated by the game
+        self.create_obstacles_render()
 
-        # adding thread to timer func
-        window.lobby.game.timer_time = window.lobby.game.max_time_s
-        self.timer = Timer(1, self.time_tick)
-        self.timer.start()
+        # line of the formula graph
+        self.trail = TrailRenderer(window.ctx, color.RED, 1 * window.scale)
 
-    def create_obstacles(self):
-        """This method generates obstacles for current game
-        (now only locally) """
+        # low resolution graph of the formula which is being typed
+        self.preview = FormulaPreview()
+        self.preview_trail = TrailRenderer(window.ctx, (255, 255, 255, 90), 1 * window.scale, capacity=1024)
 
-        game = self.window.lobby.game
-        game.obstacles.clear()  # deleting old obstacles
-        max_polygons = int(game.obstacle_frequency * 0.8 * game.proportion_x2y / game._proportion_x2y_max)
-        for i in range(
-                int(max_polygons * (1 + random.randint(-15, 15) / 100))):  # creating +-15% from max_polygons times
-            """generating new polygon"""
-            while True:
-                vertices = random.randint(3, 20)
-                max_radius = int(random.randint(20, 150 + 3 * vertices) * self.window.scale)
-
-                # generating angles as part of 2 Pi radians:
-                angle_sum = 0
-                angles = []
-                for _ in range(vertices):
-                    angles.append(random.randint(35, 100))
-                    angle_sum += angles[-1]
-                for angle in range(vertices):
-                    angles[angle] = angles[angle] / angle_sum
-                obstacle = []
-                center_x = random.randint(self.graph_left_edge + max_radius, self.graph_right_edge - max_radius)
-                center_y = random.randint(self.graph_bottom_edge + max_radius, self.graph_top_edge - max_radius)
-                angle = 0
-                last_scale = 0.75
-                for part in angles:
-                    angle += 2 * math.pi * part
-                    scale = random.randint(25, 100) / 100
-                    scale = (scale + last_scale / 2) * 2 / 3
-                    last_scale = scale
-                    obstacle.append(
-                        (int(center_x + scale * max_radius * math.cos(angle)),
-                         int(center_y + scale * max_radius * math.sin(angle))
-                         )
-                    )
-
-                # checking polygon for collision with others
-                is_intersecting = False
-                for polygon in game.obstacles:
-                    if geometry.are_polygons_intersecting(polygon, obstacle):
-                        is_intersecting = True
-                        break
-                if is_intersecting:
-                    continue
-
-                # checking for collision with players
-                for player in game.all_players:
-                    player_polygon = [(player.sprite.center_x - player.sprite.width / 2,  # creating "hitbox" of player
-                                       player.sprite.center_y + player.sprite.height / 2),
-                                      (player.sprite.center_x + player.sprite.width / 2,
-                                       player.sprite.center_y + player.sprite.height / 2),
-                                      (player.sprite.center_x + player.sprite.width / 2,
-                                       player.sprite.center_y - player.sprite.height / 2),
-                                      (player.sprite.center_x - player.sprite.width / 2,
-                                       player.sprite.center_y - player.sprite.height / 2)]
-                    if geometry.are_polygons_intersecting(player_polygon, obstacle):
-                        is_intersecting = True
-                        break
-                if is_intersecting:
-                    continue
-                break
-            self.window.lobby.game.obstacles.append(obstacle)
-
-    def time_tick(self):
-        self.window.lobby.game.timer_time -= 1
-        self.timer = Timer(1, self.time_tick)
-        self.timer.start()
+        # starting the timer of the first turn only when everything is ready
+        self.game.turn_timer.start()
+        self.start_bot_turn()
 
     def on_show_view(self):
         self.manager.enable()
 
     def on_hide_view(self):
+        self.cancel_bot_turn()  # map is skipped or game is quit
         self.manager.disable()
-        if self.timer:
-            self.timer.cancel()
+
+    def start_bot_turn(self):
+        """if active player is computer, his formula is chosen in background and fired by on_update"""
+        game = self.window.lobby.game
+        if game.multiplayer or not game.active_player.computer_player:
+            return
+        lobby = self.window.lobby
+        if lobby.bots is None:
+            lobby.bots = BotTurnExecutor(BotEngine(lobby.bot_difficulty))
+        self.bot_turn = lobby.bots.submit(game)
+
+    def cancel_bot_turn(self):
+        if self.bot_turn:
+            self.bot_turn.cancel()
+            self.bot_turn = None
 
     def add_ui(self):
         """There is creating of all IU:
@@ -329,6 +257,10 @@ class GameView(View):
                       align_x=int(30 * window.scale))
         self.manager.add(ui_anchor)
 
+        self.formula_status = Text(text='', anchor_x='center', anchor_y='center', color=(245, 60, 60),
+                                   start_x=int(window.width / 2), start_y=int(40 * window.scale),
+                                   font_size=int(12 * window.scale))
+
         # adding timer Text object
         self.time_text = Text(
             text='{:0>2d}:{:0>2d}'.format(window.lobby.game.timer_time // 60, window.lobby.game.timer_time % 60),
@@ -339,8 +271,6 @@ class GameView(View):
 
     def skip_vote(self):
         if not self.game.multiplayer:  # immediately change map if game it's solo game
-            if self.timer:
-                self.timer.cancel()
             start_new_game(self.window.lobby, self.window)
 
     def game_quit(self, event):
@@ -356,33 +286,43 @@ class GameView(View):
         @message_box.event("on_action")
         def on_action(event: gui.UIOnActionEvent):
             if event.action == 'Yes':
-                if self.timer:
-                    self.timer.cancel()
                 from lobby import LobbyView
                 view = LobbyView(self.window)
                 self.window.show_view(view)
 
     def fire(self, event):
         """This function activates when user press fire button"""
-        user_formula = self.formula_field.text
+        if self.bot_turn:  # computer player is choosing his formula now
+            return
+        self.shoot(self.formula_field.text)
+
+    def shoot(self, formula: str):
+        """shooting by active player"""
         game = self.window.lobby.game
 
         if game.shooting:  # cannot shoot until previous shoot end
             return
 
         try:
-            game.formula = Formula(user_formula)
+            game.formula = Formula(formula)
         except TranslateError:
             self.send_message('Something went wrong during translation,\nformula is not correct!')
             return
 
-        # stopping timer
-        self.timer.cancel()
+        # stopping timer while the shot is drawn
+        game.turn_timer.pause()
+
+        # calculating the whole shot at once, on_update will only draw it and pass the turn
+        game.shot = game.fire(game.formula, pass_turn=False)
+        if self.recorder:
+            self.recorder.record_shot(game.shot)
+        game.shot_points = transform_points(self.graph_transform, game.shot.points)
+        game.shot_events = list(game.shot.events)
 
         # setting all parameters for shooting
         game.shooting = True
-        game.formula_current_x = game.active_player.x
-        game.formula_segments = shape_list.ShapeElementList()
+        game.shot_revealed = 0
+        self.trail.clear()
 
     def send_message(self, text):
         message_box = gui.UIMessageBox(
@@ -394,225 +334,86 @@ class GameView(View):
         self.manager.add(message_box)
 
     def kill_player(self, player: Player):
-        """changing player texture to dead,
-        making him inactive in game if this is not active player"""
-        game = self.window.lobby.game
-        if player == game.active_player:
-            return None  # cannot kill himself
-        if not player.alive:
-            return None  # cannot kill dead player
-
-        player.sprite.texture = player.texture_left_dead if player.left_player else player.texture_right_dead
-        player.alive = False
-
-    def is_game_end(self):
-
-        end = True
-        for player in self.window.lobby.game.right_team:
-            if player.alive:
-                end = False
-        if end:
-            return True
-        end = True
-        for player in self.window.lobby.game.left_team:
-            if player.alive:
-                end = False
-        return end
+        """changing player texture to dead, the game has already made him inactive"""
+        player.sprite.texture = player.dead_texture
+        self.dead_players.add(player)
 
     def pass_turn_to_next_player(self):
         game = self.window.lobby.game
-        self.timer.cancel()
-        if self.is_game_end():
+        if not game.pass_turn_to_next_player():  # turn timer is restarted by the game
             self.game_finish()
             return
-
-        """pass the turn to the next alive player in opposite team"""
-        next_team = game.left_team.copy() if game.active_player in game.right_team else game.right_team.copy()
-        next_team.extend(next_team)  # making part of 'cycle'
-        active_player = game.active_player
-        next_team = next_team[(next_team.index(game.prev_active_player) if game.prev_active_player else -1) + 1:]
-        for player in next_team:
-            if player.alive:
-                # making first alive player active
-                game.active_player = player
-                game.prev_active_player = active_player
-
-                # resetting timer
-                game.timer_time = game.max_time_s
-                self.timer = Timer(1, self.time_tick)
-                self.timer.start()
-
-                break
+        self.start_bot_turn()
 
     def game_finish(self):
+        if self.recorder:
+            self.recorder.save()
         from lobby import LobbyView
         view = LobbyView(self.window)
         self.window.show_view(view)
 
-    def obstacle_hit(self, obstacle_index, point: Tuple):
-        """This method takes obstacle index from game.obstacles
-        list and clipping it, making blow effect. It works using
-        pyclipper library and there is no documentation at all, so
-        it's a miracle that it works. Pls, don't touch the part with pyclipper.
-
-        clipper is the polygon of "blow", it's a bit randomized and has given size as radius"""
-        # TODO: remade to change only one polygon, mb Batch.ivalidate will be useful
-
-        window = self.window
-        game = window.lobby.game
-        blow_radius = 25 * window.scale
-        obstacle = window.lobby.game.obstacles[obstacle_index]
-
-        # generating clipping polygon
-        angle_angle_sum = 0
-        angles = []
-        vertices = 8
-        for _ in range(vertices):
-            angles.append(random.randint(85, 100))
-            angle_angle_sum += angles[-1]
-        for angle in range(vertices):
-            angles[angle] = angles[angle] / angle_angle_sum
-
-        center_x = point[0]
-        center_y = point[1]
-        clipper = []
-        for part in angles:
-            angle += 2 * math.pi * part
-            clipper.append(
-                (int(center_x + blow_radius * math.cos(angle)),
-                 int(center_y + blow_radius * math.sin(angle))
-                 )
-            )
-
-        # calculating new obstacle(s)
-        pc = pyclipper.Pyclipper()
-        pc.AddPath(obstacle, pyclipper.PT_CLIP, True)
-        pc.AddPath(clipper, pyclipper.PT_SUBJECT, True)
-        if not pc.Execute(pyclipper.CT_DIFFERENCE):  # if whole clipping polygon is inside subject
+    def obstacle_hit(self, shot):
+        """replacing vertices of the obstacle hit by shot with vertices of its pieces"""
+        if not shot.obstacle_changed:
             return
-        game.obstacles.pop(obstacle_index)  # deleting old obstacle
-        pc.Clear()
-        pc.AddPath(obstacle, pyclipper.PT_SUBJECT, True)
-        pc.AddPath(clipper, pyclipper.PT_CLIP, True)
-        new_obstacles = pc.Execute(pyclipper.CT_DIFFERENCE, pyclipper.PFT_EVENODD)
-        for obstacle in new_obstacles:
-            if not obstacle:
-                continue
-            game.obstacles.append(obstacle)
-
-        # deleting previous obstacle shape from batch
-        self.obstacle_body_batch_shapes.pop(obstacle_index)
-        self.obstacle_border_batch_shapes.pop(obstacle_index)
-
-        # creating new shape
-        for polygon in new_obstacles:
-            if not obstacle:
-                continue
-
-            # creating obstacle body
-            triangles = arcade.earclip.earclip(polygon)
-            obstacle = []
-
-            for tr in triangles:
-                obstacle.append(pyglet.shapes.Triangle(tr[0][0], tr[0][1], tr[1][0], tr[1][1], tr[2][0], tr[2][1],
-                                                       game.obstacles_color, batch=self.obstacles_batch))
-            self.obstacle_body_batch_shapes.append(obstacle)
-
-            # creating obstacle border
-            last_point = polygon[-1]
-            border = []
-            for point in polygon:
-                border.append(pyglet.shapes.Line(last_point[0], last_point[1], point[0], point[1],
-                                                 width=int(2 * self.window.scale),
-                                                 color=game.obstacles_border_color, batch=self.obstacles_batch))
-                last_point = point
-            self.obstacle_border_batch_shapes.append(border)
-
-
-
+        obstacles = self.window.lobby.game.obstacles
+        self.obstacles_render.replace(shot.obstacle_id, {new_id: obstacles[new_id] for new_id in shot.new_obstacle_ids})
 
     def on_update(self, delta_time: float = 1 / 60):
         window = self.window
         game = window.lobby.game
 
         # if no time left, pass the turn to the next player
-        if self.window.lobby.game.timer_time <= 0:
+        if game.turn_timer.is_over():
+            self.cancel_bot_turn()
+            if self.recorder:
+                self.recorder.record_pass()
             self.pass_turn_to_next_player()
             return
 
-        if game.shooting:
-            # calculation few next segments of graphic
+        # firing formula of computer player when it's ready
+        if self.bot_turn and self.bot_turn.done():
+            try:
+                formula = self.bot_turn.result()
+            except Exception:  # bot processes failed, the turn is not lost, but the shot is the simplest one
+                formula = 'x'
+            self.bot_turn = None
+            self.shoot(formula)
 
-            graph_left_edge = int(
-                window.SCREEN_WIDTH - (self.graph_top_edge - self.graph_bottom_edge) * game.proportion_x2y) // 2
-            graph_right_edge = window.SCREEN_WIDTH - graph_left_edge
-            graph_width = (graph_right_edge - graph_left_edge)
+        if not game.shooting:
+            self.update_preview()
 
+        if game.shooting:
+            # revealing few next segments of precalculated path
             segments_per_tick = int(12 * self.window.scale)
-            try:
-                translation_y_delta = game.active_player.y - 1 * game.formula.evaluate(game.active_player.x)
-                x_step_px = 0.5 * window.scale  # the size of function step in px
-                x_step = x_step_px * 2 * game.x_edge / graph_width * (1 if game.active_player.left_player else -1)
-                point_list = []
-                for _ in range(segments_per_tick + 1):
-                    # evaluating next point coordinates
-                    y_val = game.formula.evaluate(game.formula_current_x) + translation_y_delta
-
-                    point_list.append((window.SCREEN_X_CENTER +
-                                       graph_width / 2 / window.lobby.game.x_edge * game.formula_current_x,
-                                       (self.graph_top_edge + self.graph_bottom_edge) / 2 +
-                                       (self.graph_top_edge - self.graph_bottom_edge) / 2 / window.lobby.game.y_edge * (
-                                           y_val)))
-
-                    # increasing for next step
-                    game.formula_current_x += x_step
-
-                game.formula_current_x -= x_step
-
-                strip_line = shape_list.create_line_strip(point_list=point_list, color=color.RED,
-                                                          line_width=1 * window.scale)
-                game.formula_segments.append(strip_line)  # adding new segment
-
-                # checking collision with other players or obstacles
-                for point in strip_line.points:
-                    # checking for collision with obstacles:
-                    for obstacle_index in range(len(game.obstacles)):
-
-                        if pyclipper.PointInPolygon(point, game.obstacles[obstacle_index]):
-                            self.obstacle_hit(obstacle_index, point)
-                            self.stop_shooting()
-                            return
-
-                    # checking for collision with players
-                    collisions = arcade.get_sprites_at_point(point, game.players_sprites_list)
-                    if collisions:
-                        for player in game.all_players:
-                            if player.sprite == collisions[0]:
-                                active_team = game.left_team if game.active_player in game.left_team else \
-                                    game.right_team
-                                if player in active_team and not game.friendly_fire:
-                                    return
-                                self.kill_player(player)
-                                break
-
-                # checking for crossing over vertical borders
-                if point_list[-1][1] >= self.graph_top_edge or point_list[-1][1] <= self.graph_bottom_edge:
-                    self.stop_shooting()
-                    return
-
-                # checking for crossing over horizontal borders
-                if abs(game.formula_current_x) >= game.x_edge:
-                    self.stop_shooting()
-                    return
-
-            except Exception as exception:
+            first = game.shot_revealed
+            last = min(first + segments_per_tick, game.shot_events[-1].index)
+            self.trail.extend(game.shot_points[self.trail.point_count:last + 1])  # adding new segments
+            game.shot_revealed = last
+
+            # applying events which happened on the revealed part
+            while game.shot_events and game.shot_events[0].index <= last:
+                event = game.shot_events.pop(0)
+                if event.kind == HIT_PLAYER:
+                    self.kill_player(event.target)
+                    continue
+                if event.kind == HIT_OBSTACLE:
+                    self.obstacle_hit(game.shot)
                 self.stop_shooting()
-                if exception == ZeroDivisionError:
-                    print('Zero dividing found! Shoot stopped!')
-                elif exception == ArgumentOutOfRange:
-                    print('Argument error! Shoot stopped!')
-                else:
-                    print('some error occurred!', exception)
+                return
+
+    def update_preview(self):
+        """checking the typed formula once per frame, only if it or active player has changed"""
+        field = self.formula_field
+        shooter = self.window.lobby.game.active_player
+        if not field.changed and self.preview.shooter == (shooter.x, shooter.y, shooter.left_player):
+            return
+        field.changed = False
+        if not self.preview.update(field.text, self.window.lobby.game):
+            return
+        self.formula_status.text = self.preview.message
+        self.preview_trail.clear()
+        self.preview_trail.extend(transform_points(self.graph_transform, self.preview.points))
 
     def stop_shooting(self):
         game = self.window.lobby.game
@@ -620,8 +421,10 @@ class GameView(View):
         time.sleep(1 / 60)
         game.shooting = False
         game.formula = None
-        game.formula_current_x = None
-        game.formula_segments = None
+        game.shot = None
+        game.shot_points = None
+        game.shot_events = []
+        self.trail.clear()
         self.pass_turn_to_next_player()  # passing turn to the next player
 
     def on_draw(self):
@@ -632,8 +435,11 @@ class GameView(View):
             text.draw()
         self.bottom_panel_draw()
         self.obstacles_draw()
-        if self.window.lobby.game.formula_segments:  # if there is a formula to draw
+        if self.window.lobby.game.shooting:  # if there is a formula to draw
             self.draw_formula()
+        elif not self.bot_turn:  # preview of the typed formula
+            self.preview_trail.draw()
+            self.formula_status.draw()
         self.players_draw()
         self.manager.draw()
 
@@ -646,34 +452,16 @@ class GameView(View):
 
         arcade.finish_render()
 
-    def create_obstacles_batch(self):
+    def create_obstacles_render(self):
         game = self.window.lobby.game
-        self.obstacles_batch = pyglet.graphics.Batch()  # creating new batch
-        self.obstacle_body_batch_shapes = []
-        self.obstacle_border_batch_shapes = []
-        for polygon in game.obstacles:
-
-            # creating obstacle body from triangles
-            triangles = arcade.earclip.earclip(polygon)
-            obstacle = []
-            for tr in triangles:
-                obstacle.append(pyglet.shapes.Triangle(tr[0][0], tr[0][1], tr[1][0], tr[1][1], tr[2][0], tr[2][1],
-                                                       game.obstacles_color, batch=self.obstacles_batch))
-            self.obstacle_body_batch_shapes.append(obstacle)
-
-            # creating obstacle border
-            last_point = polygon[-1]
-            border = []
-            for point in polygon:
-                border.append(pyglet.shapes.Line(last_point[0], last_point[1], point[0], point[1],
-                                                 width=int(2 * self.window.scale),
-                                                 color=game.obstacles_border_color, batch=self.obstacles_batch))
-                last_point = point
-            self.obstacle_border_batch_shapes.append(border)
+        # pyglet shapes used only first 4 components of border color, so it's the same here
+        self.obstacles_render = ObstacleRenderStore(self.graph_transform, game.obstacles_color,
+                                                    game.obstacles_border_color[:4], int(2 * self.window.scale))
+        for obstacle_id, polygon in game.obstacles.items():
+            self.obstacles_render.add(obstacle_id, polygon)
 
     def obstacles_draw(self):
-        batch = self.obstacles_batch
-        batch.draw()
+        self.obstacles_render.draw()
 
     def players_draw(self):
         self.window.lobby.game.players_sprites_list.draw()
@@ -683,14 +471,14 @@ class GameView(View):
             if player == self.window.lobby.game.active_player:
                 player.nick.color = (212, 28, 15)
                 player.nick.bold = True
-            elif not player.alive:
+            elif player in self.dead_players:
                 player.nick.color = color.BLACK
             else:
                 player.nick.color = (255, 255, 255)
             player.nick.draw()
 
     def draw_formula(self):
-        self.window.lobby.game.formula_segments.draw()
+        self.trail.draw()
 
     def bottom_panel_draw(self):
         window = self.window
@@ -19,9 +19,12 @@ import os
 import random
 import sys
 
+from bot import BotTurnExecutor
 from player import Player
-from arcade import View, Window, gui, load_texture
+from arcade import View, Window, gui
+from assets import load_texture, load_scaled_texture
 from game import Game, GameView
+from trajectory import COLLISION_POINTS
 from UIFixedElements import *
 
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
@@ -43,10 +46,19 @@ class Lobby:
         self.marks_frequency: int = 5
         self.max_time_s: int = 90
         self.obstacle_frequency: int = 20
+        self.collision_mode: str = COLLISION_POINTS
+        self.bot_difficulty: str = 'normal'
+        self.bots: BotTurnExecutor = None  # created when computer player moves for the first time
         self.game_field_width: float = Game._proportion_x2y_max
         self.y_axis_limit: int = 16
         self.x_axis_limit: int = int(self.y_axis_limit * self.game_field_width)
 
+    def close(self):
+        """stopping bot worker processes, must be called when the lobby is left or the window is closed"""
+        if self.bots is not None:
+            self.bots.shutdown()
+            self.bots = None
+
 
 class LobbyView(View):
 
@@ -61,7 +73,7 @@ class LobbyView(View):
         window.lobby.game: Game = None
         self.add_ui()
 
-        self.background = load_texture('textures/Lobby_BG_4k.jpg')
+        self.background = load_scaled_texture('textures/Lobby_BG_4k.jpg', window.SCREEN_HEIGHT)
 
         self.clients_sprites = []  # To keep avatar sprites
         self.client_names = []  # Keeps arcade.Text objects with names of clients
@@ -475,6 +487,7 @@ class LobbyView(View):
         self.clients_sprites_refresh()
 
     def exit_lobby(self, event):
+        self.lobby.close()
         from menu import MenuView
         view = MenuView(self.window)
         self.window.show_view(view)
@@ -491,6 +504,7 @@ class LobbyView(View):
         game.proportion_x2y = self.lobby.game_field_width
         game.max_time_s = self.lobby.max_time_s
         game.obstacle_frequency = self.lobby.obstacle_frequency
+        game.collision_mode = self.lobby.collision_mode
 
         # adding players from lobby
         for player in self.window.lobby.team1:
@@ -16,6 +16,7 @@ If not, see <https://www.gnu.org/licenses/>.
 """
 
 import json
+import multiprocessing
 import os.path
 import string
 import sys
@@ -23,11 +24,13 @@ import sys
 import arcade
 import pyglet.image
 from pyglet.window import ImageMouseCursor
-from arcade import Window, get_screens, get_display_size, load_texture, load_texture_pair
+from arcade import Window, get_screens, get_display_size
 
 from UIFixedElements import FixedUITextureToggle, FixedUITextureButton, AdvancedUIInputText
+from assets import AssetLoader, load_texture, use_ui_atlas, PRIORITY_MENU, PRIORITY_LOBBY, PRIORITY_GAME
 from client import Client
 from menu import MenuView
+from splash import SplashView
 
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     os.chdir(sys._MEIPASS)
@@ -55,6 +58,7 @@ def game_configure(window: Window):
 
     window.GRAPH_BG_COLOR_HEX = config['GRAPH_BG_COLOR_HEX']
     window.GRAPH_LINES_COLOR_HEX = config['GRAPH_LINES_COLOR_HEX']
+    window.RECORD_REPLAYS = config.get('RECORD_REPLAYS', 0)  # replays are saved only if user turns it on
 
     if window.FULLSCREEN_MODE:
         if window.SELECTED_MONITOR > len(get_screens()):
@@ -86,33 +90,34 @@ def game_configure(window: Window):
         window.client.avatar = load_texture('textures/default_avatar.jpg')
 
 
-def preload_textures():
-    load_texture('textures/user_avatar.jpg')
-    load_texture('textures/default_avatar.jpg')
-    load_texture('textures/GameBackground_4k.jpg')
-    load_texture('textures/bottom_panel_4k.jpg')
-    load_texture('textures/MainMenuBackgroundLogo.png')
-    load_texture('textures/Settings_button_2048.png')
-    load_texture('textures/Lobby_BG_4k.jpg')
-    load_texture_pair('textures/player_sprite.png')
-    load_texture_pair('textures/player_sprite_dead.png')
-    load_texture('textures/fire_button.png')
-    load_texture('textures/fire_button_hovered.png')
-    load_texture('textures/fire_button_disabled.png')
-    load_texture('textures/fire_button_pressed.png')
-    load_texture('textures/LobbyExitButton.png')
-    load_texture('textures/LobbyExitButton_hovered.png')
-    load_texture('textures/square_checkBox_pressed.png')
-    load_texture('textures/square_checkBox_empty.png')
-    load_texture('textures/skip_vote_button.png')
-    load_texture('textures/skip_vote_button_hovered.png')
-    load_texture('textures/LobbyPlayButton.png')
-    load_texture('textures/LobbyPlayButton_hovered.png')
-    load_texture('textures/LobbyAddBotButton.png')
-    load_texture('textures/LobbyAddBotButton_hovered.png')
-    load_texture('textures/LobbySettingsBox.png')
-    load_texture('textures/CheckBoxBlue_empty.png')
-    load_texture('textures/CheckBoxBlue_pressed.png')
+# textures loaded in background, the menu ones are needed first
+textures_to_load = {
+    PRIORITY_MENU: ['textures/MainMenuBackgroundLogo.png', 'textures/Settings_button_2048.png',
+                    'textures/Settings_button_2048_hover.png', 'textures/SoloGame_button_2048.png',
+                    'textures/SoloGame_button_2048_hover.png', 'textures/Multiplayer_button_2048.png',
+                    'textures/Multiplayer_button_2048_hover.png', 'textures/Exit_button_2048.png',
+                    'textures/Exit_button_2048_hover.png', 'textures/AvatarBox_menu.png',
+                    'textures/NickBox_menu.png', 'textures/user_avatar.jpg', 'textures/default_avatar.jpg'],
+    PRIORITY_LOBBY: ['textures/Lobby_BG_4k.jpg', 'textures/LobbyPlayButton.png',
+                     'textures/LobbyPlayButton_hovered.png', 'textures/LobbyExitButton.png',
+                     'textures/LobbyExitButton_hovered.png', 'textures/LobbyAddBotButton.png',
+                     'textures/LobbyAddBotButton_hovered.png', 'textures/LobbySettingsBox.png',
+                     'textures/CheckBoxBlue_empty.png', 'textures/CheckBoxBlue_pressed.png',
+                     'textures/avatar_close_32px.png', 'textures/avatar_close_32px_hovered.png',
+                     'textures/team_swap_32px.png'],
+    PRIORITY_GAME: ['textures/GameBackground_4k.jpg', 'textures/bottom_panel_4k.jpg', 'textures/fire_button.png',
+                    'textures/fire_button_hovered.png', 'textures/fire_button_disabled.png',
+                    'textures/fire_button_pressed.png', 'textures/square_checkBox_pressed.png',
+                    'textures/square_checkBox_empty.png', 'textures/skip_vote_button.png',
+                    'textures/skip_vote_button_hovered.png', 'textures/player_sprite.png',
+                    'textures/player_sprite_dead.png'],
+}
+
+
+def request_textures(window, loader: AssetLoader):
+    for priority, paths in textures_to_load.items():
+        for path in paths:
+            loader.request(path, priority, window.SCREEN_HEIGHT)
 
 
 def preload_texts(window):
@@ -178,29 +183,46 @@ def main():
             "GRAPH_BG_COLOR_HEX": "#0b0112",
             "GRAPH_LINES_COLOR_HEX": "#6c31e0",
             "client_name": "User",
-            "client_avatar": "textures/default_avatar.jpg"
+            "client_avatar": "textures/default_avatar.jpg",
+            "RECORD_REPLAYS": 0
         }
         with open(config_path, 'w') as file:
             json.dump(config, file, indent=4)
 
     math_graph = Window(antialiasing=True, vsync=True)
+    use_ui_atlas(math_graph.ctx)  # UI textures are drawn from one sheet
     game_configure(math_graph)
-    menu_view = MenuView(math_graph)
-    math_graph.show_view(menu_view)
 
-    preload_textures()  # caching textures before run
-    preload_texts(math_graph)  # glyphs building
-    preload_UI(math_graph)  # caching UI elements
+    # textures are loaded in background while splash and then menu are shown
+    loader = AssetLoader(math_graph.ctx)
+    request_textures(math_graph, loader)
 
+    def load(delta_time):
+        loader.update(delta_time)
+        if loader.done():
+            arcade.unschedule(load)
+            loader.shutdown()
+            preload_UI(math_graph)  # caching UI elements
+
+    def show_menu():
+        preload_texts(math_graph)  # glyphs building
+        math_graph.show_view(MenuView(math_graph))
+
+    arcade.schedule(load, 1 / 60)
+    math_graph.show_view(SplashView(math_graph, loader, PRIORITY_MENU, show_menu))
     math_graph.run()
+    if math_graph.lobby:
+        math_graph.lobby.close()
 
 
-try:
-    main()
-except Exception as e:
-    if getattr(sys, 'frozen', False):
-        report_path = os.path.dirname(sys.executable)+'/crash_report.txt'
-    else:
-        report_path = 'crash_report.txt'
-    with open(report_path, 'w') as file:
-        file.write(str(e))  # creating file with error
+if __name__ == '__main__':  # bot worker processes import this module too, they mustn't open the window
+    multiprocessing.freeze_support()
+    try:
+        main()
+    except Exception as e:
+        if getattr(sys, 'frozen', False):
+            report_path = os.path.dirname(sys.executable)+'/crash_report.txt'
+        else:
+            report_path = 'crash_report.txt'
+        with open(report_path, 'w') as file:
+            file.write(str(e))  # creating file with error
@@ -0,0 +1,154 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Binary map format: everything generated for the game field (spawn points, obstacles and their colors)
+in graph coordinates, so maps can be pregenerated, shared by id and loaded without generation.
+
+File layout (little-endian), every part is aligned to 4 bytes:
+    header         see header_format below
+    spawn points   float32 array of shape (players, 2), in the order of game.all_players
+    offsets        uint32 array of obstacles + 1 indexes of the first vertex of every obstacle
+    vertices       float32 array of shape (all vertices, 2)
+"""
+
+import hashlib
+import struct
+
+import numpy as np
+
+from obstacles import ObstacleStore
+
+magic = b'MGMP'
+version = 1
+# magic, version, reserved, seed, proportion_x2y, y_edge, players, obstacles, obstacles color, border color
+header_format = '<4sHHqffII4B4B'
+header_size = struct.calcsize(header_format)
+
+
+class MapFormatError(Exception):
+    pass
+
+
+class GameMap:
+    """Spawn points and obstacles of one game. Arrays may be views of memory mapped file"""
+
+    def __init__(self, seed: int, proportion_x2y: float, y_edge: float, spawn_points: np.ndarray,
+                 offsets: np.ndarray, vertices: np.ndarray, obstacles_color: tuple, obstacles_border_color: tuple):
+        self.seed = seed  # seed which the map was generated with, -1 if unknown
+        self.proportion_x2y = proportion_x2y
+        self.y_edge = y_edge
+        self.spawn_points = spawn_points
+        self.offsets = offsets
+        self.vertices = vertices
+        self.obstacles_color = obstacles_color  # RGBA
+        self.obstacles_border_color = obstacles_border_color  # RGBA
+        self._id = None
+
+    @classmethod
+    def from_game(cls, game):
+        """map of the prepared game (GameSimulation or Game)"""
+        polygons = [np.asarray(polygon, dtype=np.float32).reshape(-1, 2) for polygon in game.obstacles.values()]
+        offsets = np.zeros(len(polygons) + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum([len(polygon) for polygon in polygons])
+        vertices = np.concatenate(polygons) if polygons else np.empty((0, 2), dtype=np.float32)
+        spawn_points = np.array([(player.x, player.y) for player in game.all_players], dtype=np.float32)
+        return cls(game.map_seed if game.map_seed is not None else -1, game.proportion_x2y, game.y_edge,
+                   spawn_points.reshape(-1, 2), offsets, vertices, tuple(game.obstacles_color[:4]),
+                   tuple(game.obstacles_border_color[:4]))
+
+    @property
+    def map_id(self) -> str:
+        """hash of the map content, the same maps have the same id on every machine"""
+        if self._id is None:
+            self._id = hashlib.sha1(self.to_bytes()).hexdigest()[:16]
+        return self._id
+
+    @property
+    def obstacles_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def polygons(self) -> list:
+        """obstacles as lists of (x, y) tuples"""
+        points = self.vertices.tolist()
+        offsets = self.offsets.tolist()
+        return [[tuple(point) for point in points[start:end]] for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def apply(self, game):
+        """placing players and obstacles of the map in the game (it must have the same number of players)"""
+        if len(game.all_players) != len(self.spawn_points):
+            raise MapFormatError(f'map is made for {len(self.spawn_points)} players, '
+                                 f'but game has {len(game.all_players)}')
+        game.proportion_x2y = self.proportion_x2y
+        game.y_edge = self.y_edge
+        game.x_edge = self.y_edge * self.proportion_x2y
+        game.map_seed = None
+        game.obstacles_color = self.obstacles_color
+        game.obstacles_border_color = self.obstacles_border_color
+
+        for player, (x, y) in zip(game.all_players, self.spawn_points.tolist()):
+            player.x = x
+            player.y = y
+        game.obstacles = ObstacleStore(cell_size=100 * game.px)
+        for polygon in self.polygons():
+            game.obstacles.add(polygon)
+
+    def to_bytes(self) -> bytes:
+        header = struct.pack(header_format, magic, version, 0, self.seed, self.proportion_x2y, self.y_edge,
+                             len(self.spawn_points), self.obstacles_count, *self.obstacles_color,
+                             *self.obstacles_border_color)
+        return b''.join((header, np.ascontiguousarray(self.spawn_points, dtype='<f4').tobytes(),
+                         np.ascontiguousarray(self.offsets, dtype='<u4').tobytes(),
+                         np.ascontiguousarray(self.vertices, dtype='<f4').tobytes()))
+
+    @classmethod
+    def from_buffer(cls, data):
+        """map reading arrays directly from the buffer (bytes or memmap) without copying"""
+        data = np.frombuffer(data, dtype=np.uint8) if not isinstance(data, np.ndarray) else data
+        if len(data) < header_size:
+            raise MapFormatError('file is too short')
+        (file_magic, file_version, _, seed, proportion_x2y, y_edge, players, obstacles,
+         *colors) = struct.unpack(header_format, data[:header_size].tobytes())
+        if file_magic != magic:
+            raise MapFormatError('not a map file')
+        if file_version != version:
+            raise MapFormatError(f'unsupported map version {file_version}')
+
+        position = header_size
+        vertices_position = position + 8 * players + 4 * (obstacles + 1)
+        if len(data) < vertices_position:
+            raise MapFormatError('file is damaged')
+        spawn_points = data[position:position + 8 * players].view('<f4').reshape(-1, 2)
+        position += 8 * players
+        offsets = data[position:vertices_position].view('<u4')
+        # every obstacle must have at least 3 vertices, which follow the vertices of the previous one
+        if offsets[0] != 0 or (np.diff(offsets.astype(np.int64)) < 3).any():
+            raise MapFormatError('file is damaged')
+        if len(data) != vertices_position + 8 * int(offsets[-1]):
+            raise MapFormatError('file is damaged')
+        vertices = data[vertices_position:].view('<f4').reshape(-1, 2)
+        return cls(seed, proportion_x2y, y_edge, spawn_points, offsets, vertices, tuple(colors[:4]),
+                   tuple(colors[4:]))
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str, memory_map: bool = True):
+        if memory_map:
+            return cls.from_buffer(np.memmap(path, dtype=np.uint8, mode='r'))
+        with open(path, 'rb') as file:
+            return cls.from_buffer(file.read())
@@ -16,7 +16,8 @@ If not, see <https://www.gnu.org/licenses/>.
 """
 import time
 
-from arcade import View, gui, load_texture
+from arcade import View, gui
+from assets import load_texture, load_scaled_texture
 from UIFixedElements import *
 from lobby import Lobby
 from player import Player
@@ -26,7 +27,10 @@ class MenuView(View):
 
     def __init__(self, window):
         super().__init__(window)
-        self.background = load_texture('textures/MainMenuBackgroundLogo.png')
+        self.background = load_scaled_texture('textures/MainMenuBackgroundLogo.png', window.SCREEN_HEIGHT)
+        self.avatar_sprites = arcade.SpriteList()  # avatar, its box and nick box
+        self.nick_text: arcade.Text = None
+        self.avatar_state = None  # (width, height, name, avatar) which the avatar hud was built for
         self.manager = gui.UIManager()  # for all gui elements
         self.manager.enable()
         self.add_ui()
@@ -38,15 +42,16 @@ class MenuView(View):
         self.manager.disable()
 
     def add_ui(self):
-        settings_texture = load_texture('textures/Settings_button_2048.png')
-        solo_game_texture = load_texture('textures/SoloGame_button_2048.png')
-        multiplayer_texture = load_texture('textures/Multiplayer_button_2048.png')
-        exit_texture = load_texture('textures/Exit_button_2048.png')
+        height = self.window.SCREEN_HEIGHT
+        settings_texture = load_scaled_texture('textures/Settings_button_2048.png', height)
+        solo_game_texture = load_scaled_texture('textures/SoloGame_button_2048.png', height)
+        multiplayer_texture = load_scaled_texture('textures/Multiplayer_button_2048.png', height)
+        exit_texture = load_scaled_texture('textures/Exit_button_2048.png', height)
 
-        settings_texture_hover = load_texture('textures/Settings_button_2048_hover.png')
-        solo_game_texture_hover = load_texture('textures/SoloGame_button_2048_hover.png')
-        multiplayer_texture_hover = load_texture('textures/Multiplayer_button_2048_hover.png')
-        exit_texture_hover = load_texture('textures/Exit_button_2048_hover.png')
+        settings_texture_hover = load_scaled_texture('textures/Settings_button_2048_hover.png', height)
+        solo_game_texture_hover = load_scaled_texture('textures/SoloGame_button_2048_hover.png', height)
+        multiplayer_texture_hover = load_scaled_texture('textures/Multiplayer_button_2048_hover.png', height)
+        exit_texture_hover = load_scaled_texture('textures/Exit_button_2048_hover.png', height)
 
         self.solo_game_button = FixedUITextureButton(texture_hovered=solo_game_texture_hover,
                                                      texture=solo_game_texture, size_hint=(1, 0.32))
@@ -111,37 +116,51 @@ class MenuView(View):
         arcade.finish_render()
 
     def avatar_draw(self):
+        client = self.window.client
+        state = (self.window.width, self.window.height, client.name, client.avatar)
+        if state != self.avatar_state:  # window is resized or name or avatar is changed
+            self.avatar_state = state
+            self.avatar_hud_build()
+        self.avatar_sprites.draw()
+        self.nick_text.draw()
+
+    def avatar_hud_build(self):
+        """creating sprites and nick text of the avatar hud, they are only drawn every frame"""
         avatar_box_textrue = load_texture('textures/AvatarBox_menu.png')
         avatar_box_scale = 0.22 * self.window.scale
         avatar_center_x = int(self.window.width - avatar_box_textrue.width * avatar_box_scale) + int(
             avatar_box_textrue.width * avatar_box_scale / 2)
         avatar_center_y = int(self.window.height - avatar_box_textrue.height * avatar_box_scale) + int(
             avatar_box_textrue.height * avatar_box_scale / 2)
-
-        # drawing avatar
-        avatar = self.window.client.avatar
-        arcade.draw_texture_rectangle(texture=avatar, center_x=avatar_center_x, center_y=avatar_center_y,
-                                      height=int(0.9 * avatar_box_textrue.height * avatar_box_scale),
-                                      width=int(0.9 * avatar_box_textrue.height * avatar_box_scale))
-        # drawing hud
-        arcade.draw_texture_rectangle(center_x=avatar_center_x, center_y=avatar_center_y,
-                                      width=int(avatar_box_textrue.width * avatar_box_scale),
-                                      height=int(avatar_box_textrue.height * avatar_box_scale),
-                                      texture=avatar_box_textrue)
+        self.avatar_sprites.clear()
+
+        # avatar
+        avatar = arcade.Sprite(self.window.client.avatar, center_x=avatar_center_x, center_y=avatar_center_y)
+        avatar.width = int(0.9 * avatar_box_textrue.height * avatar_box_scale)
+        avatar.height = int(0.9 * avatar_box_textrue.height * avatar_box_scale)
+        self.avatar_sprites.append(avatar)
+        # hud
+        avatar_box = arcade.Sprite(avatar_box_textrue, center_x=avatar_center_x, center_y=avatar_center_y)
+        avatar_box.width = int(avatar_box_textrue.width * avatar_box_scale)
+        avatar_box.height = int(avatar_box_textrue.height * avatar_box_scale)
+        self.avatar_sprites.append(avatar_box)
 
         nick_box_texture = load_texture('textures/NickBox_menu.png')
         nick_center_x = int(self.window.width - nick_box_texture.width * avatar_box_scale + int(
             nick_box_texture.width * avatar_box_scale / 2))
         nick_center_y = int(self.window.height - (nick_box_texture.height + avatar_box_textrue.height)
                             * avatar_box_scale) + int(nick_box_texture.height * avatar_box_scale / 2)
-        arcade.draw_texture_rectangle(nick_center_x, nick_center_y,
-                                      int(nick_box_texture.width * avatar_box_scale),
-                                      int(nick_box_texture.height * avatar_box_scale), texture=nick_box_texture)
-        # drawing nick
-        arcade.Text(text=self.window.client.name, multiline=False, bold=True, color=(10, 242, 255),
-                    start_x=int(self.window.width - avatar_box_textrue.width * avatar_box_scale / 2),
-                    start_y=nick_center_y + int(0.12 * self.window.scale * nick_box_texture.height * avatar_box_scale),
-                    anchor_y='center', anchor_x='center', font_size=int(24 * self.window.scale)).draw()
+        nick_box = arcade.Sprite(nick_box_texture, center_x=nick_center_x, center_y=nick_center_y)
+        nick_box.width = int(nick_box_texture.width * avatar_box_scale)
+        nick_box.height = int(nick_box_texture.height * avatar_box_scale)
+        self.avatar_sprites.append(nick_box)
+
+        # nick
+        self.nick_text = arcade.Text(
+            text=self.window.client.name, multiline=False, bold=True, color=(10, 242, 255),
+            start_x=int(self.window.width - avatar_box_textrue.width * avatar_box_scale / 2),
+            start_y=nick_center_y + int(0.12 * self.window.scale * nick_box_texture.height * avatar_box_scale),
+            anchor_y='center', anchor_x='center', font_size=int(24 * self.window.scale))
 
     def on_show_view(self):
         # Enable UIManager when view is shown to catch window events
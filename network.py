@@ -0,0 +1,593 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Multiplayer over TCP with asyncio. Server hosts lobbies and runs the authoritative headless game for each of them,
+clients send only their actions and receive turn events (shots with their hits and obstacle changes),
+never the state of every frame.
+
+Every message is one line of JSON with "type" field. Client starts with {"type": "hello", "name": ...}
+and then sends list_lobbies, create_lobby, join_lobby, leave_lobby, settings, switch_team, start_game and fire.
+Server answers with welcome, lobbies, lobby (state of the lobby after every change), game_started, shot, turn,
+game_over and error messages.
+Obstacles are sent as base64 of sync updates: snapshot in game_started and only delta in every shot.
+Client which can't apply the delta sends sync_obstacles and gets obstacles message with the snapshot.
+
+In lockstep lobbies every client simulates the game itself: shot message contains only formula, seed and
+checksum of obstacles after the shot, and clients fire the same formula with the same seed locally.
+Client with other checksum sends sync_obstacles and gets exact obstacles in obstacles_exact message.
+
+Server can be started separately: python network.py [port]"""
+
+import asyncio
+import base64
+import functools
+import itertools
+import json
+import math
+import random
+import sys
+
+from formula import TranslateError
+from maps import GameMap, MapFormatError
+from obstacles import ObstacleStore
+from simulation import GameSimulation, PlayerState
+from sync import SyncError, apply_update, encode_delta, encode_snapshot
+from trajectory import HIT_PLAYER, COLLISION_POINTS, COLLISION_SEGMENTS
+
+default_port = 7345
+message_limit = 2 ** 20  # max length of one message in bytes
+max_formula_length = 4096  # longer formulas are rejected, they would take too long to calculate
+max_team_size = 5
+
+# lobby settings which host can change, they have the same names as attributes of lobby.Lobby
+settings_types = {
+    'friendly_fire': bool,
+    'max_time_s': int,
+    'obstacle_frequency': int,
+    'collision_mode': str,
+    'game_field_width': float,
+    'y_axis_limit': int,
+    'lockstep': bool,
+}
+default_settings = {
+    'friendly_fire': True,
+    'max_time_s': 90,
+    'obstacle_frequency': 20,
+    'collision_mode': COLLISION_POINTS,
+    'game_field_width': GameSimulation._proportion_x2y_max,
+    'y_axis_limit': 16,
+    'lockstep': False,
+}
+# ranges of numeric settings, the same as the sliders of lobby.LobbyView allow, values out of them are clamped
+settings_ranges = {
+    'max_time_s': (30, 150),
+    'obstacle_frequency': (0, 100),
+    'game_field_width': (1.0, GameSimulation._proportion_x2y_max),
+    'y_axis_limit': (10, 100),
+}
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_bytes(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def decode_bytes(text: str) -> bytes:
+    return base64.b64decode(text)
+
+
+async def send_message(writer: asyncio.StreamWriter, message: dict):
+    writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader):
+    """next message or None if connection is closed"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        message = json.loads(line)
+    except ValueError:
+        raise ProtocolError('message is not JSON')
+    if not isinstance(message, dict) or not isinstance(message.get('type'), str):
+        raise ProtocolError('message has no type')
+    return message
+
+
+def check_settings(settings: dict) -> dict:
+    """settings converted to their types and clamped to their ranges, ProtocolError is raised if any of them
+    is wrong"""
+    result = {}
+    for key, value in settings.items():
+        if key not in settings_types:
+            raise ProtocolError(f'unknown setting {key}')
+        try:
+            result[key] = settings_types[key](value)
+        except (TypeError, ValueError, OverflowError):
+            raise ProtocolError(f'wrong value of {key}')
+        if key in settings_ranges:
+            if math.isnan(result[key]):
+                raise ProtocolError(f'wrong value of {key}')
+            low, high = settings_ranges[key]
+            result[key] = settings_types[key](min(max(result[key], low), high))
+    if result.get('collision_mode', COLLISION_POINTS) not in (COLLISION_POINTS, COLLISION_SEGMENTS):
+        raise ProtocolError('unknown collision mode')
+    return result
+
+
+class RemotePlayer(PlayerState):
+    """player connected to the server"""
+
+    def __init__(self, player_id: int, name: str, writer: asyncio.StreamWriter):
+        super().__init__(computer_player=False)
+        self.id = player_id
+        self.name = name
+        self.writer = writer
+        self.lobby = None
+
+    def info(self) -> dict:
+        return {'id': self.id, 'name': self.name}
+
+
+class NetworkLobby:
+    def __init__(self, lobby_id: int, host: RemotePlayer):
+        self.id = lobby_id
+        self.host = host
+        self.team1 = [host]
+        self.team2 = []
+        self.settings = dict(default_settings)
+        self.game: GameSimulation = None
+        self.timer_task: asyncio.Task = None
+        # shot is calculated in the thread, the game mustn't be changed by other handlers meanwhile
+        self.game_lock = asyncio.Lock()
+
+    @property
+    def members(self) -> list:
+        return self.team1 + self.team2
+
+    def state(self) -> dict:
+        return {'type': 'lobby', 'lobby_id': self.id, 'host': self.host.id,
+                'team1': [player.info() for player in self.team1],
+                'team2': [player.info() for player in self.team2],
+                'settings': self.settings, 'playing': self.game is not None}
+
+    def create_game(self) -> GameSimulation:
+        settings = self.settings
+        game = GameSimulation(list(self.team1), list(self.team2), proportion_x2y=settings['game_field_width'],
+                              y_edge=settings['y_axis_limit'], friendly_fire_enable=settings['friendly_fire'],
+                              obstacle_frequency=settings['obstacle_frequency'],
+                              collision_mode=settings['collision_mode'], max_time_s=settings['max_time_s'])
+        game.prepare()
+        if settings['lockstep']:
+            # clients get float32 map, so the server must have exactly the same state
+            GameMap.from_game(game).apply(game)
+        return game
+
+
+def create_client_game(game_started: dict) -> GameSimulation:
+    """lockstep copy of the game from game_started message, players are PlayerState with ids of remote players"""
+    settings = game_started['settings']
+    players = {}
+    for player_id in game_started['players']:
+        players[player_id] = PlayerState(computer_player=False, left_player=player_id in game_started['left_team'])
+        players[player_id].id = player_id
+    game = GameSimulation([players[player_id] for player_id in game_started['left_team']],
+                          [players[player_id] for player_id in game_started['right_team']],
+                          proportion_x2y=settings['game_field_width'], y_edge=settings['y_axis_limit'],
+                          friendly_fire_enable=settings['friendly_fire'],
+                          obstacle_frequency=settings['obstacle_frequency'],
+                          collision_mode=settings['collision_mode'], max_time_s=settings['max_time_s'])
+    game.all_players = list(players.values())  # map spawn points are in the order of server's all_players
+    GameMap.from_buffer(decode_bytes(game_started['map'])).apply(game)
+    game.active_player = player_by_id(game, game_started['active'])
+    return game
+
+
+def player_by_id(game: GameSimulation, player_id: int):
+    for player in game.all_players:
+        if player.id == player_id:
+            return player
+    raise ProtocolError(f'there is no player {player_id}')
+
+
+class GameServer:
+    """Hosts any number of lobbies in one process. All the games are simulated here and clients
+    only show the results, so they can't cheat with the hits"""
+
+    def __init__(self):
+        self.lobbies = {}  # lobby id: NetworkLobby
+        self.players = {}  # player id: RemotePlayer
+        self._ids = itertools.count(1)
+        self.server: asyncio.AbstractServer = None
+        self.connections = set()  # tasks of connection handlers
+
+    async def start(self, host: str = '127.0.0.1', port: int = default_port) -> int:
+        """starting to accept connections, returns the port (useful when port is 0)"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=message_limit)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for lobby in self.lobbies.values():
+            if lobby.timer_task:
+                lobby.timer_task.cancel()
+        if self.server:
+            self.server.close()
+        # closed connections make handlers finish normally
+        for player in list(self.players.values()):
+            player.writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        if self.server:
+            await self.server.wait_closed()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        player = None
+        self.connections.add(asyncio.current_task())
+        try:
+            hello = await read_message(reader)
+            if hello is None or hello['type'] != 'hello':
+                raise ProtocolError('hello expected')
+            player = RemotePlayer(next(self._ids), str(hello.get('name', 'NoName'))[:32], writer)
+            self.players[player.id] = player
+            await send_message(writer, {'type': 'welcome', 'player_id': player.id})
+
+            while (message := await read_message(reader)) is not None:
+                handler = getattr(self, 'on_' + message['type'], None)
+                if handler is None:
+                    await self.send_error(player, f'unknown message {message["type"]}')
+                    continue
+                try:
+                    await handler(player, message)
+                except ProtocolError as error:
+                    await self.send_error(player, str(error))
+        except (ProtocolError, ConnectionError, ValueError):  # ValueError is raised by too long line
+            pass
+        finally:
+            if player:
+                await self.leave_lobby(player)
+                del self.players[player.id]
+            writer.close()
+            self.connections.discard(asyncio.current_task())
+
+    async def send(self, player: RemotePlayer, message: dict):
+        try:
+            await send_message(player.writer, message)
+        except ConnectionError:
+            pass  # player is leaving, connection handler will remove him
+
+    async def send_error(self, player: RemotePlayer, text: str):
+        await self.send(player, {'type': 'error', 'message': text})
+
+    async def broadcast(self, lobby: NetworkLobby, message: dict):
+        await asyncio.gather(*(self.send(player, message) for player in lobby.members))
+
+    def lobby_of(self, player: RemotePlayer, host_only: bool = False) -> NetworkLobby:
+        lobby = player.lobby
+        if lobby is None:
+            raise ProtocolError('you are not in lobby')
+        if host_only and lobby.host != player:
+            raise ProtocolError('only host can do it')
+        return lobby
+
+    # handlers of client messages
+
+    async def on_list_lobbies(self, player: RemotePlayer, message: dict):
+        await self.send(player, {'type': 'lobbies', 'lobbies': [
+            {'lobby_id': lobby.id, 'host': lobby.host.name, 'players': len(lobby.members),
+             'playing': lobby.game is not None} for lobby in self.lobbies.values()]})
+
+    async def on_create_lobby(self, player: RemotePlayer, message: dict):
+        await self.leave_lobby(player)
+        lobby = NetworkLobby(next(self._ids), player)
+        lobby.settings.update(check_settings(message.get('settings', {})))
+        self.lobbies[lobby.id] = lobby
+        player.lobby = lobby
+        await self.send(player, lobby.state())
+
+    async def on_join_lobby(self, player: RemotePlayer, message: dict):
+        lobby = self.lobbies.get(message.get('lobby_id'))
+        if lobby is None:
+            raise ProtocolError('there is no such lobby')
+        if lobby.game is not None:
+            raise ProtocolError('game is already started')
+        if len(lobby.team1) >= max_team_size and len(lobby.team2) >= max_team_size:
+            raise ProtocolError('lobby is full')
+        await self.leave_lobby(player)
+        (lobby.team1 if len(lobby.team1) <= len(lobby.team2) else lobby.team2).append(player)
+        player.lobby = lobby
+        await self.broadcast(lobby, lobby.state())
+
+    async def on_leave_lobby(self, player: RemotePlayer, message: dict):
+        await self.leave_lobby(player)
+
+    async def on_settings(self, player: RemotePlayer, message: dict):
+        lobby = self.lobby_of(player, host_only=True)
+        if lobby.game is not None:
+            raise ProtocolError('game is already started')
+        lobby.settings.update(check_settings(message.get('settings', {})))
+        await self.broadcast(lobby, lobby.state())
+
+    async def on_switch_team(self, player: RemotePlayer, message: dict):
+        lobby = self.lobby_of(player)
+        if lobby.game is not None:
+            raise ProtocolError('game is already started')
+        source, target = (lobby.team1, lobby.team2) if player in lobby.team1 else (lobby.team2, lobby.team1)
+        if len(target) >= max_team_size:
+            raise ProtocolError('team is full')
+        source.remove(player)
+        target.append(player)
+        await self.broadcast(lobby, lobby.state())
+
+    async def on_start_game(self, player: RemotePlayer, message: dict):
+        lobby = self.lobby_of(player, host_only=True)
+        async with lobby.game_lock:
+            if lobby.game is not None:
+                raise ProtocolError('game is already started')
+            if not lobby.team1 or not lobby.team2:
+                raise ProtocolError('both teams must have players')
+            # generating the map in the thread, so other lobbies are not stopped
+            game = await asyncio.get_running_loop().run_in_executor(None, lobby.create_game)
+            if self.lobbies.get(lobby.id) is not lobby:
+                return  # everybody left the lobby meanwhile
+            lobby.game = game
+            game_map = GameMap.from_game(game)
+            obstacles = b'' if lobby.settings['lockstep'] else encode_snapshot(game.obstacles)
+            await self.broadcast(lobby, {'type': 'game_started', 'settings': lobby.settings,
+                                         'map': encode_bytes(game_map.to_bytes()),
+                                         'obstacles': encode_bytes(obstacles),
+                                         'players': [member.id for member in game.all_players],
+                                         'left_team': [member.id for member in game.left_team],
+                                         'right_team': [member.id for member in game.right_team],
+                                         'active': game.active_player.id})
+            lobby.timer_task = asyncio.create_task(self.turn_timer(lobby, game))
+
+    async def on_fire(self, player: RemotePlayer, message: dict):
+        formula = str(message.get('formula', ''))
+        if len(formula) > max_formula_length:
+            raise ProtocolError('formula is too long')
+        lobby = self.lobby_of(player)
+        async with lobby.game_lock:
+            await self.fire(lobby, player, formula)
+
+    async def fire(self, lobby: NetworkLobby, player: RemotePlayer, formula: str):
+        """calculating the shot in the thread, so other lobbies are not stopped, and sending its results"""
+        game = lobby.game
+        if game is None:
+            raise ProtocolError('game is not started')
+        if game.active_player != player:
+            raise ProtocolError('it is not your turn')
+        base_version = game.obstacles.version
+        seed = random.getrandbits(32)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(game.fire, formula, seed=seed))
+        except TranslateError:
+            raise ProtocolError('formula is not correct')
+        game_over = game.is_game_end()
+        active = None if game_over else game.active_player.id
+
+        if lobby.settings['lockstep']:
+            await self.broadcast(lobby, {'type': 'shot', 'player': player.id, 'formula': formula,
+                                         'seed': seed, 'checksum': game.obstacles.checksum(), 'active': active})
+            if game_over:
+                await self.finish_game(lobby)
+            return
+
+        events = []
+        for event in result.events:
+            target = event.target.id if event.kind == HIT_PLAYER else event.target
+            events.append({'index': event.index, 'kind': event.kind, 'target': target, 'point': event.point})
+        await self.broadcast(lobby, {'type': 'shot', 'player': player.id, 'formula': formula,
+                                     'seed': seed, 'events': events,
+                                     'obstacles': encode_bytes(encode_delta(game.obstacles, base_version)),
+                                     'active': active})
+        if game_over:
+            await self.finish_game(lobby)
+
+    async def on_sync_obstacles(self, player: RemotePlayer, message: dict):
+        lobby = self.lobby_of(player)
+        game = lobby.game
+        if game is None:
+            raise ProtocolError('game is not started')
+        if lobby.settings['lockstep']:  # quantized snapshot would make checksums different
+            await self.send(player, {'type': 'obstacles_exact', 'version': game.obstacles.version,
+                                     'polygons': list(game.obstacles.items())})
+            return
+        await self.send(player, {'type': 'obstacles', 'data': encode_bytes(encode_snapshot(game.obstacles))})
+
+    # game flow
+
+    async def turn_timer(self, lobby: NetworkLobby, game: GameSimulation):
+        """passing the turn when active player's time is over"""
+        while lobby.game is game:
+            await asyncio.sleep(max(game.turn_timer.time_left, 0.05))
+            async with lobby.game_lock:
+                if lobby.game is not game or not game.turn_timer.is_over():
+                    continue
+                if not game.pass_turn_to_next_player():
+                    await self.finish_game(lobby)
+                    return
+                await self.broadcast(lobby, {'type': 'turn', 'active': game.active_player.id, 'reason': 'timeout'})
+
+    async def finish_game(self, lobby: NetworkLobby):
+        game = lobby.game
+        lobby.game = None
+        if lobby.timer_task and lobby.timer_task is not asyncio.current_task():
+            lobby.timer_task.cancel()
+        lobby.timer_task = None
+        winner = None  # game's left team is made of the lobby's team1
+        if game is not None and any(player.alive for player in game.left_team):
+            winner = 'team1'
+        elif game is not None and any(player.alive for player in game.right_team):
+            winner = 'team2'
+        await self.broadcast(lobby, {'type': 'game_over', 'winner': winner})
+        await self.broadcast(lobby, lobby.state())
+
+    async def leave_lobby(self, player: RemotePlayer):
+        lobby = player.lobby
+        if lobby is None:
+            return
+        player.lobby = None
+        for team in (lobby.team1, lobby.team2):
+            if player in team:
+                team.remove(player)
+        if not lobby.members:
+            if lobby.timer_task:
+                lobby.timer_task.cancel()
+            del self.lobbies[lobby.id]
+            return
+        if lobby.host == player:
+            lobby.host = lobby.members[0]
+
+        async with lobby.game_lock:
+            game = lobby.game
+            if game is not None:
+                # player who left is dead for the rest of the game
+                player.alive = False
+                await self.broadcast(lobby, {'type': 'player_left', 'player': player.id})
+                if game.is_game_end():
+                    await self.finish_game(lobby)
+                    return
+                if game.active_player == player:
+                    game.pass_turn_to_next_player()
+                    await self.broadcast(lobby, {'type': 'turn', 'active': game.active_player.id,
+                                                 'reason': 'left'})
+        await self.broadcast(lobby, lobby.state())
+
+
+class GameClient:
+    """Connection to the server. Messages are read in background task into the queue,
+    the last lobby state is always kept in self.lobby and obstacles of the game in self.obstacles.
+    In lockstep game the whole game is simulated in self.game"""
+
+    def __init__(self):
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+        self.player_id = None
+        self.lobby = None
+        self.obstacles: ObstacleStore = None
+        self.game: GameSimulation = None  # only in lockstep game
+        self.desyncs = 0  # how many times the checksum of lockstep game was different
+        self.messages = asyncio.Queue()
+        self._reading_task: asyncio.Task = None
+
+    async def connect(self, host: str = '127.0.0.1', port: int = default_port, name: str = 'NoName'):
+        self.reader, self.writer = await asyncio.open_connection(host, port, limit=message_limit)
+        await send_message(self.writer, {'type': 'hello', 'name': name})
+        welcome = await read_message(self.reader)
+        if welcome is None or welcome['type'] != 'welcome':
+            raise ProtocolError('server did not welcome')
+        self.player_id = welcome['player_id']
+        self._reading_task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            while (message := await read_message(self.reader)) is not None:
+                try:
+                    if message['type'] == 'lobby':
+                        self.lobby = message
+                    await self.update_game(message)
+                except (KeyError, IndexError, TypeError, ValueError, AttributeError, TranslateError,
+                        MapFormatError) as error:
+                    raise ProtocolError(f'wrong {message["type"]} message') from error
+                await self.messages.put(message)
+        except (ProtocolError, ConnectionError, ValueError):  # ValueError is raised by too long line
+            pass
+        self.writer.close()
+        await self.messages.put(None)  # connection is closed
+
+    async def update_game(self, message: dict):
+        """applying game changes from message, asking for snapshot if obstacles differ from server ones"""
+        message_type = message['type']
+        if message_type == 'game_started':
+            self.game = create_client_game(message) if message['settings']['lockstep'] else None
+        elif message_type == 'game_over':
+            self.game = None
+
+        if self.game is not None:
+            game = self.game
+            if message_type == 'shot':
+                game.fire(message['formula'], seed=message['seed'])
+                if game.obstacles.checksum() != message['checksum']:
+                    self.desyncs += 1
+                    await self.send('sync_obstacles')
+            elif message_type == 'obstacles_exact':
+                game.obstacles = ObstacleStore(game.obstacles.index.cell_size)
+                game.obstacles.apply_changes(message['version'], (), {
+                    obstacle_id: [tuple(point) for point in polygon] for obstacle_id, polygon in message['polygons']})
+            elif message_type == 'player_left':
+                player_by_id(game, message['player']).alive = False
+            elif message_type == 'turn':
+                game.pass_turn_to_next_player()
+            if message.get('active') is not None:
+                game.active_player = player_by_id(game, message['active'])
+            self.obstacles = game.obstacles
+            return
+
+        data = {'game_started': 'obstacles', 'shot': 'obstacles', 'obstacles': 'data'}.get(message_type)
+        if data is None:
+            return
+        try:
+            self.obstacles = apply_update(self.obstacles or ObstacleStore(), decode_bytes(message[data]))
+        except SyncError:
+            await self.send('sync_obstacles')
+
+    async def send(self, message_type: str, **data):
+        await send_message(self.writer, {'type': message_type, **data})
+
+    async def receive(self, timeout: float = None):
+        """next message from server, None if connection is closed"""
+        return await asyncio.wait_for(self.messages.get(), timeout)
+
+    async def wait_for(self, *message_types: str, timeout: float = None) -> dict:
+        """skipping messages until the message of one of given types, error message raises ProtocolError"""
+
+        async def wait():
+            while True:
+                message = await self.messages.get()
+                if message is None:
+                    raise ConnectionError('connection is closed')
+                if message['type'] in message_types:
+                    return message
+                if message['type'] == 'error':
+                    raise ProtocolError(message['message'])
+
+        return await asyncio.wait_for(wait(), timeout)
+
+    @staticmethod
+    def load_map(game_started: dict) -> GameMap:
+        """map of the started game, players are in the order of game_started['players']"""
+        return GameMap.from_buffer(decode_bytes(game_started['map']))
+
+    async def close(self):
+        if self._reading_task:
+            self._reading_task.cancel()
+        if self.writer:
+            self.writer.close()
+
+
+async def serve(host: str = '0.0.0.0', port: int = default_port):
+    server = GameServer()
+    await server.start(host, port)
+    async with server.server:
+        await server.server.serve_forever()
+
+
+if __name__ == '__main__':
+    asyncio.run(serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else default_port))
@@ -0,0 +1,383 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+import random
+import time
+import zlib
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+
+
+class ObstacleIndex:
+    """Uniform grid over the game field. Every cell keeps ids of obstacles, which bounding box overlaps the cell,
+    so only few polygons near the point are tested precisely"""
+
+    def __init__(self, cell_size: float = 64):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y): set of obstacle ids
+        self.bounding_boxes = {}  # obstacle id: (left, bottom, right, top)
+
+    def _cells_of(self, bounding_box):
+        left, bottom, right, top = bounding_box
+        for cell_x in range(math.floor(left / self.cell_size), math.floor(right / self.cell_size) + 1):
+            for cell_y in range(math.floor(bottom / self.cell_size), math.floor(top / self.cell_size) + 1):
+                yield cell_x, cell_y
+
+    def add(self, obstacle_id, polygon):
+        xs = [point[0] for point in polygon]
+        ys = [point[1] for point in polygon]
+        bounding_box = (min(xs), min(ys), max(xs), max(ys))
+        self.bounding_boxes[obstacle_id] = bounding_box
+        for cell in self._cells_of(bounding_box):
+            self.cells.setdefault(cell, set()).add(obstacle_id)
+
+    def remove(self, obstacle_id):
+        for cell in self._cells_of(self.bounding_boxes.pop(obstacle_id)):
+            ids = self.cells[cell]
+            ids.discard(obstacle_id)
+            if not ids:
+                del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.bounding_boxes.clear()
+
+    def candidates_in_box(self, left: float, bottom: float, right: float, top: float) -> list:
+        """ids of obstacles which bounding box overlaps given box, sorted from the oldest"""
+        ids = set()
+        for cell in self._cells_of((left, bottom, right, top)):
+            ids.update(self.cells.get(cell, ()))
+        result = []
+        for obstacle_id in ids:
+            obstacle_left, obstacle_bottom, obstacle_right, obstacle_top = self.bounding_boxes[obstacle_id]
+            if obstacle_left <= right and left <= obstacle_right and obstacle_bottom <= top and bottom <= obstacle_top:
+                result.append(obstacle_id)
+        result.sort()
+        return result
+
+    def candidates(self, x: float, y: float) -> list:
+        """ids of obstacles which bounding box contains the point, sorted from the oldest"""
+        ids = self.cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)))
+        if not ids:
+            return []
+        result = []
+        for obstacle_id in ids:
+            left, bottom, right, top = self.bounding_boxes[obstacle_id]
+            if left <= x <= right and bottom <= y <= top:
+                result.append(obstacle_id)
+        result.sort()
+        return result
+
+
+class ObstacleStore:
+    """Keeps obstacle polygons under stable ids together with the spatial index of them.
+    Ids are never reused, so they stay valid after other obstacles are blown up.
+    Every change increases version and is remembered in short history, so the changes since
+    some version can be sent over network instead of all polygons"""
+
+    def __init__(self, cell_size: float = 64, history_size: int = 64):
+        self.polygons = {}  # obstacle id: polygon
+        self.index = ObstacleIndex(cell_size)
+        self.next_id = 0
+        self.version = 0
+        self.history = deque(maxlen=history_size)  # (version, removed ids, added ids) of the last changes
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def __iter__(self):
+        return iter(self.polygons)
+
+    def __getitem__(self, obstacle_id):
+        return self.polygons[obstacle_id]
+
+    def items(self):
+        return self.polygons.items()
+
+    def values(self):
+        return self.polygons.values()
+
+    def _commit(self, removed_ids, added_ids):
+        self.version += 1
+        self.history.append((self.version, tuple(removed_ids), tuple(added_ids)))
+
+    def _put(self, obstacle_id, polygon):
+        self.next_id = max(self.next_id, obstacle_id + 1)
+        self.polygons[obstacle_id] = polygon
+        self.index.add(obstacle_id, polygon)
+
+    def _remove(self, obstacle_id):
+        del self.polygons[obstacle_id]
+        self.index.remove(obstacle_id)
+
+    def add(self, polygon) -> int:
+        obstacle_id = self.next_id
+        self._put(obstacle_id, polygon)
+        self._commit((), (obstacle_id,))
+        return obstacle_id
+
+    def remove(self, obstacle_id):
+        self._remove(obstacle_id)
+        self._commit((obstacle_id,), ())
+
+    def replace(self, obstacle_id, polygons: list) -> list:
+        """replacing one obstacle with its pieces (after blow), returns ids of the pieces"""
+        self._remove(obstacle_id)
+        new_ids = []
+        for polygon in polygons:
+            if polygon:
+                new_ids.append(self.next_id)
+                self._put(self.next_id, polygon)
+        self._commit((obstacle_id,), new_ids)
+        return new_ids
+
+    def apply_changes(self, version: int, removed_ids, added_polygons: dict):
+        """applying changes made in other store (with the same ids) and taking its version"""
+        for obstacle_id in removed_ids:
+            self._remove(obstacle_id)
+        for obstacle_id, polygon in added_polygons.items():
+            self._put(obstacle_id, polygon)
+        self.version = version
+        self.history.clear()
+
+    def changes_since(self, version: int):
+        """(removed ids, added ids) which turn the store of given version into the current one,
+        None if history is too short for it (then all obstacles must be sent)"""
+        if version == self.version:
+            return [], []
+        if not self.history or self.history[0][0] > version + 1 or version > self.version:
+            return None
+        removed = set()
+        added = {}  # used as ordered set
+        for change_version, removed_ids, added_ids in self.history:
+            if change_version <= version:
+                continue
+            for obstacle_id in removed_ids:
+                if obstacle_id in added:
+                    del added[obstacle_id]
+                else:
+                    removed.add(obstacle_id)
+            added.update(dict.fromkeys(added_ids))
+        return sorted(removed), list(added)
+
+    def clear(self):
+        self.polygons.clear()
+        self.index.clear()
+        self.history.clear()
+        self.version += 1
+
+    def checksum(self) -> int:
+        """crc32 of exact ids and coordinates of all obstacles, equal stores have equal checksums"""
+        checksum = 0
+        for obstacle_id in sorted(self.polygons):
+            checksum = zlib.crc32(obstacle_id.to_bytes(8, 'little'), checksum)
+            checksum = zlib.crc32(np.asarray(self.polygons[obstacle_id], dtype=np.float64).tobytes(), checksum)
+        return checksum
+
+    def obstacle_at(self, x: float, y: float):
+        """id of the oldest obstacle containing the point or None"""
+        for obstacle_id in self.index.candidates(x, y):
+            if point_in_polygon(x, y, self.polygons[obstacle_id]):
+                return obstacle_id
+        return None
+
+    def first_hit(self, points: np.ndarray):
+        """Looking for the first point (from array of shape (n, 2)) which is inside any obstacle.
+        Returns tuple (point index, obstacle id) or None"""
+
+        if not len(points) or not self.polygons:
+            return None
+        cells = np.floor(points / self.index.cell_size).astype(np.int64).tolist()
+        occupied = self.index.cells
+        for index, (cell_x, cell_y) in enumerate(cells):
+            if (cell_x, cell_y) not in occupied:
+                continue
+            obstacle_id = self.obstacle_at(float(points[index, 0]), float(points[index, 1]))
+            if obstacle_id is not None:
+                return index, obstacle_id
+        return None
+
+    def first_crossing(self, points: np.ndarray):
+        """Looking for the first segment of polyline (points array of shape (n, 2)) which crosses
+        any obstacle edge or starts inside obstacle.
+        Returns tuple (index of segment end point, obstacle id, crossing point) or None"""
+
+        if len(points) < 2 or not self.polygons:
+            return None
+        obstacle_id = self.obstacle_at(float(points[0, 0]), float(points[0, 1]))
+        if obstacle_id is not None:
+            return 0, obstacle_id, (float(points[0, 0]), float(points[0, 1]))
+
+        lows = np.minimum(points[:-1], points[1:]).tolist()
+        highs = np.maximum(points[:-1], points[1:]).tolist()
+        for index in range(len(points) - 1):
+            candidates = self.index.candidates_in_box(lows[index][0], lows[index][1], highs[index][0],
+                                                      highs[index][1])
+            if not candidates:
+                continue
+            start, end = points[index], points[index + 1]
+            best = None
+            for obstacle_id in candidates:
+                t = segment_polygon_crossing(start, end, self.polygons[obstacle_id])
+                if t is not None and (best is None or t < best[0]):
+                    best = t, obstacle_id
+            if best:
+                t, obstacle_id = best
+                crossing = start + t * (end - start)
+                return index + 1, obstacle_id, (float(crossing[0]), float(crossing[1]))
+        return None
+
+
+class GenerationStats(NamedTuple):
+    placed: int  # obstacles which were generated
+    requested: int
+    attempts: int  # generated candidates
+    rejections: int  # candidates which collided with something
+    time: float  # in seconds
+
+
+class ObstacleGenerator:
+    """Random obstacles placed without collisions with each other and with blocked polygons (players).
+    Candidates are tested precisely only against polygons which bounding boxes overlap in the grid,
+    and the number of attempts is limited, so crowded field can't stall the generation:
+    then fewer obstacles than requested are returned"""
+
+    max_vertices = 20
+    # scale of every vertex radius is smoothed with the previous one: s[k] = 2/3 * r[k] + 1/3 * s[k - 1],
+    # so all of them are calculated at once as matrix product
+    _powers = np.arange(max_vertices)
+    _smoothing = np.tril(2 / 3 * (1 / 3) ** (_powers[:, None] - _powers[None, :]))
+    _first_scale_weights = 0.75 * (1 / 3) ** (_powers + 1)
+
+    def __init__(self, x_edge: float, y_edge: float, px: float, rng: np.random.Generator = None,
+                 attempts_per_obstacle: int = 50):
+        self.x_edge = x_edge
+        self.y_edge = y_edge
+        self.px = px
+        # seeded from random module by default, so random.seed() makes the generation repeatable
+        self.rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+        self.attempts_per_obstacle = attempts_per_obstacle
+        self.stats = None
+
+    def random_polygons(self, count: int) -> list:
+        """list of count arrays of shape (n, 2) with vertices of random polygons, generated all at once"""
+        rng = self.rng
+        max_vertices = self.max_vertices
+        vertices = rng.integers(3, max_vertices + 1, count)
+        max_radii = rng.integers(20, 150 + 3 * vertices + 1) * self.px
+        used = np.arange(max_vertices) < vertices[:, None]  # mask of vertices which exist in every polygon
+
+        # angles as parts of 2 Pi radians
+        parts = np.where(used, rng.integers(35, 101, (count, max_vertices)), 0)
+        angles = 2 * np.pi * np.cumsum(parts, axis=1) / parts.sum(axis=1, keepdims=True)
+        scales = rng.integers(25, 101, (count, max_vertices)) / 100
+        scales = scales @ self._smoothing.T + self._first_scale_weights
+
+        centers_x = rng.uniform(-self.x_edge + max_radii, self.x_edge - max_radii)
+        centers_y = rng.uniform(-self.y_edge + max_radii, self.y_edge - max_radii)
+        radii = scales * max_radii[:, None]
+        xs = centers_x[:, None] + radii * np.cos(angles)
+        ys = centers_y[:, None] + radii * np.sin(angles)
+        polygons = np.stack((xs, ys), axis=2)
+        return [polygon[:vertices_count] for polygon, vertices_count in zip(polygons, vertices.tolist())]
+
+    def generate(self, count: int, blocked_polygons: list = (), cell_size: float = 64) -> list:
+        """list of count (or less) polygons as lists of (x, y) tuples, stats are saved in self.stats"""
+        start_time = time.perf_counter()
+        index = ObstacleIndex(cell_size)
+        axes = {}  # id: separating axes data of polygon
+        for blocked_id, polygon in enumerate(blocked_polygons, start=-len(blocked_polygons)):
+            axes[blocked_id] = _separating_axes(np.asarray(polygon, dtype=np.float64))
+            index.add(blocked_id, polygon)
+
+        result = []
+        attempts = rejections = 0
+        budget = count * self.attempts_per_obstacle
+        candidates = []
+        while len(result) < count and attempts < budget:
+            if not candidates:
+                candidates = self.random_polygons(min(64, budget - attempts))
+                candidates.reverse()
+            attempts += 1
+            candidate = candidates.pop()
+            left, bottom = candidate.min(axis=0).tolist()
+            right, top = candidate.max(axis=0).tolist()
+            candidate_axes = _separating_axes(candidate)
+            if any(_are_intersecting(axes[other], candidate_axes)
+                   for other in index.candidates_in_box(left, bottom, right, top)):
+                rejections += 1
+                continue
+            obstacle = [tuple(point) for point in candidate.tolist()]
+            axes[len(result)] = candidate_axes
+            index.add(len(result), obstacle)
+            result.append(obstacle)
+
+        self.stats = GenerationStats(len(result), count, attempts, rejections, time.perf_counter() - start_time)
+        return result
+
+
+def _separating_axes(vertices: np.ndarray) -> tuple:
+    """vertices, edge normals and projection range of polygon on them, to test it many times"""
+    edges = np.empty_like(vertices)
+    edges[:-1] = vertices[1:] - vertices[:-1]
+    edges[-1] = vertices[0] - vertices[-1]
+    normals = np.column_stack((edges[:, 1], -edges[:, 0]))
+    projections = vertices @ normals.T
+    return vertices, normals.T, projections.min(axis=0), projections.max(axis=0)
+
+
+def _are_intersecting(axes_a: tuple, axes_b: tuple) -> bool:
+    """Separating axis test of polygons with prepared axes, the same as arcade.geometry one:
+    exact for convex polygons, but for concave ones it can only find intersection which doesn't exist"""
+    for (_, normals, low, high), (vertices, _, _, _) in ((axes_a, axes_b), (axes_b, axes_a)):
+        projections = vertices @ normals
+        if ((projections.max(axis=0) < low) | (high < projections.min(axis=0))).any():
+            return False
+    return True
+
+
+def point_in_polygon(x: float, y: float, polygon) -> bool:
+    """even-odd rule test, works with float coordinates (unlike pyclipper.PointInPolygon)"""
+    inside = False
+    last_x, last_y = polygon[-1]
+    for point_x, point_y in polygon:
+        if (point_y > y) != (last_y > y):
+            if x < (last_x - point_x) * (y - point_y) / (last_y - point_y) + point_x:
+                inside = not inside
+        last_x, last_y = point_x, point_y
+    return inside
+
+
+def segment_polygon_crossing(start: np.ndarray, end: np.ndarray, polygon) -> float:
+    """Parameter t in [0, 1] of the first crossing of segment start-end with polygon edges or None"""
+    vertices = np.asarray(polygon, dtype=np.float64)
+    edge_starts = vertices
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    direction = end - start
+    offsets = edge_starts - start
+
+    with np.errstate(all='ignore'):
+        denominator = direction[0] * edges[:, 1] - direction[1] * edges[:, 0]
+        t = (offsets[:, 0] * edges[:, 1] - offsets[:, 1] * edges[:, 0]) / denominator
+        u = (offsets[:, 0] * direction[1] - offsets[:, 1] * direction[0]) / denominator
+    crossing = (denominator != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    if not crossing.any():
+        return None
+    return float(t[crossing].min())
@@ -16,27 +16,24 @@ If not, see <https://www.gnu.org/licenses/>.
 """
 
 import os
-import random
 import sys
 
 import arcade
 
+from assets import load_texture_pair
 from client import Client
+from render import transform_points
+from simulation import PlayerState
 
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     os.chdir(sys._MEIPASS)
 
 
-class Player:
-    texture_left, texture_right = arcade.load_texture_pair('textures/player_sprite.png')
-    texture_left_dead, texture_right_dead = arcade.load_texture_pair('textures/player_sprite_dead.png')
-
+class Player(PlayerState):
     def __init__(self, computer_player: bool = True, client: Client = None, left_player=True, name: str = None):
+        super().__init__(computer_player, left_player)
         self.sprite = None
         self.nick = None
-        self.alive = True
-        self.computer_player = computer_player
-        self.left_player = left_player
         # keep player Client object with all information about user to display
         if client:
             self.client = client
@@ -44,42 +41,26 @@ class Player:
             self.client = Client()
             if name:
                 self.client.name = name
-        # graphic coordinates of player
-        self.x = None
-        self.y = None
 
-    def create_sprite(self, window):
-        """this method must be called after creation of the game to create the sprite,
-        bc it's coordinates depends on game parameters"""
+    @property
+    def texture(self) -> arcade.Texture:
+        """sprite of alive player looking to the enemies, textures are loaded on the first use, not at import"""
+        left, right = load_texture_pair('textures/player_sprite.png')
+        return left if self.left_player else right
+
+    @property
+    def dead_texture(self) -> arcade.Texture:
+        left, right = load_texture_pair('textures/player_sprite_dead.png')
+        return left if self.left_player else right
+
+    def create_sprite(self, window, transform):
+        """this method must be called after the game has spawned players to create the sprite,
+        transform is the affine matrix converting graph coordinates of player to the screen"""
 
-        GRAPH_TOP_EDGE = window.GRAPH_TOP_EDGE
-        GRAPH_BOTTOM_EDGE = window.GRAPH_BOTTOM_EDGE
-        GRAPH_LEFT_EDGE = int(
-            window.SCREEN_WIDTH - (GRAPH_TOP_EDGE - GRAPH_BOTTOM_EDGE) * window.lobby.game.proportion_x2y) // 2
-        GRAPH_RIGHT_EDGE = window.SCREEN_WIDTH - GRAPH_LEFT_EDGE
         player_scale = 0.35
-        while True:
-            if self.left_player:
-                rand_x = random.randint(
-                    int(GRAPH_LEFT_EDGE + self.texture_left.width * player_scale / 2 * window.scale),
-                    int(window.SCREEN_X_CENTER - self.texture_left.width * player_scale / 2 * window.scale))
-            else:
-                rand_x = random.randint(
-                    int(window.SCREEN_X_CENTER + self.texture_left.width * player_scale / 2 * window.scale),
-                    int(GRAPH_RIGHT_EDGE - self.texture_left.width * player_scale / 2 * window.scale))
-            rand_y = random.randint(int(GRAPH_BOTTOM_EDGE + 10 * window.scale
-                                        + self.texture_left.width * player_scale / 2 * window.scale),
-                                    int(GRAPH_TOP_EDGE - 10 * window.scale
-                                        - self.texture_left.width * player_scale / 2 * window.scale))
-            self.sprite = arcade.Sprite(self.texture_left if self.left_player else self.texture_right,
-                                        scale=player_scale * window.scale, center_x=rand_x, center_y=rand_y)
-            if (not window.lobby.game.players_sprites_list) or \
-                    (not arcade.check_for_collision_with_list(self.sprite, window.lobby.game.players_sprites_list)):
-                break
-        self.x = (self.sprite.center_x - window.SCREEN_X_CENTER) * window.lobby.game.x_edge * 2 / (
-                GRAPH_RIGHT_EDGE - GRAPH_LEFT_EDGE)
-        self.y = (self.sprite.center_y - (GRAPH_TOP_EDGE + GRAPH_BOTTOM_EDGE) / 2) * window.lobby.game.y_edge * 2 / (
-                GRAPH_TOP_EDGE - GRAPH_BOTTOM_EDGE)
+        center_x, center_y = transform_points(transform, (self.x, self.y))[0].tolist()
+        self.sprite = arcade.Sprite(self.texture,
+                                    scale=player_scale * window.scale, center_x=center_x, center_y=center_y)
 
         window.lobby.game.players_sprites_list.append(self.sprite)
         window.lobby.game.players_sprites_list.initialize()  # to avoid lags during first drawing
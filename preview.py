@@ -0,0 +1,81 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Live checking of the formula which is being typed: translation errors are shown before the shot
+and the graph is previewed in low resolution. Text is translated only when it was changed,
+and formulas differing only in spacing or case are taken from compile cache, so it's cheap to call every frame"""
+
+import numpy as np
+
+from formula import Formula, TranslateError, NumberError, ParenthesesError, ArityError, normalize
+from simulation import x_step_px
+from trajectory import Trajectory
+
+preview_step_px = 8 * x_step_px  # preview has 16 times less points than the shot
+preview_seed = 0  # the same noise on every update, so the preview doesn't flicker
+
+error_messages = {NumberError: 'wrong number', ParenthesesError: 'parentheses are not closed',
+                  ArityError: 'missing operand or operator'}
+
+
+class FormulaPreview:
+    def __init__(self):
+        self.key = None  # normalized text which was translated last time
+        self.text = ''  # the text which was translated last time, error positions are in it
+        self.shooter = None  # (x, y, left_player) of the shooter which the preview is made for
+        self.formula = None  # None if the text is not correct
+        self.error = None  # TranslateError of the text
+        self.points = np.empty((0, 2))  # preview graph in graph coordinates
+
+    def update(self, text: str, game) -> bool:
+        """translating the text and making preview for active player of the game (GameSimulation or Game),
+        returns True if preview was changed"""
+        key = normalize(text)
+        shooter = game.active_player
+        shooter = (shooter.x, shooter.y, shooter.left_player)
+        if key == self.key and shooter == self.shooter:
+            return False
+        if key != self.key:
+            self.key = key
+            self.text = text
+            try:
+                self.formula = Formula(text)
+                self.error = None
+            except TranslateError as error:
+                self.formula = None
+                self.error = error
+        self.shooter = shooter
+
+        self.points = np.empty((0, 2))
+        if self.formula is not None:
+            x, y, left_player = shooter
+            x_step = preview_step_px * game.px * (1 if left_player else -1)
+            trajectory = Trajectory(self.formula, x, y, x_step, game.x_edge, game.y_edge,
+                                    np.random.default_rng(preview_seed))
+            self.points = np.column_stack((trajectory.x, trajectory.y))
+        return True
+
+    @property
+    def message(self) -> str:
+        """description of the error for the player, empty if formula is correct"""
+        if self.error is None:
+            return ''
+        message = error_messages.get(type(self.error), 'unknown symbol or word')
+        if isinstance(self.error, ArityError):
+            near = self.text[self.error.position:self.error.position + 8]
+            if near:  # error at the end of formula has no text after it
+                message += f' near "{near}"'
+        return message
@@ -0,0 +1,213 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Objects which keep game graphics in GPU buffers and change only the changed part of them"""
+
+import numpy as np
+import pyglet.graphics
+import pyglet.shapes
+from arcade import earclip
+from arcade.gl import BufferDescription
+from pyglet.gl import GL_TRIANGLES, GL_BLEND, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, glEnable, glDisable, \
+    glBlendFunc
+
+
+def graph_transform(left: float, bottom: float, right: float, top: float, x_edge: float, y_edge: float) -> np.ndarray:
+    """3x3 affine matrix which maps the graph field [-x_edge, x_edge] x [-y_edge, y_edge]
+    to the screen rectangle with given edges"""
+    x_scale = (right - left) / 2 / x_edge
+    y_scale = (top - bottom) / 2 / y_edge
+    return np.array(((x_scale, 0, (left + right) / 2),
+                     (0, y_scale, (bottom + top) / 2),
+                     (0, 0, 1)))
+
+
+def transform_points(matrix: np.ndarray, points) -> np.ndarray:
+    """applying affine matrix to all points (array of shape (n, 2)) at once"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+class BlendShaderGroup(pyglet.graphics.ShaderGroup):
+    """binds shader program and enables alpha blending, the same as pyglet shapes do"""
+
+    def set_state(self):
+        super().set_state()
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    def unset_state(self):
+        glDisable(GL_BLEND)
+        super().unset_state()
+
+
+class ObstacleRenderStore:
+    """Keeps one vertex list (body and border triangles) for every obstacle in the single batch.
+    Vertex lists are found by the same stable ids as obstacles in ObstacleStore, so when obstacle is blown up,
+    only its own vertex list is rewritten and the others stay untouched.
+    Polygons are given in graph coordinates and transform is the affine matrix converting them to the screen"""
+
+    def __init__(self, transform: np.ndarray, body_color: tuple, border_color: tuple, border_width: float):
+        self.transform = transform
+        self.body_color = body_color
+        self.border_color = border_color
+        self.border_width = border_width
+        self.batch = pyglet.graphics.Batch()
+        self.program = pyglet.shapes.get_default_shader()
+        self.group = BlendShaderGroup(self.program)
+        self.vertex_lists = {}  # obstacle id: vertex list
+
+    def _vertices(self, polygon) -> tuple:
+        """screen coordinates and colors of all triangles of the obstacle"""
+        body = np.asarray(earclip.earclip(polygon), dtype=np.float64).reshape(-1, 2)
+        screen = transform_points(self.transform, np.concatenate((body, np.asarray(polygon, dtype=np.float64))))
+        body, points = screen[:len(body)], screen[len(body):]
+
+        # every border line is a quad made of 2 triangles
+        starts = np.roll(points, 1, axis=0)
+        directions = points - starts
+        lengths = np.linalg.norm(directions, axis=1, keepdims=True)
+        normals = np.column_stack((-directions[:, 1], directions[:, 0])) / np.where(lengths, lengths, 1)
+        offsets = normals * self.border_width / 2
+        border = np.stack((starts - offsets, points - offsets, points + offsets,
+                           starts - offsets, points + offsets, starts + offsets), axis=1).reshape(-1, 2)
+
+        positions = np.concatenate((body, border)).ravel()
+        colors = self.body_color * len(body) + self.border_color * len(border)
+        return positions, colors
+
+    def add(self, obstacle_id, polygon):
+        positions, colors = self._vertices(polygon)
+        count = len(positions) // 2
+        self.vertex_lists[obstacle_id] = self.program.vertex_list(
+            count, GL_TRIANGLES, batch=self.batch, group=self.group,
+            position=('f', positions), colors=('Bn', colors), translation=('f', (0, 0) * count))
+
+    def remove(self, obstacle_id):
+        self.vertex_lists.pop(obstacle_id).delete()
+
+    def replace(self, obstacle_id, pieces: dict):
+        """replacing obstacle with its pieces ({id: polygon}), the vertex list of the old obstacle
+        is reused for the first piece"""
+        vertex_list = self.vertex_lists.pop(obstacle_id)
+        if not pieces:
+            vertex_list.delete()
+            return
+
+        pieces = iter(pieces.items())
+        piece_id, polygon = next(pieces)
+        positions, colors = self._vertices(polygon)
+        count = len(positions) // 2
+        if count != vertex_list.count:
+            vertex_list.resize(count)
+        vertex_list.position[:] = positions
+        vertex_list.colors[:] = colors
+        vertex_list.translation[:] = (0, 0) * count
+        self.vertex_lists[piece_id] = vertex_list
+
+        for piece_id, polygon in pieces:
+            self.add(piece_id, polygon)
+
+    def clear(self):
+        for vertex_list in self.vertex_lists.values():
+            vertex_list.delete()
+        self.vertex_lists.clear()
+
+    def draw(self):
+        self.batch.draw()
+
+
+class TrailRenderer:
+    """Formula graph line kept in one growable GPU buffer. Every segment of line is a quad of 2 triangles,
+    new points are written after the old ones and only the number of drawn vertices grows,
+    so drawing cost doesn't depend on how long the shot is going"""
+
+    vertex_shader = """
+        #version 330
+        uniform WindowBlock {
+            mat4 projection;
+            mat4 view;
+        } window;
+        in vec2 in_vert;
+        void main() {
+            gl_Position = window.projection * window.view * vec4(in_vert, 0.0, 1.0);
+        }
+    """
+    fragment_shader = """
+        #version 330
+        uniform vec4 color;
+        out vec4 fragColor;
+        void main() {
+            fragColor = color;
+        }
+    """
+
+    def __init__(self, ctx, line_color: tuple, line_width: float, capacity: int = 4096):
+        self.ctx = ctx
+        self.line_width = line_width
+        self.capacity = capacity  # in vertices
+        self.vertices = np.empty((capacity, 2), dtype=np.float32)  # copy of buffer data to refill grown buffer
+        self.vertex_count = 0
+        self.point_count = 0  # amount of line points written
+        self.last_point = None
+        self.buffer = ctx.buffer(reserve=capacity * 8)
+        self.geometry = ctx.geometry([BufferDescription(self.buffer, '2f', ['in_vert'])], mode=ctx.TRIANGLES)
+        self.program = ctx.program(vertex_shader=self.vertex_shader, fragment_shader=self.fragment_shader)
+        self.program['color'] = tuple(component / 255 for component in line_color[:3]) + (
+            (line_color[3] if len(line_color) > 3 else 255) / 255,)
+
+    def clear(self):
+        self.vertex_count = 0
+        self.point_count = 0
+        self.last_point = None
+
+    def _grow(self, vertex_count: int):
+        self.capacity = max(vertex_count, 2 * self.capacity)
+        vertices = np.empty((self.capacity, 2), dtype=np.float32)
+        vertices[:self.vertex_count] = self.vertices[:self.vertex_count]
+        self.vertices = vertices
+        self.buffer.orphan(size=self.capacity * 8)
+        self.buffer.write(self.vertices[:self.vertex_count].tobytes())
+
+    def extend(self, points: np.ndarray):
+        """adding next points of the line (array of shape (n, 2) in screen coordinates)"""
+        if not len(points):
+            return
+        self.point_count += len(points)
+        if self.last_point is not None:
+            points = np.concatenate(([self.last_point], points))
+        self.last_point = points[-1]
+        if len(points) < 2:
+            return
+
+        starts, ends = points[:-1], points[1:]
+        directions = ends - starts
+        lengths = np.linalg.norm(directions, axis=1, keepdims=True)
+        normals = np.column_stack((-directions[:, 1], directions[:, 0])) / np.where(lengths, lengths, 1)
+        offsets = normals * self.line_width / 2
+        quads = np.stack((starts - offsets, ends - offsets, ends + offsets,
+                          starts - offsets, ends + offsets, starts + offsets), axis=1).reshape(-1, 2)
+
+        new_count = self.vertex_count + len(quads)
+        if new_count > self.capacity:
+            self._grow(new_count)
+        self.vertices[self.vertex_count:new_count] = quads
+        self.buffer.write(self.vertices[self.vertex_count:new_count].tobytes(), offset=self.vertex_count * 8)
+        self.vertex_count = new_count
+
+    def draw(self):
+        if self.vertex_count:
+            self.geometry.render(self.program, vertices=self.vertex_count)
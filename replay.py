@@ -0,0 +1,222 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Replays: the map, game settings and every turn (player, formula, seed and time) of the game.
+Shots depend only on the formula, seed and game state, so the replay is played again
+in headless game as fast as it can be calculated, and the results of every turn can be compared
+with the recorded ones to find changes of the game engine.
+
+Replays are recorded only if RECORD_REPLAYS is set in config.json, they are saved to the replays directory
+in user data directory (see paths.py). Replays of many games can be checked at once:
+python replay.py ~/.local/share/MathGraph/replays/*.json --csv outcomes.csv"""
+
+import base64
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from maps import GameMap
+from paths import user_data_directory
+from simulation import GameSimulation, PlayerState
+from trajectory import HIT_OBSTACLE
+
+replay_version = 1
+# settings which start_solo_game copies from lobby to the game
+replay_settings = ('axes_marked', 'marks_frequency', 'friendly_fire', 'y_edge', 'x_edge', 'proportion_x2y',
+                   'max_time_s', 'obstacle_frequency', 'collision_mode')
+
+
+def replays_directory() -> str:
+    return os.path.join(user_data_directory(), 'replays')
+
+
+class ReplayTurn(NamedTuple):
+    player: int  # index of player in all_players
+    formula: str  # None if the turn was passed without shot (time is over)
+    seed: int
+    time: float  # seconds since the start of the game
+    killed: tuple = ()  # indexes of killed players
+    end: str = None  # kind of the event which stopped the shot
+
+
+class TurnOutcome(NamedTuple):
+    turn: int
+    player: int
+    formula: str
+    killed: tuple
+    end: str
+    obstacle: int  # id of hit obstacle or None
+    path_length: int  # number of points of the shot path
+    matches: bool  # the same result as recorded
+
+
+class Replay:
+    def __init__(self, settings: dict, game_map: GameMap, left_team: list, right_team: list, first_player: int,
+                 names: list = None, turns: list = None):
+        self.settings = settings
+        self.game_map = game_map
+        self.left_team = left_team  # indexes of players in all_players in the order of game teams
+        self.right_team = right_team
+        self.first_player = first_player
+        self.names = names or []
+        self.turns = turns if turns is not None else []
+
+    def to_dict(self) -> dict:
+        return {'version': replay_version, 'settings': self.settings,
+                'map': base64.b64encode(self.game_map.to_bytes()).decode(), 'left_team': self.left_team,
+                'right_team': self.right_team, 'first_player': self.first_player, 'names': self.names,
+                'turns': [list(turn) for turn in self.turns]}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if data.get('version') != replay_version:
+            raise ValueError(f'unsupported replay version {data.get("version")}')
+        turns = [ReplayTurn(player, formula, seed, turn_time, tuple(killed), end)
+                 for player, formula, seed, turn_time, killed, end in data['turns']]
+        return cls(data['settings'], GameMap.from_buffer(base64.b64decode(data['map'])), data['left_team'],
+                   data['right_team'], data['first_player'], data.get('names'), turns)
+
+    def save(self, path: str):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'r') as file:
+            return cls.from_dict(json.load(file))
+
+    def create_game(self) -> GameSimulation:
+        """headless game in the state of the replay start"""
+        players = [PlayerState() for _ in range(len(self.left_team) + len(self.right_team))]
+        for index in self.right_team:
+            players[index].left_player = False
+        game = GameSimulation([players[index] for index in self.left_team],
+                              [players[index] for index in self.right_team],
+                              proportion_x2y=self.settings['proportion_x2y'], y_edge=self.settings['y_edge'],
+                              friendly_fire_enable=self.settings['friendly_fire'],
+                              obstacle_frequency=self.settings['obstacle_frequency'],
+                              collision_mode=self.settings['collision_mode'], max_time_s=self.settings['max_time_s'])
+        game.all_players = players  # map spawn points are in the order of all_players
+        self.game_map.apply(game)
+        game.active_player = players[self.first_player]
+        return game
+
+
+class ReplayRecorder:
+    """Recording the game from its start. Must be created right after game.prepare().
+    The game is moved to its saved (float32) map, so replay plays on exactly the same obstacles"""
+
+    def __init__(self, game: GameSimulation):
+        self.game = game
+        self.start_time = time.monotonic()
+        players = game.all_players
+        game_map = GameMap.from_game(game)
+        game_map.apply(game)
+        settings = {name: getattr(game, name) for name in replay_settings if hasattr(game, name)}
+        names = [player.client.name if hasattr(player, 'client') else '' for player in players]
+        self.replay = Replay(settings, game_map, [players.index(player) for player in game.left_team],
+                             [players.index(player) for player in game.right_team],
+                             players.index(game.active_player), names)
+
+    def _turn(self, player, formula: str = None, seed: int = None, killed: tuple = (), end: str = None):
+        self.replay.turns.append(ReplayTurn(self.game.all_players.index(player), formula, seed,
+                                            round(time.monotonic() - self.start_time, 3), killed, end))
+
+    def record_shot(self, result):
+        """adding the shot (simulation.ShotResult) of active player"""
+        killed = tuple(self.game.all_players.index(player) for player in result.killed)
+        self._turn(result.shooter, result.formula.source, result.seed, killed, result.end.kind)
+
+    def record_pass(self):
+        """adding the turn passed without shot"""
+        self._turn(self.game.active_player)
+
+    def save(self, path: str = None) -> str:
+        """saving replay to the file (by default to the replays directory), returns its path
+        or None if it can't be written, the game mustn't fail because of it"""
+        try:
+            if path is None:
+                directory = replays_directory()
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, time.strftime('%Y-%m-%d_%H-%M-%S') + '.json')
+            self.replay.save(path)
+        except OSError:
+            return None
+        return path
+
+
+def play(replay: Replay) -> list:
+    """playing the replay in headless game without waiting, returns list of TurnOutcome"""
+    game = replay.create_game()
+    players = game.all_players
+    outcomes = []
+    for number, turn in enumerate(replay.turns):
+        player = players.index(game.active_player)
+        if turn.formula is None:
+            outcomes.append(TurnOutcome(number, player, None, (), None, None, 0, turn.player == player))
+            if not game.pass_turn_to_next_player():
+                break
+            continue
+
+        result = game.fire(turn.formula, pass_turn=False, seed=turn.seed)
+        killed = tuple(players.index(killed_player) for killed_player in result.killed)
+        obstacle = result.end.target if result.end.kind == HIT_OBSTACLE else None
+        matches = turn.player == player and killed == turn.killed and result.end.kind == turn.end
+        outcomes.append(TurnOutcome(number, player, turn.formula, killed, result.end.kind, obstacle,
+                                    len(result.points), matches))
+        if not game.pass_turn_to_next_player():
+            break
+    return outcomes
+
+
+def play_file(path: str) -> list:
+    return play(Replay.load(path))
+
+
+def play_files(paths: list, workers: int = None) -> dict:
+    """playing many replays in parallel, returns {path: outcomes}"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(play_file, paths, chunksize=16)))
+
+
+def export_outcomes(results: dict, path: str):
+    """writing outcomes of all turns of all replays ({replay path: outcomes}) to csv file"""
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(('replay',) + TurnOutcome._fields)
+        for replay_path, outcomes in results.items():
+            for outcome in outcomes:
+                writer.writerow((replay_path,) + tuple(outcome))
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    csv_path = None
+    if '--csv' in arguments:
+        csv_path = arguments.pop(arguments.index('--csv') + 1)
+        arguments.remove('--csv')
+    start = time.perf_counter()
+    results = play_files(arguments)
+    different = [path for path, outcomes in results.items() if not all(outcome.matches for outcome in outcomes)]
+    print(f'{len(results)} replays played in {time.perf_counter() - start:.2f} s, {len(different)} differ')
+    for path in different:
+        print(path)
+    if csv_path:
+        export_outcomes(results, csv_path)
@@ -19,7 +19,8 @@ import json
 import os
 import sys
 
-from arcade import gui, Text, set_background_color, color, View, load_texture
+from arcade import gui, Text, set_background_color, color, View
+from assets import load_texture
 from UIFixedElements import *
 
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
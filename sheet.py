@@ -0,0 +1,40 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Packing of small textures into one sheet. Only the layout is made here, without any image library,
+so assets.py pastes the images by it and the layout can be checked without them"""
+
+sheet_padding = 2  # transparent pixels between textures, so filtering doesn't mix neighbours
+sheet_width = 4 * 256 + 3 * sheet_padding  # four 256 px wide buttons in a shelf
+
+
+def pack_regions(sizes: dict, width: int = sheet_width, padding: int = sheet_padding) -> tuple:
+    """Packing rectangles ({name: (width, height)}) into shelves, the highest ones first, so shelves waste
+    little height. Sheet is wider than width only if one of rectangles is wider.
+    Returns ((sheet width, sheet height), {name: (left, top, width, height)}), top is counted from the top"""
+    width = max([width] + [size[0] for size in sizes.values()])
+    regions = {}
+    x = y = shelf_height = 0
+    for name, (region_width, region_height) in sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0],
+                                                                                       item[0])):
+        if x and x + region_width > width:  # next shelf
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        regions[name] = (x, y, region_width, region_height)
+        x += region_width + padding
+        shelf_height = max(shelf_height, region_height)
+    return (width, y + shelf_height), regions
@@ -0,0 +1,323 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Game rules without any graphics: players, turns, obstacles and shooting.
+Everything here is in graph coordinates and doesn't import arcade or pyglet,
+so games can be simulated on server or in tests without window"""
+
+import math
+import random
+import time
+
+import numpy as np
+import pyclipper  # for clipping obstacles
+
+from formula import Formula
+from obstacles import ObstacleStore, ObstacleGenerator
+from timer import TurnTimer
+from trajectory import Trajectory, find_hits, HIT_PLAYER, HIT_OBSTACLE, COLLISION_POINTS
+
+field_height_px = 785  # height of the game field on 1080p screen, all sizes in px below are given for it
+player_size_px = 0.35 * 128  # size of player sprite
+blow_radius_px = 25
+x_step_px = 0.5  # the size of function step
+obstacles_colors = [(207, 14, 136), (37, 252, 13), (183, 16, 230), (255, 251, 10), (0, 255, 183)]
+
+
+class PlayerState:
+    """Player as the game rules see him. Player class with sprite and client is built on it"""
+
+    def __init__(self, computer_player: bool = True, left_player: bool = True):
+        self.alive = True
+        self.computer_player = computer_player
+        self.left_player = left_player
+        # graphic coordinates of player
+        self.x = None
+        self.y = None
+
+
+class ShotResult:
+    """Everything that happened during one shot. Events are sorted along the path,
+    the last one is always the event which stopped the shot (obstacle, border or error)"""
+
+    def __init__(self, shooter, formula: Formula, trajectory: Trajectory, points: np.ndarray, events: list,
+                 seed: int = None):
+        self.shooter = shooter
+        self.formula = formula
+        self.seed = seed  # all randomness of the shot is derived from it
+        self.points = points  # path of the shot in graph coordinates, array of shape (n, 2)
+        self.events = events
+        self.end = events[-1]
+        self.killed = [event.target for event in events if event.kind == HIT_PLAYER]
+        self.obstacle_id = self.end.target if self.end.kind == HIT_OBSTACLE else None  # id of hit obstacle
+        self.new_obstacle_ids = []  # ids of the pieces of hit obstacle
+        self.obstacle_changed = False  # False if the blow didn't change hit obstacle
+
+
+class GameSimulation:
+    _proportion_x2y_max = 2.383
+
+    def __init__(self, left_team: list = None, right_team: list = None, proportion_x2y: float = 2.383,
+                 y_edge: int = 16, friendly_fire_enable: bool = True, obstacle_frequency: int = 20,
+                 collision_mode: str = COLLISION_POINTS, max_time_s: int = 150, clock=time.monotonic):
+        self.friendly_fire = friendly_fire_enable
+        self.prev_active_player = None
+        self.turn_timer = TurnTimer(max_time_s, clock)
+
+        self.obstacles = ObstacleStore()  # obstacle polygons by their ids
+        self.generation_stats = None  # GenerationStats of the last obstacles generation
+        self.map_seed = None  # seed of the generated map, None if map was loaded
+        self.obstacles_color = ()
+        self.obstacles_border_color = ()
+        self.obstacle_frequency = obstacle_frequency  # average obstacle frequency in %
+        self.collision_mode = collision_mode  # how the shot path collides with obstacles and players
+
+        # graph (game field) settings:
+        self.proportion_x2y = proportion_x2y  # height of graph is constant, but width = height*proportion_x2y
+        self.y_edge = y_edge  # y value on the edge of graph
+        self.x_edge = y_edge * proportion_x2y
+
+        # players initializing
+        self.left_team = left_team if left_team is not None else []
+        self.right_team = right_team if right_team is not None else []
+        self.all_players = self.left_team + self.right_team
+        self.active_player = None
+
+    @property
+    def max_time_s(self) -> float:
+        """time of one turn in seconds"""
+        return self.turn_timer.duration
+
+    @max_time_s.setter
+    def max_time_s(self, value: float):
+        self.turn_timer.duration = value
+
+    @property
+    def px(self) -> float:
+        """size of 1px of the game field on 1080p screen in graph units"""
+        return 2 * self.y_edge / field_height_px
+
+    def prepare(self, game_map=None, rng: random.Random = random):
+        """preparing new round: choosing the first player, spawning players and generating obstacles.
+        If game_map (maps.GameMap) is given, players and obstacles are taken from it without generation.
+        All random choices are taken from rng, so the same seeded rng prepares the same round"""
+        self.prev_active_player = None
+        self.all_players = self.left_team + self.right_team
+
+        # randomly choosing active player
+        self.active_player = rng.choice(self.all_players)
+
+        rng.shuffle(self.left_team)
+        rng.shuffle(self.right_team)
+        for player in self.right_team:
+            player.left_player = False
+            player.alive = True
+        for player in self.left_team:
+            player.left_player = True
+            player.alive = True
+
+        if game_map is not None:
+            game_map.apply(self)
+        else:
+            self.generate_map(rng.getrandbits(63))
+        self.turn_timer.start()
+
+    def generate_map(self, seed: int = None):
+        """spawning players, generating obstacles and choosing their color. All of it depends only on seed,
+        random seed is chosen if it isn't given"""
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.map_seed = seed
+        rng = random.Random(seed)
+
+        self.obstacles_color = rng.choice(obstacles_colors) + (60,)
+        self.obstacles_border_color = self.obstacles_color + (150,)
+        self.spawn_players(rng)
+        self.create_obstacles(rng)
+
+    def player_hitbox(self, player) -> tuple:
+        """(left, bottom, right, top) of player in graph units"""
+        half_size = player_size_px * self.px / 2
+        return player.x - half_size, player.y - half_size, player.x + half_size, player.y + half_size
+
+    def spawn_players(self, rng: random.Random = random):
+        """placing players randomly on their half of the field, so they don't overlap each other"""
+        half_size = player_size_px * self.px / 2
+        y_limit = self.y_edge - 10 * self.px - half_size
+        placed = []
+        for player in self.all_players:
+            for _ in range(1000):
+                if player.left_player:
+                    player.x = rng.uniform(-self.x_edge + half_size, -half_size)
+                else:
+                    player.x = rng.uniform(half_size, self.x_edge - half_size)
+                player.y = rng.uniform(-y_limit, y_limit)
+                if all(abs(player.x - other.x) > 2 * half_size or abs(player.y - other.y) > 2 * half_size
+                       for other in placed):
+                    break
+            placed.append(player)
+
+    def create_obstacles(self, rng: random.Random = random):
+        """This method generates obstacles for current game"""
+
+        px = self.px
+        self.obstacles = ObstacleStore(cell_size=100 * px)  # deleting old obstacles
+        max_polygons = int(self.obstacle_frequency * 0.8 * self.proportion_x2y / self._proportion_x2y_max)
+        players_polygons = []
+        for player in self.all_players:
+            left, bottom, right, top = self.player_hitbox(player)
+            players_polygons.append([(left, top), (right, top), (right, bottom), (left, bottom)])
+
+        generator = ObstacleGenerator(self.x_edge, self.y_edge, px, np.random.default_rng(rng.getrandbits(64)))
+        count = int(max_polygons * (1 + rng.randint(-15, 15) / 100))  # +-15% from max_polygons
+        for obstacle in generator.generate(count, players_polygons, cell_size=100 * px):
+            self.obstacles.add(obstacle)
+        self.generation_stats = generator.stats
+
+    def players_hitboxes(self) -> list:
+        """hitboxes (left, bottom, right, top) of players, who can be killed by active player"""
+        active_team = self.left_team if self.active_player in self.left_team else self.right_team
+        hitboxes = []
+        for player in self.all_players:
+            if player == self.active_player or not player.alive:
+                continue
+            if player in active_team and not self.friendly_fire:
+                continue
+            hitboxes.append((player, self.player_hitbox(player)))
+        return hitboxes
+
+    def fire(self, formula, pass_turn: bool = True, seed: int = None) -> ShotResult:
+        """Shooting by active player: calculating the whole shot and applying its results.
+        formula may be a string, then TranslateError is raised if it's not correct.
+        Renderer can pass the turn itself after shot animation by passing pass_turn=False.
+        The noise of formula and the shape of blow depend only on seed, so the same shot with the same seed
+        gives the same result in every game with the same state (random seed is chosen if it isn't given)"""
+
+        if isinstance(formula, str):
+            formula = Formula(formula)
+        shooter = self.active_player
+
+        x_step = x_step_px * self.px * (1 if shooter.left_player else -1)
+        if seed is None:
+            seed = random.getrandbits(32)
+        trajectory = Trajectory(formula, shooter.x, shooter.y, x_step, self.x_edge, self.y_edge,
+                                np.random.default_rng(seed))
+        points = np.column_stack((trajectory.x, trajectory.y))
+        events = find_hits(points, self.obstacles, self.players_hitboxes(), self.collision_mode)
+        if events and events[-1].kind == HIT_OBSTACLE:
+            hit = events[-1]
+            points = points[:hit.index + 1]
+            points[hit.index] = hit.point  # the path ends exactly where obstacle was hit
+        else:
+            events.append(trajectory.end)
+
+        result = ShotResult(shooter, formula, trajectory, points, events, seed)
+        for player in result.killed:
+            self.kill_player(player)
+        if result.obstacle_id is not None:
+            new_ids = self.obstacle_hit(result.obstacle_id, result.end.point, random.Random(seed))
+            if new_ids is not None:
+                result.obstacle_changed = True
+                result.new_obstacle_ids = new_ids
+
+        if pass_turn:
+            self.pass_turn_to_next_player()
+        return result
+
+    def kill_player(self, player):
+        """making player inactive in game if this is not active player"""
+        if player == self.active_player:
+            return None  # cannot kill himself
+        if not player.alive:
+            return None  # cannot kill dead player
+        player.alive = False
+
+    def is_game_end(self):
+
+        end = True
+        for player in self.right_team:
+            if player.alive:
+                end = False
+        if end:
+            return True
+        end = True
+        for player in self.left_team:
+            if player.alive:
+                end = False
+        return end
+
+    def pass_turn_to_next_player(self) -> bool:
+        """pass the turn to the next alive player in opposite team and restarting turn timer.
+        Returns False if the game is ended"""
+        if self.is_game_end():
+            self.turn_timer.stop()
+            return False
+
+        next_team = self.left_team.copy() if self.active_player in self.right_team else self.right_team.copy()
+        next_team.extend(next_team)  # making part of 'cycle'
+        active_player = self.active_player
+        next_team = next_team[(next_team.index(self.prev_active_player) if self.prev_active_player else -1) + 1:]
+        for player in next_team:
+            if player.alive:
+                # making first alive player active
+                self.active_player = player
+                self.prev_active_player = active_player
+                break
+        self.turn_timer.start()
+        return True
+
+    def obstacle_hit(self, obstacle_id, point: tuple, rng: random.Random = random):
+        """This method takes obstacle id from obstacles and clipping it, making blow effect.
+        It works using pyclipper library and there is no documentation at all, so
+        it's a miracle that it works. Pls, don't touch the part with pyclipper.
+
+        clipper is the polygon of "blow", it's a bit randomized and has given size as radius.
+        Returns ids of new obstacles or None if obstacle wasn't changed"""
+
+        blow_radius = blow_radius_px * self.px
+        obstacle = self.obstacles[obstacle_id]
+
+        # generating clipping polygon
+        angle_angle_sum = 0
+        angles = []
+        vertices = 8
+        for _ in range(vertices):
+            angles.append(rng.randint(85, 100))
+            angle_angle_sum += angles[-1]
+        for angle in range(vertices):
+            angles[angle] = angles[angle] / angle_angle_sum
+
+        center_x = point[0]
+        center_y = point[1]
+        clipper = []
+        for part in angles:
+            angle += 2 * math.pi * part
+            clipper.append((center_x + blow_radius * math.cos(angle), center_y + blow_radius * math.sin(angle)))
+
+        # calculating new obstacle(s), pyclipper works only with integers, so polygons are scaled
+        clipper = pyclipper.scale_to_clipper(clipper)
+        scaled_obstacle = pyclipper.scale_to_clipper(obstacle)
+        pc = pyclipper.Pyclipper()
+        pc.AddPath(scaled_obstacle, pyclipper.PT_CLIP, True)
+        pc.AddPath(clipper, pyclipper.PT_SUBJECT, True)
+        if not pc.Execute(pyclipper.CT_DIFFERENCE):  # if whole clipping polygon is inside subject
+            return None
+        pc.Clear()
+        pc.AddPath(scaled_obstacle, pyclipper.PT_SUBJECT, True)
+        pc.AddPath(clipper, pyclipper.PT_CLIP, True)
+        new_obstacles = pc.Execute(pyclipper.CT_DIFFERENCE, pyclipper.PFT_EVENODD)
+        new_obstacles = [[tuple(point) for point in polygon] for polygon in pyclipper.scale_from_clipper(new_obstacles)]
+        return self.obstacles.replace(obstacle_id, new_obstacles)  # deleting old obstacle, adding its pieces
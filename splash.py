@@ -0,0 +1,53 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import arcade
+from arcade import View, Text
+
+
+class SplashView(View):
+    """Shown while textures of the first view are loading, then on_ready is called.
+    The loader itself is updated by the window clock, so other textures keep loading after splash"""
+
+    def __init__(self, window, loader, max_priority: int, on_ready):
+        super().__init__(window)
+        self.loader = loader
+        self.max_priority = max_priority
+        self.on_ready = on_ready
+        self.ready = False
+        self.text = Text('MathGraph', start_x=window.width // 2, start_y=int(window.height * 0.55),
+                         anchor_x='center', anchor_y='center', color=(10, 242, 255),
+                         font_size=int(48 * window.scale))
+
+    def on_update(self, delta_time: float):
+        if not self.ready and self.loader.done(self.max_priority):
+            self.ready = True
+            self.on_ready()
+
+    def on_draw(self):
+        window = self.window
+        self.clear()
+        self.text.draw()
+
+        # progress bar
+        width = window.width * 0.4
+        height = 12 * window.scale
+        y = window.height * 0.42
+        progress = self.loader.progress(self.max_priority)
+        arcade.draw_rectangle_outline(window.width / 2, y, width, height, (10, 242, 255), 2)
+        arcade.draw_rectangle_filled(window.width / 2 - width * (1 - progress) / 2, y, width * progress, height,
+                                     (10, 242, 255))
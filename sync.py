@@ -0,0 +1,162 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Compact binary updates of ObstacleStore for network games. After the shot only the delta is sent:
+removed ids and added polygons. Coordinates are quantized to integer steps of 1/quantization graph units,
+ids and vertices are delta coded and written as varints, so usual delta takes tens of bytes.
+Snapshot with all obstacles is sent only when client joins or its version doesn't match the delta.
+
+Update layout: kind byte (delta or snapshot), varint base version (only in delta), varint new version,
+varint count and delta coded ids of removed obstacles (only in delta), varint count of added polygons
+and for every of them: varint id gap, varint vertices count and zigzag varints of the first vertex
+and of the differences between next vertices"""
+
+import numpy as np
+
+from obstacles import ObstacleStore
+
+KIND_DELTA = 0
+KIND_SNAPSHOT = 1
+quantization = 256  # steps in 1 graph unit
+
+
+class SyncError(Exception):
+    """update can't be applied to the store, full snapshot is needed"""
+    pass
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> tuple:
+    """(value, next position)"""
+    value = shift = 0
+    while True:
+        if position >= len(data):
+            raise SyncError('update is damaged')
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def _write_ids(out: bytearray, ids: list):
+    _write_varint(out, len(ids))
+    last = -1
+    for obstacle_id in ids:
+        _write_varint(out, obstacle_id - last - 1)
+        last = obstacle_id
+
+
+def _write_polygons(out: bytearray, store: ObstacleStore, ids: list):
+    ids = sorted(ids)
+    _write_varint(out, len(ids))
+    last = -1
+    for obstacle_id in ids:
+        _write_varint(out, obstacle_id - last - 1)
+        last = obstacle_id
+        steps = np.rint(np.asarray(store[obstacle_id], dtype=np.float64) * quantization).astype(np.int64)
+        steps[1:] = np.diff(steps, axis=0)
+        _write_varint(out, len(steps))
+        for value in steps.ravel().tolist():
+            _write_varint(out, _zigzag(value))
+
+
+def _read_polygons(data: bytes, position: int) -> tuple:
+    """({id: polygon}, next position)"""
+    count, position = _read_varint(data, position)
+    polygons = {}
+    last = -1
+    for _ in range(count):
+        gap, position = _read_varint(data, position)
+        obstacle_id = last + gap + 1
+        last = obstacle_id
+        vertices, position = _read_varint(data, position)
+        values = []
+        for _ in range(2 * vertices):
+            value, position = _read_varint(data, position)
+            values.append(_unzigzag(value))
+        points = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / quantization
+        polygons[obstacle_id] = [tuple(point) for point in points.tolist()]
+    return polygons, position
+
+
+def encode_snapshot(store: ObstacleStore) -> bytes:
+    out = bytearray((KIND_SNAPSHOT,))
+    _write_varint(out, store.version)
+    _write_polygons(out, store, list(store))
+    return bytes(out)
+
+
+def encode_delta(store: ObstacleStore, base_version: int) -> bytes:
+    """changes of store since base_version, snapshot if the history of store is too short"""
+    changes = store.changes_since(base_version)
+    if changes is None:
+        return encode_snapshot(store)
+    removed_ids, added_ids = changes
+    out = bytearray((KIND_DELTA,))
+    _write_varint(out, base_version)
+    _write_varint(out, store.version)
+    _write_ids(out, removed_ids)
+    _write_polygons(out, store, added_ids)
+    return bytes(out)
+
+
+def apply_update(store: ObstacleStore, data: bytes) -> ObstacleStore:
+    """applying delta or snapshot, returns the store with the changes (new one for snapshot).
+    SyncError is raised if delta was made for other version of the store"""
+    if not data:
+        raise SyncError('update is empty')
+    kind = data[0]
+    if kind == KIND_SNAPSHOT:
+        version, position = _read_varint(data, 1)
+        polygons, position = _read_polygons(data, position)
+        store = ObstacleStore(store.index.cell_size)
+        store.apply_changes(version, (), polygons)
+        return store
+    if kind != KIND_DELTA:
+        raise SyncError('unknown update')
+
+    base_version, position = _read_varint(data, 1)
+    if base_version != store.version:
+        raise SyncError(f'delta is made for version {base_version}, but store has {store.version}')
+    version, position = _read_varint(data, position)
+    count, position = _read_varint(data, position)
+    removed_ids = []
+    last = -1
+    for _ in range(count):
+        gap, position = _read_varint(data, position)
+        last += gap + 1
+        removed_ids.append(last)
+    polygons, position = _read_polygons(data, position)
+    if any(obstacle_id not in store.polygons for obstacle_id in removed_ids):
+        raise SyncError('removed obstacle is unknown')
+    store.apply_changes(version, removed_ids, polygons)
+    return store
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from bot import (BotEngine, BotSituation, BotTurnExecutor, Target, enemy_kill_score, random_formulas,
+                 score_formulas)
+from formula import Formula
+from simulation import GameSimulation, PlayerState
+
+
+@pytest.fixture
+def game():
+    game = GameSimulation([PlayerState() for _ in range(3)], [PlayerState(left_player=False) for _ in range(3)],
+                          obstacle_frequency=40)
+    game.prepare(rng=random.Random(3))
+    return game
+
+
+@pytest.fixture
+def engine():
+    engine = BotEngine('easy', workers=1)
+    engine.rng = random.Random(0)
+    yield engine
+    engine.shutdown()
+
+
+def open_field(targets: list) -> BotSituation:
+    return BotSituation(0, 0, True, 20, 10, 0.02, 'points', [], targets)
+
+
+def test_random_formulas_are_correct(game):
+    situation = BotSituation.from_game(game)
+    formulas = random_formulas(situation, 300, 0.1, random.Random(1))
+    assert len(formulas) == 300
+    for text in formulas:
+        Formula(text)
+
+
+def test_no_formulas_without_enemies():
+    situation = open_field([Target(5, 0, (4.5, -0.5, 5.5, 0.5), enemy=False)])
+    assert random_formulas(situation, 10, 0.1) == []
+
+
+def test_score_formulas():
+    situation = open_field([Target(5, 0, (4.5, -0.5, 5.5, 0.5), enemy=True),
+                            Target(5, 5, (4.5, 4.5, 5.5, 5.5), enemy=False)])
+    scores = {text: score for score, text in score_formulas(situation, ['0', 'x', '-x', 'x+'])}
+    assert scores.keys() == {'0', 'x', '-x'}  # wrong formula is skipped
+    assert scores['0'] > enemy_kill_score > scores['-x'] > 0
+    assert scores['x'] < 0  # ally is killed
+
+
+def test_choose_formula_hits_enemy(engine):
+    situation = open_field([Target(5, 3, (4.5, 2.5, 5.5, 3.5), enemy=True)])
+    [(score, _)] = score_formulas(situation, [engine.choose_formula(situation)])
+    assert score > enemy_kill_score
+
+
+def test_cancelled_choice_returns_some_formula(engine, game):
+    Formula(engine.choose_formula(BotSituation.from_game(game), cancelled=lambda: True))
+
+
+def test_bot_turn_executor(engine, game):
+    bots = BotTurnExecutor(engine)
+    try:
+        turn = bots.submit(game)
+        assert engine.executor is not None  # workers are started by submit, not by the background thread
+        turn.future.result(timeout=30)
+        assert turn.done()
+        Formula(turn.result())
+        assert turn.player is game.active_player
+        assert not bots.turns
+    finally:
+        bots.shutdown()
+    assert engine.executor is None
+
+
+def test_cancelled_bot_turn(engine, game):
+    bots = BotTurnExecutor(engine)
+    try:
+        turn = bots.submit(game)
+        turn.cancel()
+        assert turn.token.cancelled
+    finally:
+        bots.shutdown()
@@ -0,0 +1,190 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from formula import (Formula, ArityError, TokenError, TranslateError, EvaluatingError, CompileCache, compile_cache,
+                     normalize, maximum_value)
+
+
+def _random_formula(rng: random.Random, depth: int = 0) -> str:
+    if depth > 4 or rng.random() < 0.3:
+        return rng.choice(('x', '2', '3.5', 'pi', 'e'))
+    if rng.random() < 0.3:
+        return f'{rng.choice(("sin", "cos", "abs", "sqrt", "exp", "ln", "lg", "tan"))}({_random_formula(rng, depth + 1)})'
+    return f'({_random_formula(rng, depth + 1)}{rng.choice("+-*/^%")}{_random_formula(rng, depth + 1)})'
+
+
+def _evaluate(evaluate, argument: float, seed: int):
+    """value or EvaluatingError (legacy evaluation doesn't tell its kind),
+    random noise of clamping is the same for the same seed"""
+    random.seed(seed)
+    try:
+        return evaluate(argument)
+    except EvaluatingError:
+        return EvaluatingError
+
+
+def _random_formulas(count: int) -> list:
+    rng = random.Random(1)
+    formulas = []
+    while len(formulas) < count:
+        try:
+            formulas.append(Formula(_random_formula(rng)))
+        except TokenError:
+            pass
+    return formulas
+
+
+@pytest.mark.parametrize('text, position', [
+    ('-x+', 2),  # '0' is added before unary minus
+    ('(-x)(-x)(-x)+', 12),  # '0' and '*' are added
+    ('2x+', 2),  # '*' is added between number and x
+    ('(x)sin+', 3),  # '*' is added between ')' and function
+    ('x 2', 2),
+    ('x+', 1),
+    ('+x', 0),
+])
+def test_arity_error_position(text, position):
+    with pytest.raises(ArityError) as error:
+        Formula(text)
+    assert error.value.position == position
+    assert error.value.position < len(text)
+
+
+def test_arity_error_is_token_error():
+    with pytest.raises(TokenError):
+        Formula('sin()')
+
+
+def test_arity_error_of_empty_parentheses_is_at_the_end():
+    with pytest.raises(ArityError) as error:
+        Formula('()')
+    assert error.value.position == 2
+
+
+@pytest.mark.parametrize('text', ['-x', '(-x)(-x)', '2x', '2(x+1)', '(x)sin(x)', 'x:2'])
+def test_unary_minus_and_implicit_multiplication_are_valid(text):
+    Formula(text)
+
+
+@pytest.mark.parametrize('text', ['x', '-x', '2x+1', 'x^2-3x', 'sin(x)*x', '1/x', 'ln(x)', '(-2)^x', 'x%3',
+                                  'exp(x)', 'sqrt(x-1)', '2^x^2', 'tan(x)/cos(x)', 'abs(x)-pi', '1/(x-x)'])
+def test_compiled_evaluation_matches_legacy(text):
+    formula = Formula(text)
+    for i, argument in enumerate(np.linspace(-20, 20, 81).tolist()):
+        compiled = _evaluate(formula.evaluate, argument, i)
+        legacy = _evaluate(formula.evaluate_legacy, argument, i)
+        if compiled is EvaluatingError or legacy is EvaluatingError:
+            assert compiled == legacy, argument
+        else:
+            assert math.isclose(compiled, legacy, rel_tol=1e-9, abs_tol=1e-9), argument
+
+
+def test_compiled_evaluation_matches_legacy_on_random_formulas():
+    for formula in _random_formulas(300):
+        for i, argument in enumerate(np.linspace(-10, 10, 21).tolist()):
+            compiled = _evaluate(formula.evaluate, argument, i)
+            legacy = _evaluate(formula.evaluate_legacy, argument, i)
+            if compiled is EvaluatingError or legacy is EvaluatingError:
+                assert compiled == legacy, (formula.formula, argument)
+            elif abs(compiled) < maximum_value or abs(legacy) < maximum_value:
+                assert math.isclose(compiled, legacy, rel_tol=1e-9, abs_tol=1e-9), (formula.formula, argument)
+
+
+@pytest.mark.parametrize('text, masked', [
+    ('1/x', [0]),
+    ('ln(x)', [-2, -1, 0, 1]),  # ln(x) is logarithm of e to the base x
+    ('sqrt(x)', [-2, -1]),
+    ('x%(x-1)', [1]),
+    ('0^x', [-2, -1]),
+    ('(-x)^0.5', [1, 2]),
+    ('x+1', []),
+])
+def test_evaluate_many_masks_bad_arguments(text, masked):
+    arguments = np.array([-2, -1, 0, 1, 2], dtype=np.float64)
+    values = Formula(text).evaluate_many(arguments)
+    assert arguments[values.mask].tolist() == masked
+
+
+def test_evaluate_many_masks_everything_if_constant_part_fails():
+    values = Formula('x+1/0').evaluate_many(np.arange(3.0))
+    assert values.mask.all()
+
+
+def test_evaluate_many_is_repeatable_with_the_same_rng():
+    formula = Formula('exp(x)*x')
+    arguments = np.linspace(100, 200, 11)
+    first = formula.evaluate_many(arguments, np.random.default_rng(5))
+    second = formula.evaluate_many(arguments, np.random.default_rng(5))
+    assert first.tolist() == second.tolist()
+
+
+def test_evaluate_many_matches_evaluate():
+    arguments = np.linspace(-10, 10, 41)
+    for formula in _random_formulas(300):
+        values = formula.evaluate_many(arguments, np.random.default_rng(0))
+        for argument, value, masked in zip(arguments.tolist(), values.data.tolist(), values.mask.tolist()):
+            expected = _evaluate(formula.evaluate, argument, 0)
+            assert masked == (expected is EvaluatingError), (formula.formula, argument)
+            # noise of clamped intermediate values comes from other generator, such values can't be compared
+            if not masked and expected == _evaluate(formula.evaluate, argument, 1):
+                assert math.isclose(value, expected, rel_tol=1e-9, abs_tol=1e-9), (formula.formula, argument)
+
+
+def test_compile_cache_shares_formulas_with_the_same_normal_form():
+    compile_cache.invalidate()
+    first = Formula('2x + Sin(x)')
+    second = Formula('2X+sin (x)')
+    assert second.formula is first.formula
+    assert (compile_cache.info().hits, compile_cache.info().misses) == (1, 1)
+    assert second.source == '2X+sin (x)'
+
+
+@pytest.mark.parametrize('text, joined', [('(x+1) (x+2)', '(x+1)(x+2)'), (' -x', '-x'), ('\t-x', '-x')])
+def test_whitespaces_which_change_translation_are_kept(text, joined):
+    Formula(joined)  # the formula without whitespaces is cached
+    assert normalize(text) != normalize(joined)
+    with pytest.raises(TokenError):
+        Formula(text)
+
+
+def _translate(text: str):
+    """postfix formula translated without the cache, None if the text is wrong"""
+    compile_cache.invalidate()
+    try:
+        return Formula(text).formula
+    except TranslateError:
+        return None
+
+
+def test_normalized_formula_is_translated_the_same_way():
+    rng = random.Random(2)
+    symbols = ['x', 'X', '2', '3.5', '.', 'sin', 'Pi', 'e', '(', '(', ')', ')', '-', '+', '*', ':', '^', ' ', '\t', '\n']
+    accepted = 0
+    for _ in range(3000):
+        text = ''.join(rng.choice(symbols) for _ in range(rng.randint(1, 10)))
+        formula = _translate(text)
+        assert _translate(normalize(text)) == formula, repr(text)
+        accepted += formula is not None
+    assert accepted > 100
+
+
+def test_compile_cache_skips_wrong_and_too_long_formulas():
+    compile_cache.invalidate()
+    with pytest.raises(TokenError):
+        Formula('x+')
+    Formula('x' + '+x' * compile_cache.max_length)
+    assert compile_cache.info().size == 0
+
+
+def test_compile_cache_removes_the_least_recently_used():
+    cache = CompileCache(max_size=2)
+    for key in ('a', 'b', 'a', 'c'):
+        if cache.get(key) is None:
+            cache.put(key, [key], None)
+    assert cache.get('b') is None
+    assert cache.get('a') == (['a'], None)
+    cache.invalidate('c')
+    assert cache.get('c') is None
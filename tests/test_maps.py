@@ -0,0 +1,111 @@
+import struct
+
+import numpy as np
+import pytest
+
+from maps import GameMap, MapFormatError, header_format, header_size, magic, version
+from simulation import GameSimulation, PlayerState
+
+
+def _game(players: int = 2) -> GameSimulation:
+    return GameSimulation([PlayerState() for _ in range(players)],
+                          [PlayerState(left_player=False) for _ in range(players)])
+
+
+@pytest.fixture
+def game():
+    game = _game()
+    game.prepare()
+    game.generate_map(seed=7)
+    return game
+
+
+def test_round_trip(game):
+    game_map = GameMap.from_game(game)
+    loaded = GameMap.from_buffer(game_map.to_bytes())
+    assert loaded.seed == 7
+    assert loaded.map_id == game_map.map_id
+    assert loaded.obstacles_count == len(game.obstacles) > 0
+    assert loaded.spawn_points.tolist() == game_map.spawn_points.tolist()
+    assert loaded.polygons() == game_map.polygons()
+    assert loaded.obstacles_color == tuple(game.obstacles_color)
+    assert loaded.obstacles_border_color == tuple(game.obstacles_border_color[:4])
+
+
+def test_the_same_seed_gives_the_same_map(game):
+    other = _game()
+    other.prepare()
+    other.generate_map(seed=7)
+    assert GameMap.from_game(other).map_id == GameMap.from_game(game).map_id
+
+
+def test_apply(game):
+    game_map = GameMap.from_buffer(GameMap.from_game(game).to_bytes())
+    other = _game()
+    other.prepare(game_map)
+    assert other.map_seed is None
+    assert list(other.obstacles.values()) == game_map.polygons()
+    assert np.allclose([(player.x, player.y) for player in other.all_players], game_map.spawn_points)
+
+
+def test_apply_to_game_with_other_players(game):
+    with pytest.raises(MapFormatError):
+        _game(players=1).prepare(GameMap.from_game(game))
+
+
+def test_save_and_load(game, tmp_path):
+    game_map = GameMap.from_game(game)
+    path = tmp_path / 'test.map'
+    game_map.save(str(path))
+    for memory_map in (True, False):
+        loaded = GameMap.load(str(path), memory_map=memory_map)
+        assert loaded.map_id == game_map.map_id
+        assert loaded.polygons() == game_map.polygons()
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:header_size - 1],
+    lambda data: b'XXXX' + data[4:],
+    lambda data: data[:4] + b'\x63\x00' + data[6:],
+    lambda data: data[:-4],
+    lambda data: data + b'\x00',
+])
+def test_damaged_map(game, damage):
+    with pytest.raises(MapFormatError):
+        GameMap.from_buffer(damage(GameMap.from_game(game).to_bytes()))
+
+
+def _header(players: int, obstacles: int) -> bytes:
+    return struct.pack(header_format, magic, version, 0, -1, 2.0, 16.0, players, obstacles, *(0,) * 8)
+
+
+@pytest.mark.parametrize('data', [
+    _header(100, 0) + b'\x00' * 3,
+    _header(100, 0) + b'\x00' * 5,
+    _header(0, 10) + b'\x00' * 7,
+    _header(2, 1) + b'\x00' * 16,  # offsets are missing
+])
+def test_truncated_map(data):
+    with pytest.raises(MapFormatError):
+        GameMap.from_buffer(data)
+
+
+@pytest.mark.parametrize('offsets', [
+    (1, 4),  # doesn't start at 0
+    (0, 4, 2),  # decreasing
+    (0, 3, 5),  # obstacle with 2 vertices
+    (0, 0),  # empty obstacle
+])
+def test_wrong_offsets(offsets):
+    vertices = max(offsets)
+    data = (_header(0, len(offsets) - 1) + np.array(offsets, dtype='<u4').tobytes() +
+            np.zeros((vertices, 2), dtype='<f4').tobytes())
+    with pytest.raises(MapFormatError):
+        GameMap.from_buffer(data)
+
+
+def test_map_without_obstacles():
+    data = _header(1, 0) + np.zeros(2, dtype='<f4').tobytes() + np.zeros(1, dtype='<u4').tobytes()
+    game_map = GameMap.from_buffer(data)
+    assert game_map.obstacles_count == 0
+    assert game_map.polygons() == []
@@ -0,0 +1,204 @@
+import asyncio
+
+import pytest
+
+from network import (GameClient, GameServer, ProtocolError, check_settings, max_formula_length, send_message,
+                     settings_ranges)
+
+timeout = 5
+
+
+def run(test, players: int = 2, settings: dict = None):
+    """running coroutine test(server, clients) with the local server and connected clients
+    (the first one is the host of the lobby, which all of them joined)"""
+
+    async def main():
+        server = GameServer()
+        port = await server.start(port=0)
+        clients = [GameClient() for _ in range(players)]
+        try:
+            for i, client in enumerate(clients):
+                await client.connect(port=port, name=f'player{i}')
+            await clients[0].send('create_lobby', settings=settings or {})
+            lobby = await clients[0].wait_for('lobby', timeout=timeout)
+            for client in clients[1:]:
+                await client.send('join_lobby', lobby_id=lobby['lobby_id'])
+                await client.wait_for('lobby', timeout=timeout)
+            await test(server, clients)
+        finally:
+            for client in clients:
+                await client.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+async def start_game(clients: list) -> dict:
+    await clients[0].send('start_game')
+    return [await client.wait_for('game_started', timeout=timeout) for client in clients][0]
+
+
+def by_id(clients: list) -> dict:
+    return {client.player_id: client for client in clients}
+
+
+def test_lobby():
+    async def test(server, clients):
+        assert len(server.lobbies) == 1
+        await clients[0].send('list_lobbies')
+        [lobby] = (await clients[0].wait_for('lobbies', timeout=timeout))['lobbies']
+        assert (lobby['host'], lobby['players'], lobby['playing']) == ('player0', 2, False)
+
+        await clients[1].send('switch_team')
+        state = await clients[0].wait_for('lobby', timeout=timeout)
+        assert [len(state['team1']), len(state['team2'])] == [2, 0]
+
+        await clients[1].send('leave_lobby')
+        await clients[0].wait_for('lobby', timeout=timeout)
+        await clients[0].send('leave_lobby')
+        await asyncio.sleep(0.05)
+        assert not server.lobbies
+
+    run(test)
+
+
+def test_errors():
+    async def test(server, clients):
+        with pytest.raises(ProtocolError, match='only host'):
+            await clients[1].send('start_game')
+            await clients[1].wait_for('game_started', timeout=timeout)
+        with pytest.raises(ProtocolError, match='no such lobby'):
+            await clients[1].send('join_lobby', lobby_id=-1)
+            await clients[1].wait_for('lobby', timeout=timeout)
+        with pytest.raises(ProtocolError, match='unknown message'):
+            await clients[1].send('cheat')
+            await clients[1].wait_for('lobby', timeout=timeout)
+        with pytest.raises(ProtocolError, match='not started'):
+            await clients[1].send('fire', formula='x')
+            await clients[1].wait_for('shot', timeout=timeout)
+
+    run(test)
+
+
+def test_settings_are_clamped_to_lobby_ranges():
+    settings = check_settings({'game_field_width': 100, 'y_axis_limit': -5, 'max_time_s': 10 ** 6,
+                               'obstacle_frequency': '150'})
+    assert settings == {'game_field_width': settings_ranges['game_field_width'][1],
+                        'y_axis_limit': settings_ranges['y_axis_limit'][0],
+                        'max_time_s': settings_ranges['max_time_s'][1], 'obstacle_frequency': 100}
+    assert check_settings({'game_field_width': 1.5}) == {'game_field_width': 1.5}
+    for key, value in (('game_field_width', float('nan')), ('y_axis_limit', float('inf')), ('y_axis_limit', 'wide')):
+        with pytest.raises(ProtocolError):
+            check_settings({key: value})
+
+
+def test_settings_cant_be_changed_during_game():
+    async def test(server, clients):
+        await start_game(clients)
+        with pytest.raises(ProtocolError, match='already started'):
+            await clients[0].send('settings', settings={'y_axis_limit': 50})
+            await clients[0].wait_for('lobby', timeout=timeout)
+        assert next(iter(server.lobbies.values())).settings['y_axis_limit'] == 16
+
+    run(test)
+
+
+def test_client_closes_connection_after_wrong_message():
+    async def main():
+        async def handle(reader, writer):
+            await reader.readline()
+            await send_message(writer, {'type': 'welcome', 'player_id': 1})
+            await send_message(writer, {'type': 'shot', 'player': 2})  # obstacles are missing
+            await reader.read()  # until the client closes the connection
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        client = GameClient()
+        try:
+            await client.connect(port=server.sockets[0].getsockname()[1])
+            assert await client.receive(timeout=timeout) is None  # the message isn't given, connection is closed
+            assert client.writer.is_closing()
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())
+
+
+def test_fire():
+    async def test(server, clients):
+        started = await start_game(clients)
+        game = next(iter(server.lobbies.values())).game
+        assert started['players'] == [player.id for player in game.all_players]
+        game_map = GameClient.load_map(started)
+        assert game_map.obstacles_count == len(game.obstacles)
+
+        clients = by_id(clients)
+        active = started['active']
+        waiting = next(player_id for player_id in clients if player_id != active)
+        with pytest.raises(ProtocolError, match='not your turn'):
+            await clients[waiting].send('fire', formula='x')
+            await clients[waiting].wait_for('shot', timeout=timeout)
+        with pytest.raises(ProtocolError, match='not correct'):
+            await clients[active].send('fire', formula='x+')
+            await clients[active].wait_for('shot', timeout=timeout)
+        with pytest.raises(ProtocolError, match='too long'):
+            await clients[active].send('fire', formula='x' + '+x' * max_formula_length)
+            await clients[active].wait_for('shot', timeout=timeout)
+
+        await clients[active].send('fire', formula='sin(x)*3')
+        for client in clients.values():
+            shot = await client.wait_for('shot', timeout=timeout)
+            assert shot['player'] == active
+            assert client.obstacles.version == game.obstacles.version
+            assert client.obstacles.polygons.keys() == game.obstacles.polygons.keys()
+
+    run(test, settings={'obstacle_frequency': 50})
+
+
+def test_game_ends_when_player_leaves():
+    async def test(server, clients):
+        await start_game(clients)
+        await clients[1].close()
+        message = await clients[0].wait_for('game_over', timeout=timeout)
+        assert message['winner'] == 'team1'  # host is in team1
+
+    run(test)
+
+
+def test_lockstep_games_stay_equal():
+    async def test(server, clients):
+        started = await start_game(clients)
+        game = next(iter(server.lobbies.values())).game
+        clients = by_id(clients)
+        assert all(client.game.obstacles.checksum() == game.obstacles.checksum() for client in clients.values())
+
+        active = started['active']
+        for _ in range(20):
+            if active is None:
+                break
+            await clients[active].send('fire', formula='3sin(x/2)+x/3+(abs(x-3)-abs(x-5))*40')
+            for client in clients.values():
+                shot = await client.wait_for('shot', timeout=timeout)
+                if client.game is not None:
+                    assert client.game.obstacles.checksum() == shot['checksum']
+            active = shot['active']
+        assert [client.desyncs for client in clients.values()] == [0] * len(clients)
+
+    run(test, players=4, settings={'obstacle_frequency': 80, 'lockstep': True})
+
+
+def test_lockstep_desync_is_repaired():
+    async def test(server, clients):
+        started = await start_game(clients)
+        game = next(iter(server.lobbies.values())).game
+        damaged = clients[0]
+        damaged.game.obstacles.remove(next(iter(damaged.game.obstacles)))
+
+        await by_id(clients)[started['active']].send('fire', formula='x')
+        await damaged.wait_for('obstacles_exact', timeout=timeout)
+        assert damaged.desyncs == 1
+        assert damaged.game.obstacles.checksum() == game.obstacles.checksum()
+        assert damaged.game.obstacles.version == game.obstacles.version
+
+    run(test, settings={'obstacle_frequency': 80, 'lockstep': True})
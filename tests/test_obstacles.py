@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from obstacles import ObstacleGenerator, _are_intersecting, _separating_axes
+
+px = 2 * 16 / 785  # px of the default game field
+
+
+def _generator(seed: int = 0, x_edge: float = 38, y_edge: float = 16, **settings) -> ObstacleGenerator:
+    return ObstacleGenerator(x_edge, y_edge, px, np.random.default_rng(seed), **settings)
+
+
+def _square(left, bottom, size):
+    return [(left, bottom), (left + size, bottom), (left + size, bottom + size), (left, bottom + size)]
+
+
+def _intersecting(a, b) -> bool:
+    return _are_intersecting(_separating_axes(np.asarray(a, dtype=np.float64)),
+                             _separating_axes(np.asarray(b, dtype=np.float64)))
+
+
+def test_obstacles_dont_intersect_each_other_and_blocked_polygons():
+    blocked = [_square(-20, -5, 2), _square(15, 3, 2)]
+    generator = _generator()
+    obstacles = generator.generate(15, blocked)
+    assert len(obstacles) == generator.stats.placed > 0
+    for number, obstacle in enumerate(obstacles):
+        assert 3 <= len(obstacle) <= ObstacleGenerator.max_vertices
+        for other in obstacles[number + 1:] + blocked:
+            assert not _intersecting(obstacle, other)
+
+
+def test_stats():
+    generator = _generator(1)
+    obstacles = generator.generate(10)
+    stats = generator.stats
+    assert (stats.placed, stats.requested) == (len(obstacles), 10)
+    assert stats.attempts == stats.placed + stats.rejections
+    assert stats.time >= 0
+
+
+def test_attempts_budget_stops_crowded_generation():
+    generator = _generator(2, x_edge=8, y_edge=8, attempts_per_obstacle=3)
+    obstacles = generator.generate(50)
+    stats = generator.stats
+    assert len(obstacles) == stats.placed < 50
+    assert stats.attempts == 50 * 3
+    assert stats.rejections == stats.attempts - stats.placed
+
+
+def test_nothing_is_placed_on_blocked_field():
+    generator = _generator(3, attempts_per_obstacle=5)
+    assert generator.generate(4, [_square(-100, -100, 200)]) == []
+    assert generator.stats == generator.stats._replace(placed=0, requested=4, attempts=20, rejections=20)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_the_same_seed_gives_the_same_obstacles(seed):
+    blocked = [_square(-20, -5, 2)]
+    obstacles = _generator(seed).generate(10, blocked)
+    assert _generator(seed).generate(10, blocked) == obstacles
+    assert _generator(seed + 100).generate(10, blocked) != obstacles
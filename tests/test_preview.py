@@ -0,0 +1,37 @@
+import pytest
+
+from preview import FormulaPreview
+from simulation import GameSimulation, PlayerState
+
+
+@pytest.fixture
+def game():
+    game = GameSimulation([PlayerState(computer_player=False)], [PlayerState(computer_player=False, left_player=False)],
+                          obstacle_frequency=0)
+    game.prepare()
+    return game
+
+
+@pytest.mark.parametrize('text, near', [
+    ('-x+', '+'),
+    ('(-x)(-x)(-x)+', '+'),
+    ('x 3', '3'),
+])
+def test_error_snippet_points_at_wrong_token(game, text, near):
+    preview = FormulaPreview()
+    preview.update(text, game)
+    assert preview.message.endswith(f'near "{near}"')
+
+
+def test_error_at_the_end_has_no_snippet(game):
+    preview = FormulaPreview()
+    preview.update('()', game)
+    assert preview.message == 'missing operand or operator'
+
+
+def test_correct_formula_has_points(game):
+    preview = FormulaPreview()
+    assert preview.update('sin(x)', game)
+    assert preview.message == ''
+    assert len(preview.points) > 1
+    assert not preview.update('SIN (x)', game)  # the same formula
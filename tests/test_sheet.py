@@ -0,0 +1,52 @@
+import random
+
+from sheet import pack_regions
+
+
+def _overlap(a, b, padding: int) -> bool:
+    """True if regions are closer than padding"""
+    (a_left, a_top, a_width, a_height), (b_left, b_top, b_width, b_height) = a, b
+    return (a_left < b_left + b_width + padding and b_left < a_left + a_width + padding and
+            a_top < b_top + b_height + padding and b_top < a_top + a_height + padding)
+
+
+def test_regions_are_inside_the_sheet_and_dont_overlap():
+    rng = random.Random(1)
+    sizes = {f'texture{i}': (rng.randint(8, 512), rng.randint(8, 400)) for i in range(40)}
+    (width, height), regions = pack_regions(sizes, 1024, 2)
+    assert regions.keys() == sizes.keys()
+    assert width == 1024
+    for name, (left, top, region_width, region_height) in regions.items():
+        assert (region_width, region_height) == sizes[name]
+        assert left >= 0 and top >= 0 and left + region_width <= width and top + region_height <= height
+    names = list(regions)
+    for number, name in enumerate(names):
+        for other in names[number + 1:]:
+            assert not _overlap(regions[name], regions[other], 2), (name, other)
+
+
+def test_shelves():
+    (width, height), regions = pack_regions({'a': (600, 100), 'b': (300, 50), 'c': (500, 80), 'd': (32, 32)},
+                                            1024, 2)
+    # the highest first: c doesn't fit after a, so it starts the next shelf
+    assert regions['a'] == (0, 0, 600, 100)
+    assert regions['c'] == (0, 102, 500, 80)
+    assert regions['b'] == (502, 102, 300, 50)
+    assert regions['d'] == (804, 102, 32, 32)
+    assert (width, height) == (1024, 182)
+
+
+def test_wide_region_widens_the_sheet():
+    (width, height), regions = pack_regions({'wide': (2000, 10), 'small': (10, 10)}, 1024, 2)
+    assert width == 2000
+    assert regions['small'] == (0, 12, 10, 10)
+    assert height == 22
+
+
+def test_layout_doesnt_depend_on_order():
+    sizes = {'a': (32, 32), 'b': (32, 32), 'c': (128, 32)}
+    assert pack_regions(sizes) == pack_regions(dict(reversed(list(sizes.items()))))
+
+
+def test_empty_sheet():
+    assert pack_regions({}, 1024) == ((1024, 0), {})
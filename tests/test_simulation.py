@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from formula import TranslateError
+from simulation import GameSimulation, PlayerState
+from trajectory import HIT_BORDER, HIT_OBSTACLE
+
+
+def _game(left: int = 2, right: int = 2, **settings) -> GameSimulation:
+    game = GameSimulation([PlayerState() for _ in range(left)], [PlayerState(left_player=False) for _ in range(right)],
+                          **settings)
+    game.prepare(rng=random.Random(1))
+    game.active_player = game.left_team[0]
+    return game
+
+
+def _place(player, x: float, y: float):
+    player.x = x
+    player.y = y
+
+
+@pytest.fixture
+def duel():
+    """one player against other on the empty field, on the same height"""
+    game = _game(1, 1, obstacle_frequency=0)
+    _place(game.left_team[0], -10, 0)
+    _place(game.right_team[0], 10, 0)
+    return game
+
+
+def test_the_same_rng_prepares_the_same_round():
+    first, second = _game(obstacle_frequency=50), _game(obstacle_frequency=50)
+    assert first.map_seed == second.map_seed
+    assert first.obstacles.checksum() == second.obstacles.checksum()
+    assert [(player.x, player.y) for player in first.all_players] == \
+           [(player.x, player.y) for player in second.all_players]
+
+
+def test_turns_alternate_teams_and_cycle_inside_them():
+    game = _game()
+    (a, b), (c, d) = game.left_team, game.right_team
+    order = []
+    for _ in range(8):
+        order.append(game.active_player)
+        assert game.pass_turn_to_next_player()
+    assert order == [a, c, b, d, a, c, b, d]
+
+
+def test_dead_players_are_skipped():
+    game = _game(3, 2)
+    (a, b, c), (d, e) = game.left_team, game.right_team
+    b.alive = False
+    order = []
+    for _ in range(6):
+        order.append(game.active_player)
+        game.pass_turn_to_next_player()
+    assert order == [a, d, c, e, a, d]
+
+
+def test_pass_restarts_turn_timer():
+    now = [0.0]
+    game = _game(clock=lambda: now[0], max_time_s=10)
+    now[0] = 8
+    assert game.turn_timer.time_left == pytest.approx(2)
+    game.pass_turn_to_next_player()
+    assert game.turn_timer.time_left == pytest.approx(10)
+
+
+def test_game_end():
+    game = _game()
+    assert not game.is_game_end()
+    for player in game.right_team:
+        player.alive = False
+    assert game.is_game_end()
+    assert not game.pass_turn_to_next_player()
+    assert game.turn_timer.deadline is None
+
+
+def test_shot_kills_enemy_and_ends_game(duel):
+    shooter, enemy = duel.left_team[0], duel.right_team[0]
+    result = duel.fire('0')
+    assert result.shooter is shooter
+    assert result.killed == [enemy]
+    assert not enemy.alive
+    assert duel.is_game_end()
+    assert duel.active_player is shooter  # the turn isn't passed after the end of game
+
+
+def test_missed_shot_passes_turn(duel):
+    result = duel.fire('x')
+    assert result.killed == []
+    assert result.end.kind == HIT_BORDER
+    assert duel.active_player is duel.right_team[0]
+
+
+def test_shot_without_passing_turn(duel):
+    duel.fire('x', pass_turn=False)
+    assert duel.active_player is duel.left_team[0]
+
+
+def test_active_player_cant_be_killed(duel):
+    duel.kill_player(duel.active_player)
+    assert duel.active_player.alive
+
+
+def test_wrong_formula_changes_nothing(duel):
+    with pytest.raises(TranslateError):
+        duel.fire('x+')
+    assert duel.active_player is duel.left_team[0]
+    assert all(player.alive for player in duel.all_players)
+
+
+def test_obstacle_stops_shot_and_is_blown_the_same_way_with_the_same_seed():
+    checksums = set()
+    for _ in range(2):
+        game = _game(1, 1, obstacle_frequency=0)
+        _place(game.left_team[0], -10, 0)
+        _place(game.right_team[0], 10, 0)
+        obstacle_id = game.obstacles.add([(-1, -3), (1, -3), (1, 3), (-1, 3)])
+        result = game.fire('0', seed=5)
+        assert result.end.kind == HIT_OBSTACLE
+        assert result.obstacle_id == obstacle_id
+        assert result.killed == []
+        assert result.obstacle_changed and obstacle_id not in game.obstacles
+        assert -1 <= result.points[-1][0] < 0  # the first point inside obstacle
+        checksums.add(game.obstacles.checksum())
+    assert len(checksums) == 1
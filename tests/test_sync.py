@@ -0,0 +1,99 @@
+import pytest
+
+from obstacles import ObstacleStore
+from sync import (SyncError, apply_update, encode_delta, encode_snapshot, _read_varint, _unzigzag, _write_varint,
+                  _zigzag)
+
+
+def _square(left, bottom, size=1.0):
+    return [(left, bottom), (left + size, bottom), (left + size, bottom + size), (left, bottom + size)]
+
+
+def _store(count: int = 5, history_size: int = 64) -> ObstacleStore:
+    store = ObstacleStore(cell_size=10, history_size=history_size)
+    for i in range(count):
+        store.add(_square(3 * i, 0.25 * i))
+    return store
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 16383, 16384, 2 ** 35, 2 ** 63])
+def test_varint_round_trip(value):
+    out = bytearray(b'\xff')
+    _write_varint(out, value)
+    assert _read_varint(bytes(out), 1) == (value, len(out))
+
+
+def test_varint_length():
+    for value, length in ((0, 1), (127, 1), (128, 2), (16383, 2), (16384, 3)):
+        out = bytearray()
+        _write_varint(out, value)
+        assert len(out) == length
+
+
+def test_damaged_varint():
+    with pytest.raises(SyncError):
+        _read_varint(b'\x80\x80', 0)
+
+
+def test_zigzag():
+    assert [_zigzag(value) for value in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+    for value in range(-1000, 1000):
+        assert _unzigzag(_zigzag(value)) == value
+
+
+def test_changes_since():
+    store = _store(3)
+    base = store.version
+    assert store.changes_since(base) == ([], [])
+    new_id = store.add(_square(20, 20))
+    pieces = store.replace(0, [_square(0, 0, 0.5), _square(0.5, 0.5, 0.5)])
+    store.remove(pieces[0])
+    removed, added = store.changes_since(base)
+    assert removed == [0]
+    assert added == [new_id, pieces[1]]  # the piece added and removed since base isn't mentioned
+    assert store.changes_since(store.version + 1) is None
+
+
+def test_changes_since_too_old_version():
+    store = _store(10, history_size=4)
+    assert store.changes_since(5) is None
+    assert store.changes_since(6) == ([], [6, 7, 8, 9])
+
+
+def test_delta_makes_stores_equal():
+    server, client = _store(), _store()
+    base = server.version
+    server.replace(1, [_square(3, 0.25, 0.5), []])
+    server.remove(3)
+    server.add(_square(-7.5, 1.125))
+    delta = encode_delta(server, base)
+    assert len(delta) < len(encode_snapshot(server))
+    client = apply_update(client, delta)
+    assert client.version == server.version
+    assert client.checksum() == server.checksum()
+    assert client.changes_since(client.version) == ([], [])
+
+
+def test_snapshot_when_history_is_too_short():
+    server, client = _store(history_size=2), ObstacleStore(cell_size=10)
+    update = encode_delta(server, 0)
+    assert update == encode_snapshot(server)
+    client = apply_update(client, update)
+    assert client.checksum() == server.checksum()
+    assert client.obstacle_at(3.5, 0.5) == 1
+
+
+def test_delta_for_other_version():
+    server, client = _store(), _store()
+    server.remove(0)
+    delta = encode_delta(server, server.version - 1)
+    client.remove(1)
+    with pytest.raises(SyncError):
+        apply_update(client, delta)
+
+
+def test_bad_update():
+    with pytest.raises(SyncError):
+        apply_update(ObstacleStore(), b'')
+    with pytest.raises(SyncError):
+        apply_update(ObstacleStore(), b'\x7f')
@@ -0,0 +1,74 @@
+import pytest
+
+from simulation import GameSimulation, PlayerState
+from timer import TurnTimer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_stopped_timer_has_the_whole_turn(clock):
+    timer = TurnTimer(30, clock)
+    clock.now += 50
+    assert timer.time_left == 30
+    assert not timer.is_over()
+
+
+def test_expiry(clock):
+    timer = TurnTimer(30, clock)
+    timer.start()
+    clock.now += 29.5
+    assert timer.time_left == pytest.approx(0.5)
+    assert not timer.is_over()
+    clock.now += 1
+    assert timer.time_left == 0
+    assert timer.is_over()
+
+
+def test_pause_and_resume(clock):
+    timer = TurnTimer(30, clock)
+    timer.start()
+    clock.now += 10
+    timer.pause()
+    clock.now += 100  # the shot is drawn
+    assert timer.time_left == pytest.approx(20)
+    assert not timer.is_over()
+    timer.pause()  # pausing again doesn't move the pause start
+    timer.resume()
+    assert timer.time_left == pytest.approx(20)
+    clock.now += 20
+    assert timer.is_over()
+
+
+def test_restart_and_stop(clock):
+    timer = TurnTimer(30, clock)
+    timer.start()
+    clock.now += 40
+    timer.pause()
+    timer.start()
+    assert timer.time_left == 30
+    assert not timer.is_over()
+    timer.stop()
+    timer.pause()
+    clock.now += 40
+    timer.resume()
+    assert timer.time_left == 30
+    assert not timer.is_over()
+
+
+def test_game_uses_its_turn_time(clock):
+    game = GameSimulation([PlayerState()], [PlayerState(left_player=False)], clock=clock)
+    game.prepare()
+    game.max_time_s = 10  # lobby sets it after the game is created
+    game.pass_turn_to_next_player()
+    assert game.turn_timer.time_left == 10
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from obstacles import ObstacleStore
+from trajectory import (find_hits, segments_box_entries, COLLISION_POINTS, COLLISION_SEGMENTS, HIT_OBSTACLE,
+                        HIT_PLAYER)
+
+
+def _square(left, bottom, size):
+    return [(left, bottom), (left + size, bottom), (left + size, bottom + size), (left, bottom + size)]
+
+
+@pytest.fixture
+def thin_wall():
+    obstacles = ObstacleStore(cell_size=10)
+    obstacles.add([(10, -50), (11, -50), (11, 50), (10, 50)])
+    return obstacles
+
+
+def test_points_jump_through_thin_obstacle(thin_wall):
+    points = np.array([(0, 0), (5, 0), (15, 0), (20, 0)], dtype=np.float64)
+    assert find_hits(points, thin_wall, [], COLLISION_POINTS) == []
+
+
+def test_segments_hit_thin_obstacle(thin_wall):
+    points = np.array([(0, 0), (5, 0), (15, 0), (20, 0)], dtype=np.float64)
+    [event] = find_hits(points, thin_wall, [], COLLISION_SEGMENTS)
+    assert event.kind == HIT_OBSTACLE
+    assert event.index == 2
+    assert event.target == 0
+    assert event.point == pytest.approx((10, 0))
+
+
+def test_points_hit_point_inside_obstacle():
+    obstacles = ObstacleStore(cell_size=10)
+    obstacle_id = obstacles.add(_square(10, -5, 10))
+    points = np.array([(x, 0) for x in range(0, 30, 3)], dtype=np.float64)
+    [event] = find_hits(points, obstacles, [], COLLISION_POINTS)
+    assert (event.index, event.kind, event.target, event.point) == (4, HIT_OBSTACLE, obstacle_id, (12, 0))
+
+
+@pytest.mark.parametrize('collision_mode', [COLLISION_POINTS, COLLISION_SEGMENTS])
+def test_player_before_obstacle_is_hit_and_player_behind_it_is_not(collision_mode):
+    obstacles = ObstacleStore(cell_size=10)
+    obstacles.add(_square(20, -5, 10))
+    hitboxes = [('before', (8, -1, 12, 1)), ('behind', (30, -1, 34, 1))]
+    points = np.array([(x, 0) for x in range(0, 40)], dtype=np.float64)
+    events = find_hits(points, obstacles, hitboxes, collision_mode)
+    assert [(event.kind, event.target) for event in events] == [(HIT_PLAYER, 'before'), (HIT_OBSTACLE, 0)]
+
+
+def test_segments_hit_player_between_points():
+    points = np.array([(0, 10), (1, -10)], dtype=np.float64)  # steep graph goes through the player
+    hitboxes = [('player', (0, -1, 1, 1))]
+    assert find_hits(points, ObstacleStore(), hitboxes, COLLISION_POINTS) == []
+    [event] = find_hits(points, ObstacleStore(), hitboxes, COLLISION_SEGMENTS)
+    assert (event.index, event.kind, event.target) == (1, HIT_PLAYER, 'player')
+    assert event.point == pytest.approx((0.45, 1))
+
+
+def test_segments_box_entries():
+    points = np.array([(0, 0), (2, 0), (4, 0), (4, 4)], dtype=np.float64)
+    entries = segments_box_entries(points, (1, -1, 3, 1))
+    assert entries.tolist() == [0.5, 0, np.inf]
+
+
+def test_no_hits_on_empty_path():
+    empty = np.empty((0, 2))
+    assert find_hits(empty, ObstacleStore(), [], COLLISION_POINTS) == []
+    assert find_hits(empty, ObstacleStore(), [], COLLISION_SEGMENTS) == []
@@ -0,0 +1,58 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Timer of the turn, which is paused while the shot is drawn. It only does arithmetic on the time
+given by the clock function, so it works the same way in the window, on the server and with a simulated clock"""
+
+import time
+
+
+class TurnTimer:
+    def __init__(self, duration: float, clock=time.monotonic):
+        self.duration = duration  # seconds of one turn
+        self.clock = clock  # function returning current time in seconds, may be replaced by simulated one
+        self.deadline = None  # clock time when the turn ends, None if the timer is stopped
+        self.paused_at = None  # clock time when timer was paused, None if it's running
+
+    @property
+    def time_left(self) -> float:
+        """seconds left until the end of the turn, the whole duration if the timer is stopped"""
+        if self.deadline is None:
+            return self.duration
+        now = self.paused_at if self.paused_at is not None else self.clock()
+        return max(self.deadline - now, 0)
+
+    def start(self):
+        self.deadline = self.clock() + self.duration
+        self.paused_at = None
+
+    def stop(self):
+        self.deadline = None
+        self.paused_at = None
+
+    def pause(self):
+        if self.deadline is not None and self.paused_at is None:
+            self.paused_at = self.clock()
+
+    def resume(self):
+        """continuing the turn, the time of the pause isn't counted"""
+        if self.paused_at is not None:
+            self.deadline += self.clock() - self.paused_at
+            self.paused_at = None
+
+    def is_over(self) -> bool:
+        """True if the running timer has no time left, stopped or paused timer is never over"""
+        return self.deadline is not None and self.paused_at is None and self.time_left <= 0
@@ -0,0 +1,173 @@
+"""
+Copyright© 2024 Artur Pozniak <noi.kucia@gmail.com> or <noiszewczyk@gmail.com>.
+All rights reserved.
+This program is released under license GPL-3.0-or-later
+
+This file is part of MathGraph.
+MathGraph is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+MathGraph is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with MathGraph.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+"""Calculation of the whole shot before it's drawn: the path of the formula graph
+and the events (hits) which happen along it. Nothing here depends on arcade, so the result
+is known immediately after fire and the drawing only reveals the path step by step"""
+
+import math
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from formula import Formula
+from obstacles import ObstacleStore
+
+HIT_PLAYER = 'player'
+HIT_OBSTACLE = 'obstacle'
+HIT_BORDER = 'border'
+HIT_ERROR = 'error'
+
+COLLISION_POINTS = 'points'  # only points of the path collide (graph can "jump" through thin objects)
+COLLISION_SEGMENTS = 'segments'  # every segment of the path collides
+
+
+class HitEvent(NamedTuple):
+    index: int  # index of the point in trajectory where event happens
+    kind: str  # one of HIT_... constants
+    target: object = None  # hit player or obstacle id
+    point: Tuple = None  # exact point of the hit
+
+
+class Trajectory:
+    """Points of the formula graph from the shooter position to the edge of the game field.
+    Graph is translated vertically to come out of the shooter (start_x, start_y).
+    x_step is signed: negative values make the graph go to the left.
+    rng is the source of formula noise, the same seeded rng gives the same path on every machine"""
+
+    def __init__(self, formula: Formula, start_x: float, start_y: float, x_step: float, x_edge: float,
+                 y_edge: float, rng: np.random.Generator = None):
+        direction = 1 if x_step > 0 else -1
+        steps = max(math.ceil((x_edge - direction * start_x) / abs(x_step)), 0)
+        x = start_x + x_step * np.arange(steps + 1)
+        values = formula.evaluate_many(x, rng)
+        invalid = np.ma.getmaskarray(values)
+
+        self.end = None  # last event, which stops the shot (border or error)
+        if invalid[0]:
+            self.x = self.y = np.empty(0)
+            self.end = HitEvent(0, HIT_ERROR)
+            return
+        y = values.data - values.data[0] + start_y
+
+        # the shot stops on the first point out of the field (including it) or before the first bad point
+        out_of_field = (np.abs(y) >= y_edge) | (np.abs(x) >= x_edge)
+        last = len(x) - 1
+        self.end = HitEvent(last, HIT_BORDER)
+        if out_of_field.any():
+            last = int(np.argmax(out_of_field))
+            self.end = HitEvent(last, HIT_BORDER)
+        if invalid[:last + 1].any():
+            last = int(np.argmax(invalid)) - 1
+            self.end = HitEvent(last, HIT_ERROR)
+
+        self.x = x[:last + 1]
+        self.y = y[:last + 1]
+
+    def __len__(self):
+        return len(self.x)
+
+
+def segments_box_entries(points: np.ndarray, hitbox: Tuple) -> np.ndarray:
+    """Parameters t in [0, 1] where every segment of polyline enters the box (left, bottom, right, top),
+    inf for segments which don't touch it"""
+    left, bottom, right, top = hitbox
+    starts = points[:-1]
+    directions = points[1:] - starts
+    low = np.array((left, bottom))
+    high = np.array((right, top))
+    with np.errstate(all='ignore'):
+        t_low = (low - starts) / directions
+        t_high = (high - starts) / directions
+    t_enter = np.minimum(t_low, t_high)
+    t_exit = np.maximum(t_low, t_high)
+
+    # segments parallel to the axis are inside the slab for every t or for none
+    parallel = directions == 0
+    inside_slab = (starts >= low) & (starts <= high)
+    t_enter = np.where(parallel, np.where(inside_slab, -np.inf, np.inf), t_enter)
+    t_exit = np.where(parallel, np.where(inside_slab, np.inf, -np.inf), t_exit)
+
+    enter = np.maximum(t_enter.max(axis=1), 0)
+    exit_ = t_exit.min(axis=1)
+    return np.where((enter <= exit_) & (enter <= 1), enter, np.inf)
+
+
+def find_hits(points: np.ndarray, obstacles: ObstacleStore, hitboxes: list,
+              collision_mode: str = COLLISION_POINTS) -> list:
+    """Looking for the hits along the points of path (array of shape (n, 2)).
+    hitboxes is the list of (player, (left, bottom, right, top)) and
+    must contain only players which can be killed by this shot.
+    In COLLISION_POINTS mode only the points of path are tested, in COLLISION_SEGMENTS mode every segment
+    between them is tested, so steep graphs can't go through obstacles and players.
+    Returns hit events sorted by index, the obstacle hit (if any) is the last one, because it stops the shot"""
+
+    if collision_mode == COLLISION_SEGMENTS:
+        return _find_segment_hits(points, obstacles, hitboxes)
+
+    events = []
+    if not len(points):
+        return events
+    x, y = points[:, 0], points[:, 1]
+
+    # looking for the first point inside any obstacle
+    first_hit = len(points)
+    obstacle_hit = obstacles.first_hit(points)
+    if obstacle_hit:
+        first_hit, obstacle_id = obstacle_hit
+        events.append(HitEvent(first_hit, HIT_OBSTACLE, obstacle_id, tuple(points[first_hit].tolist())))
+
+    # players killed before the shot is stopped
+    for player, (left, bottom, right, top) in hitboxes:
+        inside = (x[:first_hit] >= left) & (x[:first_hit] <= right) & (y[:first_hit] >= bottom) & (
+                y[:first_hit] <= top)
+        if inside.any():
+            index = int(np.argmax(inside))
+            events.append(HitEvent(index, HIT_PLAYER, player, tuple(points[index].tolist())))
+
+    events.sort(key=lambda event: event.index)
+    return events
+
+
+def _find_segment_hits(points: np.ndarray, obstacles: ObstacleStore, hitboxes: list) -> list:
+    events = []
+    if len(points) < 2:
+        return events
+
+    # looking for the first segment crossing any obstacle, event index is the index of segment end
+    first_hit, first_hit_t = len(points), 0
+    obstacle_hit = obstacles.first_crossing(points)
+    if obstacle_hit:
+        first_hit, obstacle_id, point = obstacle_hit
+        start, end = points[max(first_hit - 1, 0)], points[first_hit]
+        length = np.linalg.norm(end - start)
+        first_hit_t = np.linalg.norm(np.asarray(point) - start) / length if length else 0
+        events.append(HitEvent(first_hit, HIT_OBSTACLE, obstacle_id, point))
+
+    # players killed before the shot is stopped
+    for player, hitbox in hitboxes:
+        entries = segments_box_entries(points, hitbox)
+        hit_segments = np.flatnonzero(np.isfinite(entries))
+        if not len(hit_segments):
+            continue
+        segment = int(hit_segments[0])
+        if segment + 1 > first_hit or (segment + 1 == first_hit and entries[segment] >= first_hit_t):
+            continue
+        point = points[segment] + entries[segment] * (points[segment + 1] - points[segment])
+        events.append(HitEvent(segment + 1, HIT_PLAYER, player, tuple(point.tolist())))
+
+    events.sort(key=lambda event: event.index)
+    return events